@@ -0,0 +1,191 @@
+''' @file aiotask.py
+This file runs cotask tasks under asyncio (uasyncio on the board) instead of
+the polling schedulers in cotask. Each Task's generator becomes a coroutine:
+a timed task sleeps until its next run time rather than being polled by
+@c ready(), and an untimed task waits on a flag which its @c go() method
+sets. On the board the flag is a @c ThreadSafeFlag, so @c go() may be called
+from an interrupt service routine. Profiling and tracing are kept in the
+Task objects exactly as @c schedule() keeps them, so @c print(task_list)
+shows comparable tables for either runtime.
+
+asyncio has no priorities; tasks which are due together run in the order in
+which they became due. A task's generator must still yield quickly, since no
+other coroutine can run until it does.
+@code
+# In main.py, instead of the pri_sched() loop
+import aiotask
+aiotask.run(cotask.task_list)
+@endcode
+
+compare() runs a task set shaped like the robot's under both runtimes and
+prints the dispatch overhead and the profiling tables. '''
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    import pyb
+except ImportError:
+    import hostenv
+    hostenv.install()
+
+import utime
+import cotask
+
+
+def _sleep_us(delay):
+    ''' Sleeps for about the given number of microseconds, rounding down so
+    the caller wakes early rather than late. '''
+    if hasattr(asyncio, 'sleep_ms'):
+        return asyncio.sleep_ms(delay // 1000)
+    return asyncio.sleep(delay / 1000000)
+
+
+def _make_flag():
+    ''' Makes a flag on which an untimed task waits. '''
+    if hasattr(asyncio, 'ThreadSafeFlag'):
+        return asyncio.ThreadSafeFlag()
+    return asyncio.Event()
+
+
+def _step(task, late):
+    ''' Runs a task's generator up to its next yield with Task._run(), which
+    keeps the profile and trace, and records how late the run was, as
+    Task.ready() does when cotask schedules the task.
+    @param task The cotask Task to run
+    @param late How late the run is in microseconds '''
+    task._run()
+    if task._prof:
+        task._late_sum += late
+        if late > task._latest:
+            task._latest = late
+
+
+async def _run_timed(task):
+    ''' Runs a task which has a period, sleeping between runs. '''
+    next_run = utime.ticks_add(utime.ticks_us(), task.period)
+    while True:
+        delay = utime.ticks_diff(next_run, utime.ticks_us())
+        if delay > 0:
+            await _sleep_us(delay)
+            continue
+        _step(task, -delay)
+        next_run = utime.ticks_add(next_run, task.period)
+        await _sleep_us(0)
+
+
+async def _run_flagged(task):
+    ''' Runs a task with no period each time its go() method is called. '''
+    flag = _make_flag()
+    clear = not hasattr(asyncio, 'ThreadSafeFlag')
+
+    def go():
+        task.go_flag = True
+        flag.set()
+    task.go = go
+
+    while True:
+        if not task.go_flag:
+            await flag.wait()
+            if clear:
+                flag.clear()
+        task.go_flag = False
+        _step(task, 0)
+        await _sleep_us(0)
+
+
+async def _main(task_list, duration):
+    ''' Starts a coroutine for every task, highest priority first, and runs
+    them for the given number of seconds or forever. '''
+    coros = []
+    for pri in task_list.pri_list:
+        for task in pri[2:]:
+            runner = _run_flagged if task.period is None else _run_timed
+            coros.append(asyncio.create_task(runner(task)))
+
+    if duration is None:
+        await asyncio.gather(*coros)
+    else:
+        await asyncio.sleep(duration)
+        for coro in coros:
+            coro.cancel()
+
+
+def run(task_list, duration=None):
+    ''' Runs the tasks in a cotask TaskList under asyncio.
+    @param task_list The TaskList, such as @c cotask.task_list
+    @param duration How long to run in seconds, or @c None to run forever
+    '''
+    asyncio.run(_main(task_list, duration))
+
+
+# ---------------------------------------------------------------- comparison
+
+## Tasks like those in main.py: name, priority, period (ms) and the time in
+#  microseconds each run keeps the processor busy
+BENCH_TASKS = (('Read_IR', 5, 30, 100), ('Brain_task', 4, 100, 200),
+               ('Motor_R', 4, 3, 150), ('Motor_L', 4, 3, 150),
+               ('Ultrasonic', 2, 70, 2000), ('Edge_det', 4, 50, 100),
+               ('Accel', 2, 50, 500))
+
+
+def _busy(cost):
+    ''' Makes a task function which keeps the processor busy for a while on
+    each run. '''
+    def fun():
+        while True:
+            start = utime.ticks_us()
+            while utime.ticks_diff(utime.ticks_us(), start) < cost:
+                pass
+            yield 0
+    return fun
+
+
+def _bench_list(periodic=True):
+    ''' Makes a fresh TaskList of benchmark tasks. With @c periodic set to
+    @c False the tasks do nothing and are always due, for measuring the
+    cost of dispatching alone. '''
+    task_list = cotask.TaskList()
+    for name, pri, period, cost in BENCH_TASKS:
+        if periodic:
+            task = cotask.Task(_busy(cost), name=name, priority=pri,
+                               period=period, profile=True)
+        else:
+            task = cotask.Task(_busy(0), name=name, priority=pri,
+                               period=0, profile=True)
+        task_list.append(task)
+    return task_list
+
+
+def _pri_loop(task_list, duration):
+    ''' Runs a TaskList with pri_sched() for the given number of seconds. '''
+    start = utime.ticks_ms()
+    while utime.ticks_diff(utime.ticks_ms(), start) < duration * 1000:
+        task_list.pri_sched()
+
+
+def _total_runs(task_list):
+    ''' Adds up the runs of all the tasks in a TaskList. '''
+    return sum(task._runs for pri in task_list.pri_list for task in pri[2:])
+
+
+def compare(duration=2):
+    ''' Runs the benchmark task set under pri_sched() and under asyncio and
+    prints the results side by side.
+    @param duration How long to run each test in seconds '''
+    for label, runner in (('pri_sched', _pri_loop), ('asyncio', run)):
+        task_list = _bench_list(periodic=False)
+        runner(task_list, duration)
+        runs = _total_runs(task_list)
+        print('{:s}: {:.1f} us per dispatch of an always ready task'.format(
+            label, duration * 1e6 / max(1, runs)))
+
+        task_list = _bench_list()
+        runner(task_list, duration)
+        print(task_list)
+
+
+if __name__ == '__main__':
+    compare()
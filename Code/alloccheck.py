@@ -0,0 +1,440 @@
+''' @file alloccheck.py
+This file looks through the task code for operations which allocate memory
+on the heap each time a task runs. Allocation in a task's loop makes the
+heap fill up, and the garbage collection which follows can take
+milliseconds, holding up every other task. It runs on a desktop computer.
+
+The task functions are found from the @c cotask.Task() calls in main.py;
+a task may be a function in main.py or a method of an object made there,
+such as @c cons.run of a console.Console. A task which can't be found that
+way is reported as not checked rather than left out of the count.
+Everything in the @c while @c True loop of each task is checked, along with
+the functions and methods it calls: functions in the same file, and methods
+of objects made from classes in this directory (such as a Controller made in
+the task before its loop, or a Share made in main.py). Other calls are not
+followed.
+
+The checks are by syntax alone, so some findings depend on types which
+cannot be known here; integer arithmetic and calls to methods of objects of
+unknown class are not flagged. A finding which is acceptable can be marked
+with the comment @c "# alloc: ok" on its line; the same comment on the
+@c def line of a function or method marks everything it does, and what it
+calls, as acceptable, such as a console command which only runs when one is
+typed.
+@code
+python alloccheck.py               # check main.py
+python alloccheck.py other_main.py
+@endcode '''
+
+import ast
+import os
+import sys
+
+
+## The comment which marks a line as allowed to allocate
+ALLOW = 'alloc: ok'
+
+## Built in functions which return a new object on the heap
+ALLOC_CALLS = {'str': 'makes a string', 'repr': 'makes a string',
+               'format': 'makes a string', 'list': 'makes a list',
+               'dict': 'makes a dictionary', 'set': 'makes a set',
+               'frozenset': 'makes a set', 'tuple': 'makes a tuple',
+               'bytes': 'makes a bytes object',
+               'bytearray': 'makes a bytearray',
+               'memoryview': 'makes a memoryview', 'float': 'makes a float',
+               'sorted': 'makes a list', 'reversed': 'makes an iterator',
+               'enumerate': 'makes an iterator', 'zip': 'makes an iterator',
+               'map': 'makes an iterator', 'filter': 'makes an iterator',
+               'iter': 'makes an iterator', 'range': 'makes a range object',
+               'print': 'may format its arguments into strings'}
+
+## Methods which return a new object or may grow their object
+ALLOC_METHODS = {'append': 'may grow the list',
+                 'extend': 'may grow the list',
+                 'insert': 'may grow the list',
+                 'format': 'makes a string', 'join': 'makes a string',
+                 'split': 'makes a list of strings',
+                 'strip': 'makes a string', 'replace': 'makes a string',
+                 'upper': 'makes a string', 'lower': 'makes a string',
+                 'encode': 'makes a bytes object', 'decode': 'makes a string',
+                 'copy': 'makes a copy', 'items': 'makes a view',
+                 'keys': 'makes a view', 'values': 'makes a view'}
+
+
+class Module:
+    ''' This class holds what the checker needs to know about one source
+    file: its functions, its classes and methods, and the module level
+    names which hold objects of classes from other files. '''
+
+    def __init__(self, path):
+        ''' Parses a source file.
+        @param path The name of the file '''
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as src:
+            self.lines = src.read().splitlines()
+        self.tree = ast.parse('\n'.join(self.lines), path)
+        self.functions = {}
+        self.classes = {}
+        for node in self.tree.body:
+            if isinstance(node, ast.FunctionDef):
+                self.functions[node.name] = node
+            elif isinstance(node, ast.ClassDef):
+                self.classes[node.name] = dict(
+                    (item.name, item) for item in node.body
+                    if isinstance(item, ast.FunctionDef))
+        self.objects = _object_names(self.tree)
+
+
+def _object_names(tree):
+    ''' Finds names assigned an object made by calling @c module.Class().
+    @param tree The syntax tree in which to look
+    @return A dictionary of (module name, class name) tuples by name '''
+    objects = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Name) \
+                and isinstance(node.value, ast.Call) \
+                and isinstance(node.value.func, ast.Attribute) \
+                and isinstance(node.value.func.value, ast.Name):
+            objects[node.targets[0].id] = (node.value.func.value.id,
+                                           node.value.func.attr)
+    return objects
+
+
+def task_functions(module):
+    ''' Finds the functions given to @c cotask.Task() in a module.
+    @param module The Module to look through
+    @return A list of the task functions in the order registered: the name
+        of a function, @c object.method for a bound method, or the source of
+        whatever else was given '''
+    names = []
+    for node in ast.walk(module.tree):
+        if isinstance(node, ast.Call) and node.args \
+                and (isinstance(node.func, ast.Attribute)
+                     and node.func.attr == 'Task'
+                     or isinstance(node.func, ast.Name)
+                     and node.func.id == 'Task'):
+            name = ast.unparse(node.args[0])
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _is_forever(node):
+    ''' Checks whether a node is a @c while @c True loop. '''
+    return isinstance(node, ast.While) \
+        and isinstance(node.test, ast.Constant) and node.test.value is True \
+        or isinstance(node, ast.While) \
+        and isinstance(node.test, ast.Constant) and node.test.value == 1
+
+
+def _is_str(node):
+    ''' Checks whether a node is certainly a string. '''
+    return isinstance(node, ast.Constant) and isinstance(node.value, str) \
+        or isinstance(node, ast.JoinedStr) \
+        or isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+        and node.func.id in ('str', 'repr')
+
+
+def _is_float(node):
+    ''' Checks whether a node is certainly a float. '''
+    return isinstance(node, ast.Constant) and isinstance(node.value, float) \
+        or isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div) \
+        or isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+        and node.func.id == 'float'
+
+
+class _Finder(ast.NodeVisitor):
+    ''' This class walks the body of one function, noting allocating
+    operations and the calls which can be followed. '''
+
+    def __init__(self, module, class_name, objects):
+        ''' Prepares to walk a function.
+        @param module The Module holding the function
+        @param class_name The class of which the function is a method, or
+            @c None for a plain function
+        @param objects Names of objects of known class, as made by
+            _object_names(), visible in the function '''
+        self.module = module
+        self.class_name = class_name
+        self.objects = objects
+        self.found = []
+        self.calls = []
+
+    def note(self, node, message):
+        ''' Saves a finding unless its line is marked as allowed. '''
+        line = self.module.lines[node.lineno - 1]
+        if ALLOW not in line:
+            self.found.append((node.lineno, message))
+
+    def visit_FunctionDef(self, node):
+        self.note(node, 'defines a function (makes a closure)')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self.note(node, 'makes a lambda')
+
+    def visit_ClassDef(self, node):
+        self.note(node, 'defines a class')
+
+    def visit_List(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.note(node, 'makes a list')
+        self.generic_visit(node)
+
+    def visit_Dict(self, node):
+        self.note(node, 'makes a dictionary')
+        self.generic_visit(node)
+
+    def visit_Set(self, node):
+        self.note(node, 'makes a set')
+        self.generic_visit(node)
+
+    def visit_Tuple(self, node):
+        if isinstance(node.ctx, ast.Load) and not all(
+                isinstance(elt, ast.Constant) for elt in node.elts):
+            self.note(node, 'makes a tuple')
+        self.generic_visit(node)
+
+    def visit_ListComp(self, node):
+        self.note(node, 'makes a list')
+        self.generic_visit(node)
+
+    def visit_SetComp(self, node):
+        self.note(node, 'makes a set')
+        self.generic_visit(node)
+
+    def visit_DictComp(self, node):
+        self.note(node, 'makes a dictionary')
+        self.generic_visit(node)
+
+    def visit_GeneratorExp(self, node):
+        self.note(node, 'makes a generator')
+        self.generic_visit(node)
+
+    def visit_JoinedStr(self, node):
+        self.note(node, 'makes a string')
+
+    def visit_Raise(self, node):
+        self.note(node, 'raises an exception object')
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        # Swapping or unpacking a few values doesn't build a tuple
+        if isinstance(node.value, ast.Tuple) and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Tuple) \
+                and len(node.value.elts) == len(node.targets[0].elts) <= 3:
+            for elt in node.value.elts:
+                self.visit(elt)
+        else:
+            self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.ctx, ast.Load) \
+                and isinstance(node.slice, ast.Slice):
+            self.note(node, 'slicing makes a copy')
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, ast.Add) \
+                and (_is_str(node.left) or _is_str(node.right)):
+            self.note(node, 'string concatenation makes a string')
+        elif isinstance(node.op, ast.Mod) and _is_str(node.left):
+            self.note(node, 'string formatting makes a string')
+        elif isinstance(node.op, ast.Div):
+            self.note(node, 'true division makes a float')
+        elif _is_float(node.left) or _is_float(node.right):
+            self.note(node, 'float arithmetic makes a float')
+        elif isinstance(node.op, ast.Mult) \
+                and (isinstance(node.left, (ast.List, ast.Tuple))
+                     or isinstance(node.right, (ast.List, ast.Tuple))):
+            self.note(node, 'repeating a sequence makes a new one')
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.op, ast.Add) and _is_str(node.value):
+            self.note(node, 'string concatenation makes a string')
+        elif isinstance(node.op, ast.Div):
+            self.note(node, 'true division makes a float')
+        elif _is_float(node.value):
+            self.note(node, 'float arithmetic makes a float')
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if any(isinstance(arg, ast.Starred) for arg in node.args) \
+                or any(kw.arg is None for kw in node.keywords):
+            self.note(node, 'unpacking arguments makes a tuple or dict')
+
+        if isinstance(func, ast.Name):
+            if func.id in ALLOC_CALLS:
+                self.note(node, '{:s}() {:s}'.format(func.id,
+                                                     ALLOC_CALLS[func.id]))
+            elif func.id in self.module.classes:
+                self.note(node, 'makes a {:s} object'.format(func.id))
+            elif func.id in self.module.functions:
+                self.calls.append((self.module.name, None, func.id))
+
+        elif isinstance(func, ast.Attribute):
+            owner = func.value
+            if isinstance(owner, ast.Name) and owner.id == 'self' \
+                    and self.class_name:
+                self.calls.append((self.module.name, self.class_name,
+                                   func.attr))
+            elif isinstance(owner, ast.Name) and owner.id in self.objects:
+                mod_name, cls_name = self.objects[owner.id]
+                self.calls.append((mod_name, cls_name, func.attr))
+            elif isinstance(owner, ast.Name) and func.attr[:1].isupper():
+                self.note(node, 'makes a {:s}.{:s} object'.format(owner.id,
+                                                                  func.attr))
+            elif isinstance(owner, ast.Name):
+                self.calls.append((owner.id, None, func.attr))
+            if func.attr in ALLOC_METHODS:
+                self.note(node, '.{:s}() {:s}'.format(func.attr,
+                                                      ALLOC_METHODS[func.attr]))
+        self.generic_visit(node)
+
+
+class Checker:
+    ''' This class checks the tasks of a program and the code they call,
+    loading other source files from the same directory as needed. '''
+
+    def __init__(self, path):
+        ''' Loads the program.
+        @param path The name of the file holding the task registrations '''
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.main = Module(path)
+        self.modules = {self.main.name: self.main}
+
+    def module(self, name):
+        ''' Gets a module by name, loading it if its file is here.
+        @return The Module, or @c None if there is no such file '''
+        if name not in self.modules:
+            path = os.path.join(self.directory, name + '.py')
+            self.modules[name] = Module(path) if os.path.exists(path) \
+                else None
+        return self.modules[name]
+
+    def _walk(self, module, class_name, nodes, objects):
+        ''' Runs a _Finder over some statements. '''
+        finder = _Finder(module, class_name, objects)
+        for node in nodes:
+            finder.visit(node)
+        return finder
+
+    def find_task(self, name):
+        ''' Finds the code of a task function.
+        @param name The task function as given by task_functions()
+        @return The Module holding it, the name of its class or @c None if
+            it's a plain function, and its definition; or @c None if it
+            can't be found '''
+        if name in self.main.functions:
+            return self.main, None, self.main.functions[name]
+        owner, _, method = name.partition('.')
+        if owner not in self.main.objects or '.' in method:
+            return None
+        mod_name, cls_name = self.main.objects[owner]
+        module = self.module(mod_name)
+        if module is None or method not in module.classes.get(cls_name, {}):
+            return None
+        return module, cls_name, module.classes[cls_name][method]
+
+    def check_task(self, name):
+        ''' Checks one task function and everything its loop calls.
+        @param name The task function as given by task_functions()
+        @return A sorted list of (path, line, function, message) tuples '''
+        task = self.find_task(name)
+        if task is None:
+            return [(self.main.path, 0, name, 'task function not found')]
+        home, cls_name, func = task
+
+        # Objects made before the loop are known to the loop
+        objects = dict(home.objects)
+        loops = []
+        for node in func.body:
+            if _is_forever(node):
+                loops.append(node)
+            else:
+                objects.update(_object_names(node))
+        if not loops:
+            loops = [node for node in ast.walk(func) if _is_forever(node)]
+        if not loops:
+            return [(home.path, func.lineno, name,
+                     'no while True loop found')]
+
+        found = set()
+        finder = self._walk(home, cls_name,
+                            [stmt for loop in loops for stmt in loop.body],
+                            objects)
+        found.update((home.path, line, name, msg)
+                     for line, msg in finder.found)
+
+        # Follow calls into functions and methods which can be found
+        seen = set()
+        pending = list(finder.calls)
+        while pending:
+            mod_name, cls_name, func_name = pending.pop()
+            if (mod_name, cls_name, func_name) in seen:
+                continue
+            seen.add((mod_name, cls_name, func_name))
+            module = self.module(mod_name)
+            if module is None:
+                continue
+            if cls_name is None:
+                callee = module.functions.get(func_name)
+                label = '{:s}.{:s}'.format(mod_name, func_name)
+            else:
+                callee = module.classes.get(cls_name, {}).get(func_name)
+                label = '{:s}.{:s}.{:s}'.format(mod_name, cls_name, func_name)
+            if callee is None or ALLOW in module.lines[callee.lineno - 1]:
+                continue
+            finder = self._walk(module, cls_name, callee.body,
+                                module.objects)
+            found.update((module.path, line, '{:s} via {:s}'.format(
+                label, name), msg) for line, msg in finder.found)
+            pending.extend(finder.calls)
+
+        return sorted(found)
+
+    def check(self):
+        ''' Checks every task registered in the main file whose code can be
+        found; see unchecked() for the others.
+        @return A list of (path, line, function, message) tuples '''
+        found = []
+        for name in task_functions(self.main):
+            if self.find_task(name) is not None:
+                found.extend(self.check_task(name))
+        return found
+
+    def unchecked(self):
+        ''' Finds the tasks registered in the main file whose code can't be
+        found, so they aren't checked.
+        @return A list of their task functions as given by task_functions() '''
+        return [name for name in task_functions(self.main)
+                if self.find_task(name) is None]
+
+
+def main(argv):
+    ''' Checks the file named on the command line, or main.py, and prints
+    the findings.
+    @return The number of findings and tasks not checked '''
+    path = argv[0] if argv else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    checker = Checker(path)
+    found = checker.check()
+    for path, line, func, msg in found:
+        print('{:s}:{:d}: {:s}: {:s}'.format(os.path.relpath(path), line,
+                                              func, msg))
+    unchecked = checker.unchecked()
+    print('{:d} allocating operations in {:d} tasks'.format(
+        len(found), len(task_functions(checker.main)) - len(unchecked)))
+    if unchecked:
+        print('{:d} tasks not checked: {:s}'.format(len(unchecked),
+                                                    ', '.join(unchecked)))
+    return len(found) + len(unchecked)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv[1:]) else 0)
@@ -0,0 +1,615 @@
+''' @file arena.py
+This file contains a batched simulator of sumo matches which runs on a
+desktop computer. Thousands of independent matches are stepped together,
+with the ring, the robots' differential-drive kinematics, pushing contact,
+the ultrasonic cone, the line sensor and the accelerometer all computed as
+NumPy array operations. The decisions are made by the real @c Brain task
+from @c main.py: each match has its own @c Brain generator, and its shares
+are views into arrays which hold that share's value for every match.
+The ultrasonic readings are also run through the @c trackDistance() tracker
+of each match, and when each match first started to charge is recorded, so
+the tracker can be compared with acting on the raw readings:
+@code
+python arena.py --matches 2000 --set TRACK=0,1
+@endcode
+There is a cone for each ultrasonic sensor in @c main.SONAR_BEARINGS, and
+the sensors are pinged one at a time as the Ultrasonic task pings them. A
+tuple value is given with colons between its items, or after its only item:
+@code
+python arena.py --matches 2000 --set SONAR_BEARINGS=0:,0:40:-40
+@endcode
+
+Half the matches are on a slippery ring, where the wheels spin when the
+robots push; elsewhere they grip and stall when pushed back harder. The
+real @c getTraction() task of each match watches the wheels, and how soon
+it shows each stall and slip in the traction share is measured, so the
+detector and the Brain's response to it can be tuned:
+@code
+python arena.py --matches 2000 --set TRACTION=0,1
+@endcode
+
+Thresholds read by @c Brain, such as @c DIST_LIMIT and @c ACCEL_LIMIT, can
+be swept over a grid, one batch of matches per grid point, spread over a
+process pool:
+@code
+python arena.py --matches 1000 --set DIST_LIMIT=100,200,300 --set ACCEL_LIMIT=50,70
+@endcode '''
+
+import itertools
+import math
+import sys
+
+import numpy as np
+
+import hostenv
+
+
+## Radius of the ring in metres (4 ft diameter)
+RING_RADIUS = 0.6096
+
+## Width of the white border in metres (2 in)
+BORDER = 0.0508
+
+## Radius of each robot's footprint in metres
+ROBOT_RADIUS = 0.075
+
+## Distance between the drive wheels in metres
+WHEEL_BASE = 0.1
+
+## Wheel surface speed in m/s at 100 % duty cycle
+V_MAX = 0.25
+
+## Time constant of the motors in seconds
+MOTOR_TAU = 0.05
+
+## Distance of the line sensor ahead of the robot's centre in metres
+LINE_OFFSET = 0.06
+
+## Half angle of the ultrasonic sensor's cone in radians
+US_HALF_ANGLE = math.radians(15)
+
+## Longest range in metres at which the ultrasonic sensor sees the opponent
+US_RANGE = 0.6
+
+## Shortest range in mm the ultrasonic sensor reports; anything nearer,
+#  up to touching, reads about this
+US_LEAST = 25
+
+## Distance in mm reported when nothing is in the ultrasonic cone
+US_NO_ECHO = 1500
+
+## Standard deviation of the ultrasonic reading in mm
+US_NOISE = 10.0
+
+## Standard deviation of the accelerometer reading in milli-g
+ACCEL_NOISE = 10.0
+
+## Fraction of matches on a slippery ring, on which both robots' wheels
+#  spin when they push; elsewhere they grip, and stall if the other robot
+#  pushes back harder
+SLIP_CHANCE = 0.5
+
+## Fraction of its unloaded speed at which the robot moves while pushing,
+#  with its wheels gripping or spinning
+PUSH_LOAD = 0.6
+SLIP_LOAD = 0.4
+
+## Speed, in fraction of that which its effort would give it unloaded, below
+#  which a wheel is stalled, and the least effort in percent at which the
+#  wheels are judged, for finding how soon stalls and slips are detected
+STALL_BELOW = 0.3
+EFFORT_LEAST = 30
+
+## Fastest speed of the scripted opponent in m/s
+OPP_SPEED = 0.2
+
+## Fastest turning rate of the scripted opponent in rad/s
+OPP_TURN = 2.0
+
+## Acceleration of gravity in m/s^2
+G = 9.81
+
+## Task periods in milliseconds, as set in @c main.py. The ultrasonic
+#  sensors are read as often as @c main.SONAR_PERIOD says.
+BRAIN_PERIOD = 100
+LINE_PERIOD = 50
+ACCEL_PERIOD = 50
+
+## The largest effort in percent given to either wheel, as in
+#  @c controller.mix()
+MAX_EFFORT = 100
+
+## Match outcomes
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+## The shares used by the @c Brain task and their NumPy types
+SHARES = (('dist', np.int32), ('accel', np.int32), ('edge', np.uint32),
+          ('command', np.uint32), ('velocity', np.int32),
+          ('turn', np.int32), ('cause', np.uint8), ('track', np.int32),
+          ('closing', np.int32), ('predicted', np.int32),
+          ('bearing', np.int32), ('wheel_R', np.int32),
+          ('wheel_L', np.int32), ('traction', np.uint8))
+
+
+class ShareBank:
+    ''' This class holds a set of array-backed shares, the index of the
+    match whose task is currently running and the simulated time. '''
+
+    def __init__(self, size):
+        ''' Creates an empty bank.
+        @param size The number of matches '''
+        self.size = size
+        self.index = 0
+        self.now = 0
+
+    def share(self, dtype):
+        ''' Creates a share with one value per match.
+        @param dtype The NumPy type of the values
+        @return The new share '''
+        return BankShare(self, dtype)
+
+
+class BankShare:
+    ''' This class looks like a timestamped @c task_share.Share to a task,
+    but keeps one value and timestamp per match; @c get() and @c put() use
+    those of the match whose task is running. The simulator works on
+    @c values directly, stamping what it writes with @c write(). '''
+
+    def __init__(self, bank, dtype):
+        ''' Creates the share with all values zero and never written.
+        @param bank The @c ShareBank which selects the match
+        @param dtype The NumPy type of the values '''
+        self._bank = bank
+        self.values = np.zeros(bank.size, dtype)
+        self.stamps = np.zeros(bank.size, np.int64)
+        self.written = np.zeros(bank.size, bool)
+
+    def write(self, where, data, stamp):
+        ''' Writes values for many matches at once, as their sensor tasks
+        would.
+        @param where A mask or index array of the matches to write
+        @param data The values, or one value for all of them
+        @param stamp The time of the write in microseconds '''
+        self.values[where] = data
+        self.stamps[where] = stamp
+        self.written[where] = True
+
+    def put(self, data, in_ISR=False):
+        ''' Writes the value for the running match. '''
+        self.put_at(data, self._bank.now)
+
+    def get(self, in_ISR=False):
+        ''' Reads the value for the running match. '''
+        return int(self.values[self._bank.index])
+
+    def put_at(self, data, stamp, in_ISR=False):
+        ''' Writes the value for the running match with the given time. '''
+        index = self._bank.index
+        self.values[index] = data
+        self.stamps[index] = stamp
+        self.written[index] = True
+
+    def stamp(self):
+        ''' Returns the time of the running match's last write, or @c None.
+        '''
+        index = self._bank.index
+        return int(self.stamps[index]) if self.written[index] else None
+
+    def age(self):
+        ''' Returns how long ago the running match's value was written. '''
+        stamp = self.stamp()
+        return None if stamp is None else self._bank.now - stamp
+
+    def fresh(self, max_age):
+        ''' Says whether the running match's value is recent enough. '''
+        age = self.age()
+        return age is not None and age <= max_age
+
+
+def mix(velocity, turn):
+    ''' Mixes drive commands into wheel efforts for every match, as
+    @c controller.mix() does for one wheel.
+    @param velocity An array of forward speeds in percent
+    @param turn An array of turn rates to the left in percent
+    @return A tuple (right, left) of arrays of efforts in percent '''
+    right = velocity.astype(np.int64) + turn
+    left = velocity.astype(np.int64) - turn
+    most = np.maximum(np.maximum(np.abs(right), np.abs(left)), MAX_EFFORT)
+    return right * MAX_EFFORT // most, left * MAX_EFFORT // most
+
+
+def _wrap(angle):
+    ''' Wraps angles into the range -pi to pi. '''
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def run_batch(num_matches, seed=0, params=None, duration=180.0, dt=0.01):
+    ''' Runs a batch of matches to the end.
+    @param num_matches The number of matches to run in parallel
+    @param seed The seed for the random starting positions and noise
+    @param params A dictionary of @c main module variables, such as
+        @c DIST_LIMIT, to set for this batch
+    @param duration The length of a match in seconds
+    @param dt The simulation time step in seconds; task periods should be
+        multiples of it
+    @return A dictionary of arrays with an entry per match: @c outcome
+        (@c WIN, @c DRAW or @c LOSS), @c t_end (when the match ended),
+        @c t_contact (time of first contact, NaN if none) and @c t_charge
+        (when the robot first charged, NaN if never) in seconds, and
+        @c lost_time and @c lost_count, the total time in seconds between
+        the end of one charge and the start of the next and the number of
+        such gaps; and for each of @c stall and @c slip, the total time in
+        seconds from one starting to the traction share showing it
+        (@c stall_delay), the number so detected (@c stall_found), the
+        number which ended before being detected (@c stall_missed) and the
+        number of times it was shown when there was none (@c stall_false)
+        '''
+    clock = hostenv.install(hostenv.VirtualClock())
+    import main
+
+    for name, value in (params or {}).items():
+        setattr(main, name, value)
+
+    rng = np.random.default_rng(seed)
+    num = num_matches
+    bank = ShareBank(num)
+    shares = {}
+    for name, dtype in SHARES:
+        shares[name] = bank.share(dtype)
+        setattr(main, name, shares[name])
+    sonar_bearings = np.radians(main.SONAR_BEARINGS)
+    main.ranges = [shares['dist']] + [bank.share(np.int32)
+                                      for _ in sonar_bearings[1:]]
+
+    # Both robots start near the centre on opposite sides, facing anywhere
+    place = rng.uniform(0, 2 * np.pi, num)
+    spread = rng.uniform(0.1, 0.3, num)
+    x = spread * np.cos(place)
+    y = spread * np.sin(place)
+    th = rng.uniform(-np.pi, np.pi, num)
+    ox = -spread * np.cos(place)
+    oy = -spread * np.sin(place)
+    oth = rng.uniform(-np.pi, np.pi, num)
+    opp_speed = rng.uniform(0.0, OPP_SPEED, num)
+    v_R = np.zeros(num)
+    v_L = np.zeros(num)
+    v_fwd = np.zeros(num)
+    pos_R = np.zeros(num)
+    pos_L = np.zeros(num)
+    slippy = rng.random(num) < SLIP_CHANCE
+    touching = np.zeros(num, bool)
+    ticks_per_m = main.TICKS_PER_TURN / (2 * np.pi * WHEEL_BASE)
+
+    active = np.ones(num, bool)
+    outcome = np.zeros(num, np.int8)
+    t_end = np.full(num, duration)
+    t_contact = np.full(num, np.nan)
+    t_charge = np.full(num, np.nan)
+    charging = np.zeros(num, bool)
+    lost_at = np.zeros(num)
+    lost_time = np.zeros(num)
+    lost_count = np.zeros(num, np.int64)
+
+    # For stalls and slips: the bits of the traction share showing them,
+    # when the one under way started (NaN if none is), whether it's been
+    # shown, and the counts made of them
+    kinds = {'stall': main.controller.STALLED,
+             'slip': main.controller.SLIPPING}
+    onset = {kind: np.full(num, np.nan) for kind in kinds}
+    shown = {kind: np.zeros(num, bool) for kind in kinds}
+    counts = {kind + '_' + what: np.zeros(num)
+              for kind in kinds for what in ('delay', 'found', 'missed',
+                                             'false')}
+
+    # Each Brain starts before the start button is pressed, as on the robot
+    brains = []
+    for i in range(num):
+        bank.index = i
+        brains.append(main.Brain())
+        next(brains[i])
+    tractions = []
+    for i in range(num):
+        bank.index = i
+        tractions.append(main.getTraction())
+        next(tractions[i])
+    shares['command'].values[:] = 1
+
+    dt_ms = int(round(dt * 1000))
+    ping_ms = main.SONAR_PERIOD // len(sonar_bearings)
+    ping = 0
+    lag = min(1.0, dt / MOTOR_TAU)
+    steps = int(round(duration / dt))
+    for step in range(1, steps + 1):
+        t_ms = step * dt_ms
+        now = t_ms * 1000
+        clock.set(now)
+        bank.now = now
+
+        # Drive: commands are mixed into efforts, wheel speeds lag behind
+        eff_R, eff_L = mix(shares['velocity'].values, shares['turn'].values)
+        v_R += (V_MAX / 100.0 * eff_R - v_R) * lag
+        v_L += (V_MAX / 100.0 * eff_L - v_L) * lag
+        load = np.where(touching, np.where(slippy, SLIP_LOAD, PUSH_LOAD), 1.0)
+        v = 0.5 * (v_R + v_L) * load
+        x_new = x + v * np.cos(th) * dt
+        y_new = y + v * np.sin(th) * dt
+        th_new = _wrap(th + (v_R - v_L) / WHEEL_BASE * dt)
+
+        # The opponent turns toward the robot at a limited rate and drives
+        bearing = np.arctan2(y - oy, x - ox)
+        turn = np.clip(_wrap(bearing - oth), -OPP_TURN * dt, OPP_TURN * dt)
+        oth_new = _wrap(oth + turn)
+        opp_v = opp_speed * load
+        ox_new = ox + opp_v * np.cos(oth_new) * dt
+        oy_new = oy + opp_v * np.sin(oth_new) * dt
+
+        # Contact: the harder pusher along the line of centres moves the
+        # other one out of the overlap
+        nx = ox_new - x_new
+        ny = oy_new - y_new
+        gap = np.hypot(nx, ny)
+        gap = np.maximum(gap, 1e-9)
+        nx /= gap
+        ny /= gap
+        overlap = 2 * ROBOT_RADIUS - gap
+        touch = (overlap > 0) & active
+        push_us = np.maximum(v * (np.cos(th_new) * nx
+                                  + np.sin(th_new) * ny), 0)
+        push_op = np.maximum(-opp_v * (np.cos(oth_new) * nx
+                                           + np.sin(oth_new) * ny), 0)
+        total = push_us + push_op
+        back = np.where(total > 0, push_op / np.maximum(total, 1e-9), 0.5)
+        shove = np.where(touch, overlap, 0.0)
+        x_new -= nx * shove * back
+        y_new -= ny * shove * back
+        ox_new += nx * shove * (1 - back)
+        oy_new += ny * shove * (1 - back)
+        first = touch & np.isnan(t_contact)
+        t_contact[first] = t_ms / 1000.0
+
+        # The accelerometer feels the change in forward speed, pushes
+        # included
+        fwd = ((x_new - x) * np.cos(th) + (y_new - y) * np.sin(th)) / dt
+        a_x = (fwd - v_fwd) / dt / G
+
+        # The motor tasks put the encoder positions in the wheel shares.
+        # Wheels which grip turn as the robot moves; on a slippery ring they
+        # spin at their own speed while the robot pushes
+        spin = touching & slippy
+        enc_R = np.where(spin, v_R, fwd + 0.5 * (v_R - v_L))
+        enc_L = np.where(spin, v_L, fwd - 0.5 * (v_R - v_L))
+        pos_R += np.where(active, enc_R * dt, 0.0)
+        pos_L += np.where(active, enc_L * dt, 0.0)
+        shares['wheel_R'].values[:] = pos_R * ticks_per_m
+        shares['wheel_L'].values[:] = pos_L * ticks_per_m
+
+        # Whether a wheel pushing with enough effort is really stalled or
+        # spinning
+        free_R = V_MAX / 100.0 * eff_R
+        free_L = V_MAX / 100.0 * eff_L
+        hard_R = np.abs(eff_R) >= EFFORT_LEAST
+        hard_L = np.abs(eff_L) >= EFFORT_LEAST
+        truth = {'stall': touching & ~slippy & (
+            (hard_R & (enc_R * np.sign(eff_R) < STALL_BELOW * np.abs(free_R)))
+            | (hard_L & (enc_L * np.sign(eff_L)
+                         < STALL_BELOW * np.abs(free_L)))),
+            'slip': spin & (hard_R | hard_L)}
+        touching = touch
+
+        # Matches which have already ended stay as they were
+        x = np.where(active, x_new, x)
+        y = np.where(active, y_new, y)
+        th = np.where(active, th_new, th)
+        ox = np.where(active, ox_new, ox)
+        oy = np.where(active, oy_new, oy)
+        oth = np.where(active, oth_new, oth)
+        v_fwd = fwd
+
+        # Leaving the ring ends a match
+        us_out = np.hypot(x, y) > RING_RADIUS
+        op_out = np.hypot(ox, oy) > RING_RADIUS
+        ended = active & (us_out | op_out)
+        if ended.any():
+            outcome[ended & op_out & ~us_out] = WIN
+            outcome[ended & us_out & ~op_out] = LOSS
+            t_end[ended] = t_ms / 1000.0
+            active &= ~ended
+            if not active.any():
+                break
+
+        # Sensor tasks write their shares when they are due
+        if t_ms >= (ping + 1) * ping_ms:
+            k = ping % len(sonar_bearings)
+            ping += 1
+            rel = np.hypot(ox - x, oy - y) - 2 * ROBOT_RADIUS
+            angle = _wrap(np.arctan2(oy - y, ox - x) - th
+                          - sonar_bearings[k])
+            seen = (np.abs(angle) < US_HALF_ANGLE) & (rel < US_RANGE)
+            reading = np.maximum(np.maximum(rel, 0) * 1000
+                                 + rng.normal(0, US_NOISE, num), US_LEAST)
+            reading = np.where(seen, reading, US_NO_ECHO).astype(np.int32)
+            for i in np.flatnonzero(active):
+                bank.index = i
+                main.sonarReading(k, int(reading[i]))
+        if t_ms % LINE_PERIOD == 0:
+            fx = x + LINE_OFFSET * np.cos(th)
+            fy = y + LINE_OFFSET * np.sin(th)
+            white = active & (np.hypot(fx, fy) > RING_RADIUS - BORDER)
+            edge = shares['edge']
+            edge.write(white & (edge.values != 1), 1, now)
+        if t_ms % ACCEL_PERIOD == 0:
+            accel = a_x * 1000 + rng.normal(0, ACCEL_NOISE, num)
+            shares['accel'].write(active, accel[active], now)
+        if t_ms % main.TRACTION_PERIOD == 0:
+            for i in np.flatnonzero(active):
+                bank.index = i
+                next(tractions[i])
+
+        # How soon each stall or slip is shown in the traction share
+        for kind, bits in kinds.items():
+            real = truth[kind] & active
+            seen = (shares['traction'].values & bits) != 0
+            start = real & np.isnan(onset[kind])
+            onset[kind][start] = t_ms / 1000.0
+            found = seen & real & ~shown[kind]
+            counts[kind + '_delay'][found] += t_ms / 1000.0 \
+                - onset[kind][found]
+            counts[kind + '_found'] += found
+            counts[kind + '_false'] += seen & ~real & ~shown[kind] \
+                & np.isnan(onset[kind]) & active
+            shown[kind] |= seen
+            over = ~real & ~np.isnan(onset[kind])
+            counts[kind + '_missed'] += over & ~shown[kind]
+            onset[kind][over] = np.nan
+            shown[kind] &= seen | real
+
+        # The Brain of each match still running makes its decision
+        if t_ms % BRAIN_PERIOD == 0:
+            for i in np.flatnonzero(active):
+                bank.index = i
+                next(brains[i])
+            now_charging = np.isin(shares['cause'].values,
+                                   (main.ECHO_CHARGE, main.STALL_BOOST)) \
+                & (shares['velocity'].values > 0) & active
+            t_charge[now_charging & np.isnan(t_charge)] = t_ms / 1000.0
+            found = now_charging & ~charging & (lost_at > 0)
+            lost_time[found] += t_ms / 1000.0 - lost_at[found]
+            lost_count[found] += 1
+            lost_at[charging & ~now_charging] = t_ms / 1000.0
+            lost_at[found] = 0
+            charging = now_charging
+
+    # When time runs out, the robot nearer the centre wins
+    timed_out = active
+    r_us = np.hypot(x, y)
+    r_op = np.hypot(ox, oy)
+    outcome[timed_out & (r_us < r_op)] = WIN
+    outcome[timed_out & (r_us > r_op)] = LOSS
+
+    return dict(counts, outcome=outcome, t_end=t_end, t_contact=t_contact,
+                t_charge=t_charge, lost_time=lost_time,
+                lost_count=lost_count)
+
+
+def summarize(result):
+    ''' Reduces the results of a batch to a few statistics.
+    @param result The dictionary returned by @c run_batch()
+    @return A dictionary with the fractions won, drawn and lost, the mean
+        times to first contact and to the first charge in seconds over
+        matches in which they happened, the mean time in seconds from
+        losing the opponent to charging it again, and for each of @c stall
+        and @c slip the mean time in seconds to detect one and the
+        fractions of them missed and of detections which were false '''
+    outcome = result['outcome']
+    contact = result['t_contact']
+    touched = ~np.isnan(contact)
+    charge = result['t_charge']
+    charged = ~np.isnan(charge)
+    detect = {}
+    for kind in ('stall', 'slip'):
+        found = result[kind + '_found'].sum()
+        missed = result[kind + '_missed'].sum()
+        false = result[kind + '_false'].sum()
+        detect[kind] = float(result[kind + '_delay'].sum() / found) \
+            if found else float('nan')
+        detect[kind + '_missed'] = float(missed / max(1, found + missed))
+        detect[kind + '_false'] = float(false / max(1, found + false))
+    return dict(detect, **{'win': float(np.mean(outcome == WIN)),
+            'draw': float(np.mean(outcome == DRAW)),
+            'loss': float(np.mean(outcome == LOSS)),
+            'contact': float(contact[touched].mean()) if touched.any()
+            else float('nan'),
+            'charge': float(charge[charged].mean()) if charged.any()
+            else float('nan'),
+            'regain': float(result['lost_time'].sum()
+                            / max(1, result['lost_count'].sum()))})
+
+
+def _run_point(args):
+    ''' Runs one grid point of a sweep in a worker process. '''
+    params, num_matches, seed, duration = args
+    return params, summarize(run_batch(num_matches, seed, params, duration))
+
+
+def sweep(grid, num_matches, seed=0, duration=180.0, processes=None):
+    ''' Runs a batch of matches at every combination of parameter values.
+    Each batch uses the same seed, so the grid points see the same starting
+    positions.
+    @param grid A dictionary mapping @c main variable names to lists of
+        values to try
+    @param num_matches The number of matches at each grid point
+    @param seed The random seed for every batch
+    @param duration The length of a match in seconds
+    @param processes The number of worker processes, by default one per
+        CPU; 1 runs everything in this process
+    @return A list of (parameters, summary) tuples in grid order '''
+    names = sorted(grid)
+    jobs = [(dict(zip(names, values)), num_matches, seed, duration)
+            for values in itertools.product(*(grid[n] for n in names))]
+    if processes == 1:
+        return [_run_point(job) for job in jobs]
+
+    import multiprocessing
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_run_point, jobs)
+
+
+def _parse(value):
+    ''' Converts a value given on the command line to a number, or to a
+    tuple of numbers if it has colons between them. '''
+    if ':' in value:
+        return tuple(_parse(item) for item in value.split(':') if item)
+    if '.' in value or 'e' in value:
+        return float(value)
+    return int(value)
+
+
+def _show(value):
+    ''' Converts a value back to the form in which it's given by _parse().
+    '''
+    if isinstance(value, tuple):
+        return ':'.join(_show(item) for item in value) + \
+            (':' if len(value) == 1 else '')
+    return '{:g}'.format(value)
+
+
+def cli(argv):
+    ''' Runs a sweep given on the command line and prints a table. '''
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=180.0)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='NAME=V1,V2,...')
+    args = parser.parse_args(argv)
+
+    grid = {}
+    for item in args.set:
+        name, values = item.split('=', 1)
+        grid[name] = [_parse(value) for value in values.split(',')]
+
+    wall = time.perf_counter()
+    rows = sweep(grid, args.matches, args.seed, args.duration,
+                 args.processes)
+    wall = time.perf_counter() - wall
+
+    for params, summary in rows:
+        label = ' '.join('{:s}={:s}'.format(k, _show(v))
+                         for k, v in sorted(params.items())) or 'defaults'
+        print('{:<40s} win {:5.1%}  draw {:5.1%}  loss {:5.1%}  '
+              'contact {:6.2f} s  charge {:6.2f} s  regain {:5.2f} s  '
+              'stall {:4.0f} ms  slip {:4.0f} ms'.format(
+                  label, summary['win'], summary['draw'], summary['loss'],
+                  summary['contact'], summary['charge'], summary['regain'],
+                  summary['stall'] * 1000, summary['slip'] * 1000))
+    print('{:d} matches in {:.1f} s'.format(len(rows) * args.matches, wall))
+
+
+if __name__ == '__main__':
+    cli(sys.argv[1:])
@@ -0,0 +1,354 @@
+''' @file bench.py
+This file contains a suite of microbenchmarks for the hot paths of the robot
+code, run on a desktop computer with hostenv.py standing in for the board.
+Each case is timed in nanoseconds per operation (the best of several
+repeats) and its heap use is measured in bytes allocated per operation, as
+seen by @c tracemalloc at the peak of each operation. Results can be saved
+as a baseline; later runs fail if a case gets slower than the baseline by
+more than a threshold fraction or allocates more than it did. Since timings
+depend on the computer, the baseline isn't kept with the code: record one
+with @c --save before making a change. A run with no baseline to compare
+against fails rather than passing unchecked, and cases missing from the
+baseline are listed.
+
+Timings on a desktop say nothing absolute about the board, but a change
+which makes a case slower or makes it allocate here will usually do so on
+the board as well.
+@code
+python bench.py --save             # record bench_baseline.json
+python bench.py                    # compare, exit status 1 on regression
+python bench.py --threshold 0.1 queue share
+@endcode '''
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import hostenv
+
+
+## The default file in which baselines are kept, beside this file
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'bench_baseline.json')
+
+## The default fraction by which a case may be slower than its baseline
+THRESHOLD = 0.25
+
+## Bytes per operation by which a case may allocate more than its baseline
+ALLOC_SLACK = 4
+
+
+def _make_tasks(cotask, count=7):
+    ''' Makes a task list shaped like the one in main.py. '''
+    def idle():
+        while True:
+            yield 0
+
+    task_list = cotask.TaskList()
+    tasks = []
+    for num, (pri, period) in enumerate(((5, 30), (4, 100), (4, 3), (4, 3),
+                                         (2, 70), (4, 50), (2, 50))[:count]):
+        task = cotask.Task(idle, name='T' + str(num), priority=pri,
+                           period=period, profile=True)
+        task_list.append(task)
+        tasks.append(task)
+    return task_list, tasks
+
+
+def case_pri_sched_idle():
+    ''' pri_sched() when no task is ready, as in most calls. '''
+    import cotask
+    task_list, _ = _make_tasks(cotask)
+    return task_list.pri_sched
+
+
+def case_pri_sched_dispatch():
+    ''' pri_sched() running one task made ready by go(). '''
+    import cotask
+    task_list, tasks = _make_tasks(cotask)
+    motor = tasks[2]
+
+    def op():
+        motor.go()
+        task_list.pri_sched()
+    return op
+
+
+def case_pri_sched_grouped():
+    ''' pri_sched() when no task is ready, with the two 50 ms tasks run
+    as one TaskGroup as in main.py. '''
+    import cotask
+    task_list = cotask.TaskList()
+    _, tasks = _make_tasks(cotask)
+    for task in tasks[:5]:
+        task_list.append(task)
+    task_list.append(cotask.TaskGroup(tasks[5:], name='G', period=50,
+                                      profile=True))
+    return task_list.pri_sched
+
+
+def case_queue():
+    ''' A put and a get on an unprotected integer queue like Data. '''
+    import task_share
+    queue = task_share.Queue('I', 136, thread_protect=False, overwrite=True,
+                             name='bench')
+    task_share.share_list.remove(queue)
+
+    def op():
+        queue.put(123456)
+        queue.get()
+    return op
+
+
+def case_share_int():
+    ''' A put and a get on an unprotected integer share like command. '''
+    import task_share
+    share = task_share.Share('I', thread_protect=False, name='bench')
+    task_share.share_list.remove(share)
+
+    def op():
+        share.put(1)
+        share.get()
+    return op
+
+
+def case_share_float():
+    ''' A put and a get on an unprotected float share like dist. '''
+    import task_share
+    share = task_share.Share('f', thread_protect=False, name='bench')
+    task_share.share_list.remove(share)
+
+    def op():
+        share.put(42.5)
+        share.get()
+    return op
+
+
+def case_mma_bits_to_g():
+    ''' Converting an accelerometer reading to g's. '''
+    import pyb
+    import mma845x
+    mma = mma845x.MMA845x(pyb.I2C(1, pyb.I2C.MASTER), 29)
+
+    def op():
+        mma.bits_to_g(1234)
+    return op
+
+
+def case_mma_bits_to_mg():
+    ''' Converting an accelerometer reading to milli-g's. '''
+    import pyb
+    import mma845x
+    mma = mma845x.MMA845x(pyb.I2C(1, pyb.I2C.MASTER), 29)
+
+    def op():
+        mma.bits_to_mg(1234)
+    return op
+
+
+def case_mma_get_ax():
+    ''' Reading X acceleration in g's over the stand-in I2C bus. '''
+    import pyb
+    import mma845x
+    mma = mma845x.MMA845x(pyb.I2C(1, pyb.I2C.MASTER), 29)
+    mma.active()
+    return mma.get_ax
+
+
+def _nec_frame(start, command=12):
+    ''' Makes the edge times of an NEC remote frame which readIR decodes as
+    the given command. '''
+    bits = [0] * 32
+    for k in range(8):
+        bits[23 - k] = (command >> (7 - k)) & 1
+    times = [start, start + 9000, start + 13500]
+    for bit in bits:
+        times.append(times[-1] + 562)
+        times.append(times[-1] + (1687 if bit else 562))
+    times.append(times[-1] + 562)
+    return times
+
+
+def case_read_ir_frame():
+    ''' Decoding a whole start command frame with readIR(). '''
+    import task_share
+    import main
+    main.data = task_share.Queue('I', 136, thread_protect=False,
+                                 overwrite=True, name='Data')
+    main.command = task_share.Share('I', thread_protect=False,
+                                    name='command')
+    task_share.share_list.remove(main.data)
+    task_share.share_list.remove(main.command)
+    frame = _nec_frame(1000)
+
+    def op():
+        data = main.data
+        for stamp in frame:
+            data.put(stamp)
+        main.command.put(0)
+        decoder = main.readIR()
+        next(decoder)
+        while data.num_in() >= 2:
+            next(decoder)
+        data.get()
+    return op
+
+
+def case_set_duty_cycle():
+    ''' Setting a motor's duty cycle through the stand-in timers. '''
+    import pyb
+    import motor
+    mot = motor.MotorDriver(pyb.Pin.board.PB4, pyb.Pin.board.PB5,
+                            pyb.Pin.board.PA10, 3)
+
+    def op():
+        mot.set_duty_cycle(65)
+        mot.set_duty_cycle(-65)
+    return op
+
+
+## The benchmark cases by name. Each makes the operation to be measured.
+CASES = {'pri_sched_idle': case_pri_sched_idle,
+         'pri_sched_dispatch': case_pri_sched_dispatch,
+         'pri_sched_grouped': case_pri_sched_grouped,
+         'queue': case_queue,
+         'share_int': case_share_int,
+         'share_float': case_share_float,
+         'mma_bits_to_g': case_mma_bits_to_g,
+         'mma_bits_to_mg': case_mma_bits_to_mg,
+         'mma_get_ax': case_mma_get_ax,
+         'read_ir_frame': case_read_ir_frame,
+         'set_duty_cycle': case_set_duty_cycle}
+
+
+def time_op(op, target=0.05, repeat=5):
+    ''' Times an operation.
+    @param op The operation, a function taking no arguments
+    @param target Roughly how long in seconds each repeat should take
+    @param repeat How many repeats to take the best of
+    @return The time per operation in nanoseconds '''
+    number = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed > target * 1e9 / 10 or number > 1 << 24:
+            break
+        number *= 10
+    number = max(1, int(number * target * 1e9 / max(elapsed, 1)))
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        elapsed = (time.perf_counter_ns() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def alloc_op(op, number=200):
+    ''' Measures the heap an operation uses.
+    @param op The operation, a function taking no arguments
+    @param number How many times to run it
+    @return The average number of bytes allocated at the peak of each run '''
+    op()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(number):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op()
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / number
+
+
+def run(names=None):
+    ''' Runs benchmark cases.
+    @param names The names of the cases to run, by default all of them
+    @return A dictionary of {'ns': ..., 'bytes': ...} results by name '''
+    hostenv.install(hostenv.VirtualClock())
+    results = {}
+    for name in names or CASES:
+        op = CASES[name]()
+        results[name] = {'ns': time_op(op), 'bytes': alloc_op(op)}
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    ''' Checks results against a baseline.
+    @param results The dictionary returned by run()
+    @param baseline A dictionary of earlier results
+    @param threshold The fraction by which a case may be slower
+    @return A list of (name, reason) tuples for the cases which regressed '''
+    failures = []
+    for name, now in sorted(results.items()):
+        then = baseline.get(name)
+        if then is None:
+            continue
+        if now['ns'] > then['ns'] * (1 + threshold):
+            failures.append((name, '{:.0f}% slower'.format(
+                100 * (now['ns'] / then['ns'] - 1))))
+        if now['bytes'] > then['bytes'] + ALLOC_SLACK:
+            failures.append((name, 'allocates {:.0f} B/op more'.format(
+                now['bytes'] - then['bytes'])))
+    return failures
+
+
+def main(argv):
+    ''' Runs the suite as told by the command line and prints the results.
+    @return The number of regressions found, or 1 if there's no baseline '''
+    import argparse
+    parser = argparse.ArgumentParser(description='Robot microbenchmarks')
+    parser.add_argument('cases', nargs='*', help='cases to run')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the baseline')
+    args = parser.parse_args(argv)
+
+    results = run(args.cases or None)
+    try:
+        with open(args.baseline) as base_file:
+            baseline = json.load(base_file)['cases']
+    except OSError:
+        baseline = None
+
+    print('CASE                       NS/OP   BASELINE     B/OP')
+    for name, res in results.items():
+        base = baseline.get(name) if baseline else None
+        print('{:<20s}{: 12.1f} {:>10s}{: 9.1f}'.format(
+            name, res['ns'], '{:.1f}'.format(base['ns']) if base else '-',
+            res['bytes']))
+
+    if args.save:
+        baseline = baseline or {}
+        baseline.update(results)
+        with open(args.baseline, 'w') as base_file:
+            json.dump({'platform': sys.implementation.name + ' '
+                       + sys.version.split()[0], 'cases': baseline},
+                      base_file, indent=1, sort_keys=True)
+        print('Baseline saved to ' + args.baseline)
+        return 0
+
+    if baseline is None:
+        print('NO BASELINE in {:s}; record one with --save'.format(
+            args.baseline))
+        return 1
+    missing = [name for name in results if name not in baseline]
+    if missing:
+        print('Not in the baseline, so not checked: ' + ', '.join(missing))
+    failures = compare(results, baseline, args.threshold)
+    for name, reason in failures:
+        print('REGRESSION {:s}: {:s}'.format(name, reason))
+    return len(failures)
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv[1:]) else 0)
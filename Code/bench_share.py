@@ -0,0 +1,88 @@
+''' @file bench_share.py
+This file measures how many queue and share operations per second each
+variant of the task_share transfer code manages, for each type of data.
+It runs on the board, where both the Viper and the plain variants can be
+timed, or on a desktop computer, where only the plain variant exists:
+@code
+import bench_share
+bench_share.run()
+@endcode '''
+
+try:
+    import pyb
+except ImportError:
+    import hostenv
+    hostenv.install()
+
+import utime
+import task_share
+
+
+## The number of put and get pairs timed for each case
+COUNT = 2000
+
+## The type codes which are timed
+TYPE_CODES = 'bBhHiIf'
+
+
+def _rate(count, start):
+    ''' Converts a count of operations since a start time to operations
+    per second. '''
+    elapsed = utime.ticks_diff(utime.ticks_us(), start)
+    return count * 1000000 // max(1, elapsed)
+
+
+def time_queue(type_code, fast, count=COUNT):
+    ''' Times putting items into a queue and getting them out again.
+    @param type_code The type of data in the queue
+    @param fast @c True to use the Viper transfer code if it handles the type
+    @param count The number of put and get pairs
+    @return Operations (puts plus gets) per second '''
+    queue = task_share.Queue(type_code, 16, thread_protect=False,
+                             name='bench')
+    task_share.share_list.remove(queue)
+    queue._put, queue._get = task_share.transfer_funs(type_code, fast)[:2]
+    put = queue.put
+    get = queue.get
+    start = utime.ticks_us()
+    for k in range(count):
+        put(k & 0x7F)
+        get()
+    return _rate(2 * count, start)
+
+
+def time_share(type_code, fast, count=COUNT):
+    ''' Times writing and reading a share.
+    @param type_code The type of data in the share
+    @param fast @c True to use the Viper transfer code if it handles the type
+    @param count The number of put and get pairs
+    @return Operations (puts plus gets) per second '''
+    share = task_share.Share(type_code, thread_protect=False, name='bench')
+    task_share.share_list.remove(share)
+    share._put, share._get = task_share.transfer_funs(type_code, fast)[2:]
+    put = share.put
+    get = share.get
+    start = utime.ticks_us()
+    for k in range(count):
+        put(k & 0x7F)
+        get()
+    return _rate(2 * count, start)
+
+
+def run(count=COUNT):
+    ''' Prints a table of operations per second for each type and variant.
+    '''
+    variants = [('viper', True), ('plain', False)] if task_share.VIPER \
+        else [('plain', False)]
+    print('TYPE  VARIANT    QUEUE OPS/S    SHARE OPS/S')
+    for type_code in TYPE_CODES:
+        for label, fast in variants:
+            if fast and type_code not in 'bBhHiIlL':
+                continue
+            print('{:<6s}{:<8s}{: 14d}{: 15d}'.format(
+                type_code, label, time_queue(type_code, fast, count),
+                time_share(type_code, fast, count)))
+
+
+if __name__ == '__main__':
+    run()
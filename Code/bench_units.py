@@ -0,0 +1,94 @@
+''' @file bench_units.py
+This file compares the integer units used by the sensor tasks and the Brain
+task (mm and milli-g in @c Share('i')) with the float units they used before
+(cm and g in @c Share('f')). One tick converts an ultrasonic echo time and
+an accelerometer reading, writes both shares, and reads them back against
+the Brain's thresholds, as the tasks do. The run time and the heap allocated
+per tick are printed for each path. Allocation can only be measured on the
+board, where @c gc.mem_alloc() exists:
+@code
+import bench_units
+bench_units.run()
+@endcode '''
+
+try:
+    import pyb
+except ImportError:
+    import hostenv
+    hostenv.install()
+
+import gc
+import utime
+import pyb
+import task_share
+import mma845x
+
+
+## The number of ticks timed for each path
+COUNT = 2000
+
+
+def _shares(type_code):
+    ''' Makes a dist and an accel share of the given type, kept out of the
+    system-wide list. '''
+    dist = task_share.Share(type_code, thread_protect=False, name='dist')
+    accel = task_share.Share(type_code, thread_protect=False, name='accel')
+    task_share.share_list.remove(dist)
+    task_share.share_list.remove(accel)
+    return dist, accel
+
+
+def float_tick(mma, dist, accel, k):
+    ''' One tick in the old units: cm and g as floats. '''
+    dist.put((1000 + (k & 63)) / 2 / 29)
+    accel.put(mma.bits_to_g((k & 255) - 128))
+    return dist.get() > 20 or abs(accel.get()) > 0.07
+
+
+def int_tick(mma, dist, accel, k):
+    ''' One tick in the integer units of main.py: mm and milli-g. '''
+    dist.put((1000 + (k & 63)) * 5 // 29)
+    accel.put(mma.bits_to_mg((k & 255) - 128))
+    return dist.get() > 200 or abs(accel.get()) > 70
+
+
+def time_path(tick, type_code, count=COUNT):
+    ''' Runs a path for a number of ticks.
+    @param tick The function which runs one tick
+    @param type_code The type code of the shares
+    @param count The number of ticks
+    @return A tuple (microseconds per tick, bytes allocated per tick); the
+        allocation is @c None where it can't be measured '''
+    mma = mma845x.MMA845x(pyb.I2C(1, pyb.I2C.MASTER), 29)
+    dist, accel = _shares(type_code)
+    mem_alloc = getattr(gc, 'mem_alloc', None)
+
+    tick(mma, dist, accel, 0)
+    gc.collect()
+    gc.disable()
+    try:
+        before = mem_alloc() if mem_alloc else 0
+        start = utime.ticks_us()
+        for k in range(count):
+            tick(mma, dist, accel, k)
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        after = mem_alloc() if mem_alloc else 0
+    finally:
+        gc.enable()
+
+    alloc = (after - before) / count if mem_alloc else None
+    return elapsed / count, alloc
+
+
+def run(count=COUNT):
+    ''' Prints the time and allocation per tick of each path. '''
+    print('PATH    US/TICK  BYTES/TICK')
+    for label, tick, type_code in (('float', float_tick, 'f'),
+                                   ('int', int_tick, 'i')):
+        usec, alloc = time_path(tick, type_code, count)
+        print('{:<6s}{: 9.2f}{:>12s}'.format(
+            label, usec, '-' if alloc is None else '{:.1f}'.format(alloc)))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,252 @@
+''' @file console.py
+This file runs a command console on the USB serial port while the robot
+runs, so shares, thresholds and controller gains can be looked at and
+changed, and the profiling tables printed, without stopping the scheduler.
+The Console task reads at most a few characters each run and writes at most
+a few dozen, so a command never holds up the motors for long; a command's
+reply is made when its line is finished and then trickled out over the
+following runs, and the long tables are made a row at a time as they go
+out. Commands, each ended by Enter:
+@code
+help                  list the commands
+get dist              show a share or queue
+set velocity 40       put a value into a share
+param DIST_LIMIT 250  show or change a constant in main.py
+gain R 0.5 0.02       show or change a wheel controller's gain and feed forward
+tasks                 show the task list's profiling table
+shares                show every share and queue
+quit                  stop the scheduler
+@endcode
+Only the constants which main.py reads each time they're used may be changed
+by @c param; others are copied into objects when the program starts, so
+changing them later would do nothing. Each keeps the type of its value. A
+command which fails is answered with the error; the tasks keep running. '''
+
+import task_share
+
+
+## The longest command line; longer lines are thrown away
+LINE_SIZE = 64
+
+HELP = ('commands: get NAME | set NAME VALUE | param NAME [VALUE] | '
+        'gain R|L [GAIN [FF]] | tasks | shares | quit\r\n')
+
+
+def _number(text):
+    ''' Reads a number typed into the console.
+    @param text The number as typed
+    @return An int, or a float if the text has a decimal point or exponent '''
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+
+class Console:
+    ''' This class reads command lines from a serial port a few characters
+    at a time and carries them out. '''
+
+    def __init__(self, stream, task_list, params=None, controllers=None,
+                 max_in=16, max_out=48, live=(), nonzero=()):
+        ''' Sets up the console; its task runs run().
+        @param stream The serial port, such as a @c pyb.USB_VCP
+        @param task_list The cotask.TaskList whose table @c tasks shows
+        @param params The dictionary of constants which @c param may show,
+            such as @c globals() of main.py. Only names in capitals whose
+            values are numbers are shown.
+        @param controllers A dictionary of the Controller of each wheel by
+            name, such as @c {'R': Con_R, 'L': Con_L}
+        @param max_in The most characters read in one run
+        @param max_out The most characters written in one run
+        @param live The names of the constants which @c param may change
+        @param nonzero The names of those which may not be made zero, such
+            as those which are divided by '''
+        self.stream = stream
+        self.task_list = task_list
+        self.params = params if params is not None else {}
+        self.controllers = controllers if controllers is not None else {}
+        self.max_out = max_out
+        self.live = live
+        self.nonzero = nonzero
+        self.done = False
+
+        # Characters read but not yet looked at, and the line so far
+        self._buf = bytearray(max_in)
+        self._view = memoryview(self._buf)
+        self._next = 0
+        self._count = 0
+        self._line = bytearray(LINE_SIZE)
+        self._length = 0
+        self._overflow = False
+
+        # The parts of the reply still to be made, the part being written
+        # and how much of it has gone out
+        self._reply = None
+        self._out = None
+        self._sent = 0
+
+    def run(self):
+        ''' The console task. Each run it writes the next part of the reply
+        to the last command or, once that's all out, reads and echoes a few
+        characters, carrying out the command if a line is finished. '''
+        while True:
+            self.poll()
+            yield 0
+
+    def poll(self):
+        ''' Does one run's worth of the console's work. '''
+        if self._out is not None:
+            end = min(self._sent + self.max_out, len(self._out))
+            wrote = self.stream.write(self._out[self._sent:end])  # alloc: ok
+            self._sent += wrote if wrote else 0
+            if self._sent >= len(self._out):
+                self._out = None
+            return
+
+        if self._reply is not None:
+            self._out = memoryview(self._next_part().encode())  # alloc: ok
+            self._sent = 0
+            return
+
+        if self._next >= self._count:
+            got = self.stream.readinto(self._buf) if self.stream.any() else 0
+            self._next = 0
+            self._count = got if got else 0
+            if not self._count:
+                return
+
+        # Look at the characters up to the end of a line, echoing them
+        start = self._next
+        ended = False
+        while self._next < self._count and not ended:
+            char = self._buf[self._next]
+            self._next += 1
+            if char == 13 or char == 10:
+                ended = self._length > 0 or self._overflow
+            elif char == 8 or char == 127:
+                if self._length:
+                    self._length -= 1
+            elif self._length < LINE_SIZE:
+                self._line[self._length] = char
+                self._length += 1
+            else:
+                self._overflow = True
+        # The line ending isn't echoed, since the reply starts a new line
+        end = self._next - 1 if ended else self._next
+        self.stream.write(self._view[start:end])  # alloc: ok
+        if ended:
+            self._finish_line()
+
+    def _finish_line(self):  # alloc: ok
+        ''' Carries out the command on the line just finished and starts its
+        reply. Only this, the commands and their replies allocate memory;
+        runs with nothing typed allocate none. '''
+        try:
+            if self._overflow:
+                reply = 'line too long\r\n'
+            else:
+                reply = self.execute(bytes(self._line[:self._length])
+                                     .decode())
+        except Exception as err:
+            reply = 'error: {}\r\n'.format(err)
+        finally:
+            self._length = 0
+            self._overflow = False
+        self._reply = iter((reply, )) if isinstance(reply, str) else reply
+        self._out = memoryview(b'\r\n')
+        self._sent = 0
+
+    def _next_part(self):  # alloc: ok
+        ''' Makes the next part of the reply to the last command; after the
+        last, the prompt.
+        @return The part, to be written out '''
+        try:
+            return next(self._reply)
+        except StopIteration:
+            self._reply = None
+            return '> '
+        except Exception as err:
+            self._reply = None
+            return 'error: {}\r\n> '.format(err)
+
+    def execute(self, line):  # alloc: ok
+        ''' Carries out a command. Nothing it does wrong can stop the tasks;
+        the error is the reply instead.
+        @param line The command line, without the line ending
+        @return The reply, each line ending in CR LF, or for a long one a
+            generator of its parts '''
+        words = line.split()
+        cmd = words[0] if words else ''
+        try:
+            if cmd == 'get' and len(words) == 2:
+                share = task_share.find(words[1])
+                if share is None:
+                    return 'no share ' + words[1] + '\r\n'
+                if not isinstance(share, task_share.Share):
+                    # Reading a queue would take an item out of it
+                    return str(share) + '\r\n'
+                return '{:s} = {}\r\n'.format(words[1], share.get())
+            if cmd == 'set' and len(words) == 3:
+                share = task_share.find(words[1])
+                if not isinstance(share, task_share.Share):
+                    return 'no share ' + words[1] + '\r\n'
+                share.put(_number(words[2]))
+                return '{:s} = {}\r\n'.format(words[1], share.get())
+            if cmd == 'param' and len(words) in (2, 3):
+                return self._param(words[1], words[2:])
+            if cmd == 'gain' and 2 <= len(words) <= 4:
+                con = self.controllers.get(words[1])
+                if con is None:
+                    return 'no controller ' + words[1] + '\r\n'
+                if len(words) > 2:
+                    con.setGain(_number(words[2]))
+                if len(words) > 3:
+                    con.setFeedForward(_number(words[3]))
+                return '{:s}: gain {} feed forward {}\r\n'.format(
+                    words[1], con.gain, con.feedForward)
+            if cmd == 'tasks':
+                return self._lines(self.task_list.rows())
+            if cmd == 'shares':
+                return self._lines(str(item) + '\n'
+                                   for item in task_share.share_list)
+            if cmd == 'quit':
+                self.done = True
+                return 'stopping\r\n'
+        except ValueError:
+            return 'bad number\r\n'
+        except Exception as err:
+            return 'error: {}\r\n'.format(err)
+        return HELP
+
+    def _param(self, name, value):  # alloc: ok
+        ''' Shows or changes a constant, keeping the type of its value.
+        @param name The name of the constant
+        @param value A list holding the new value as typed, or empty to
+            just show it
+        @return The reply '''
+        old = self.params.get(name)
+        if not name.isupper() or not isinstance(old, (int, float)):
+            return 'no number ' + name + '\r\n'
+        if value:
+            if name not in self.live:
+                return name + ' is only read at startup\r\n'
+            new = _number(value[0])
+            if isinstance(old, bool):
+                if new not in (0, 1):
+                    return name + ' is 0 or 1\r\n'
+                new = bool(new)
+            elif isinstance(old, int):
+                if not isinstance(new, int):
+                    return name + ' is a whole number\r\n'
+            else:
+                new = float(new)
+            if new == 0 and name in self.nonzero:
+                return name + ' cannot be 0\r\n'
+            self.params[name] = new
+        return '{:s} = {}\r\n'.format(name, self.params[name])
+
+    def _lines(self, rows):  # alloc: ok
+        ''' Turns rows ending in newlines into parts of a reply.
+        @param rows An iterable of the rows
+        @return A generator of the rows ending in CR LF '''
+        for row in rows:
+            yield row.replace('\n', '\r\n')
@@ -6,19 +6,53 @@ import task_share
 import utime
 
 
+## The largest effort in percent which mix() gives either wheel
+MAX_EFFORT = 100
+
+## Bits of the state found by Traction: each wheel stalled or slipping
+STALL_R = 1
+STALL_L = 2
+SLIP_R = 4
+SLIP_L = 8
+STALLED = STALL_R | STALL_L
+SLIPPING = SLIP_R | SLIP_L
+
+
+def mix(velocity, turn, side):
+    ''' Mixes a drive command into the effort for one wheel. Turning to
+    the left (counterclockwise, seen from above) speeds up the right wheel
+    and slows the left. If either wheel would need more than MAX_EFFORT,
+    both are scaled down together so the robot still follows the same arc.
+    Only integers are used, so nothing is allocated.
+    @param velocity The forward speed in percent of full effort
+    @param turn The turn rate in percent of full effort, positive to the left
+    @param side 1 for the right wheel or -1 for the left wheel
+    @return The effort in percent for that wheel '''
+    right = velocity + turn
+    left = velocity - turn
+    most = max(abs(right), abs(left))
+    effort = right if side > 0 else left
+    if most > MAX_EFFORT:
+        effort = effort * MAX_EFFORT // most
+    return effort
+
+
 class Controller:
     ''' This class implements closed-loop proportional 
     control for the ME405 board. '''
 
-    def __init__(self, setGain, setPoint, pin1, pin2, timNum):
+    def __init__(self, setGain, setPoint, pin1, pin2, timNum, feedForward=0):
         ''' Initializes the pins and timer.
         @param setGain A float storing the gain value
         @param setPoint An int storing the set point value
         @param pin1 A Pin object for timer channel 1
         @param pin2 A Pin object for timer channel 2
-        @param timNum An int holding the timer number '''
+        @param timNum An int holding the timer number
+        @param feedForward A float storing the effort per encoder tick per
+            run needed to hold a speed, as found by motorid.py '''
         self.gain = setGain
         self.setPoint = setPoint
+        self.feedForward = feedForward
         self.pinA = pyb.Pin(pin1, pyb.Pin.IN)
         self.pinB = pyb.Pin(pin2, pyb.Pin.IN)
         self.timer = pyb.Timer(timNum)
@@ -29,18 +63,32 @@ class Controller:
         # set all tick values to 0
         self.curTicks = 0 # An integer to save tick value from counter()
         self.pastTicks = 0 # An integer to save previous value of curTicks
+        self.speed = 0 # Encoder ticks moved between the last two reads
+        self.position = 0 # Encoder ticks moved since the start or reset
         self.timer.counter(0)
         self.timeRef = utime.ticks_ms()
         
-    def run(self, direction):
-        ''' Calculates the actuation value to power the motor. '''
+    def update(self):
+        ''' Reads the encoder and saves the ticks moved since the last read
+        in speed, allowing for the 16 bit counter wrapping around, and adds
+        them to position. '''
 
         self.pastTicks = self.curTicks # save previous tick value
         self.curTicks = self.timer.counter() # get new tick value
         #print("CurTicks: " + str(self.curTicks) + " PastTicks: " + str(self.pastTicks))
         
         # positional difference between last read and current read
-        distance = self.curTicks - self.pastTicks
+        distance = (self.curTicks - self.pastTicks) & 0xFFFF
+        if distance > 0x7FFF:
+            distance -= 0x10000
+        self.speed = distance
+        self.position += distance
+        return distance
+
+    def run(self, direction):
+        ''' Calculates the actuation value to power the motor. '''
+
+        self.update()
         
         if direction == 1:
             # wants to move forward
@@ -54,6 +102,32 @@ class Controller:
         
         return actuatSig
         
+    def drive(self, velocity, turn, side):
+        ''' Calculates the actuation value for this wheel's share of a
+        drive command, reading the encoder as run() does.
+        @param velocity The forward speed in percent of full effort
+        @param turn The turn rate in percent of full effort, positive to the
+            left
+        @param side 1 if this is the right wheel or -1 if the left
+        @return The effort in percent '''
+
+        self.update()
+        return mix(velocity, turn, side)
+
+    def control(self, target):
+        ''' Calculates the actuation value which drives the motor at a
+        speed, using feed forward plus proportional control.
+        @param target The desired speed in encoder ticks per run
+        @return The effort in percent, limited to +/-100 '''
+
+        error = target - self.update()
+        actuatSig = self.feedForward * target + self.gain * error
+        if actuatSig > 100:
+            actuatSig = 100
+        elif actuatSig < -100:
+            actuatSig = -100
+        return actuatSig
+        
     def setSetPoint(self, setPoint):
         ''' Set the desired setPoint for the controller. 
         @param setPoint The desired location '''
@@ -64,13 +138,134 @@ class Controller:
         @param setGain The new proportional gain value '''
         self.gain = setGain
         
+    def setFeedForward(self, feedForward):
+        ''' Changes the feed forward gain for the controller. 
+        @param feedForward The new effort per encoder tick per run '''
+        self.feedForward = feedForward
+        
     def reset(self):
         ''' Resets the values read in the encoder for the next test. '''
         self.curTicks = 0 # An integer to save tick value from counter()
         self.pastTicks = 0 # An integer to save previous value of curTicks
+        self.speed = 0
+        self.position = 0
         self.timer.counter(0)
         self.timeRef = utime.ticks_ms()
     
     def clearTime(self):
         ''' Sets the reference time. '''
         self.timeRef = utime.ticks_ms()
+
+
+class Traction:
+    ''' This class finds whether either drive wheel is stalled or slipping
+    by comparing the effort commanded of each wheel with how fast its
+    encoder turns, as a percentage of the speed that effort gives the wheel
+    unloaded. A wheel is stalled when it turns at less than @c stall percent
+    of that speed, or backward. It's slipping when, with the robot pushing
+    something, it turns at more than @c slip percent, which a loaded wheel
+    can only do if it has lost its grip; or, at any time, when it turns
+    @c gap percent more of that speed than the other wheel does. A wheel
+    takes time to reach the speed of a new effort, which may look like a
+    slip, so no slip is found for @c settle updates after either effort
+    changes. A state has to be found @c runs times in a row before it's
+    reported, so one noisy reading doesn't count. Only integers are used, so nothing is
+    allocated. '''
+
+    def __init__(self, free_speed, stall=30, slip=85, gap=50, least=30,
+                 runs=2, settle=8):
+        ''' Sets up the detector with both wheels taken to be gripping.
+        @param free_speed The speed in encoder ticks per second at which an
+            unloaded wheel turns at full effort, as found by motorid.py
+        @param stall The percentage of the unloaded speed below which a
+            wheel is stalled
+        @param slip The percentage of the unloaded speed above which a
+            wheel is slipping while the robot pushes
+        @param gap The difference in percentage of the unloaded speed by
+            which a wheel slipping turns faster than the other
+        @param least The smallest effort in percent at which a wheel is
+            judged; with less, it may not be meant to move
+        @param runs How many updates in a row a state must be found
+        @param settle How many updates after a change of effort pass before
+            a slip may be found '''
+        self.free_speed = free_speed
+        self.stall = stall
+        self.slip = slip
+        self.gap = gap
+        self.least = least
+        self.runs = runs
+        self.settle = settle
+        self.state = 0
+        self._seen = 0
+        self._count = 0
+        self._effortR = 0
+        self._effortL = 0
+        self._wait = 0
+
+    def _ratio(self, effort, speed):
+        ''' Finds how fast a wheel turns for its effort.
+        @param effort The effort in percent commanded of the wheel
+        @param speed The wheel's speed in encoder ticks per second forward
+        @return The speed in percent of that which the effort would give
+            the wheel unloaded, negative if it turns the other way, or
+            @c None if the effort is too small to judge '''
+        if abs(effort) < self.least:
+            return None
+        return speed * 100 // (effort * self.free_speed // 100)
+
+    def update(self, effortR, speedR, effortL, speedL, loaded):
+        ''' Judges both wheels from their latest efforts and speeds.
+        @param effortR The effort in percent commanded of the right wheel,
+            positive forward
+        @param speedR The right wheel's speed in encoder ticks per second,
+            positive forward
+        @param effortL The same for the left wheel
+        @param speedL The same for the left wheel
+        @param loaded True if the robot is pushing something
+        @return The state: STALL_R, STALL_L, SLIP_R and SLIP_L or'ed
+            together for what's been found, 0 if both wheels grip '''
+        if effortR != self._effortR or effortL != self._effortL:
+            self._effortR = effortR
+            self._effortL = effortL
+            self._wait = self.settle
+        elif self._wait > 0:
+            self._wait -= 1
+        settled = self._wait == 0
+
+        right = self._ratio(effortR, speedR)
+        left = self._ratio(effortL, speedL)
+        found = 0
+        if right is not None:
+            if right < self.stall:
+                found |= STALL_R
+            elif settled and loaded and right > self.slip:
+                found |= SLIP_R
+        if left is not None:
+            if left < self.stall:
+                found |= STALL_L
+            elif settled and loaded and left > self.slip:
+                found |= SLIP_L
+        if settled and right is not None and left is not None \
+                and not found & STALLED:
+            if right - left > self.gap:
+                found |= SLIP_R
+            elif left - right > self.gap:
+                found |= SLIP_L
+
+        # Report a state only once it's been found often enough
+        if found == self._seen:
+            if self._count < self.runs:
+                self._count += 1
+        else:
+            self._seen = found
+            self._count = 1
+        if self._count >= self.runs:
+            self.state = found
+        return self.state
+
+    def reset(self):
+        ''' Takes both wheels to be gripping again. '''
+        self.state = 0
+        self._seen = 0
+        self._count = 0
+        self._wait = 0
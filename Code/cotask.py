@@ -7,16 +7,134 @@
 #  the @c ready() method if appropriate. References to all the tasks to be run
 #  in the system are kept in a list maintained by class @c CoTaskList; the 
 #  system scheduler then runs the tasks' @c run() methods according to a 
-#  chosen scheduling algorithm such as round-robin or highest-priority-first. 
+#  chosen scheduling algorithm such as round-robin, highest-priority-first
+#  or earliest-deadline-first. 
 #
 #  @copyright This program is copyrighted by JR Ridgely and released under the
 #  GNU Public License, version 3.0. 
 
 import gc                              # Memory allocation garbage collector
+import array                           # Compact storage for trace records
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
 
 
+## The number of task runs kept by the trace buffer when it is created
+#  automatically by the first task which has tracing enabled
+TRACE_SIZE = 256
+
+## The trace buffer shared by all traced tasks, or @c None until one is
+#  needed. A larger or smaller buffer may be put here before creating tasks.
+trace_buffer = None
+
+## The function which reports how many bytes of heap are in use. CPython has
+#  no @c gc.mem_alloc(), so on a desktop computer allocation is shown as zero.
+_mem_alloc = getattr (gc, 'mem_alloc', lambda: 0)
+
+
+class TraceBuffer:
+    """ This class implements a ring buffer which records the runs of all
+    traced tasks. For each run the task's number, the start and end times in
+    microseconds and the state yielded by the task are stored in arrays which
+    are allocated once, so tracing doesn't allocate memory while the tasks
+    run; when the buffer is full, the oldest runs are overwritten. The state
+    yielded by a traced task must be a small integer. Times are kept to 30
+    bits as @c utime.ticks_us() is on the board.
+
+    The contents can be printed with @c dump() and turned into a timeline
+    on a desktop computer by @c tracexport.py. """
+
+    def __init__ (self, size = TRACE_SIZE):
+        """ Allocate the arrays in which task runs will be recorded.
+        @param size The number of task runs which can be kept """
+
+        self._size = size
+        self._task = array.array ('B', size * [0])
+        self._start = array.array ('I', size * [0])
+        self._end = array.array ('I', size * [0])
+        self._state = array.array ('h', size * [0])
+
+        # Index at which the next run is to be written and number kept
+        self._wr_idx = 0
+        self._num_items = 0
+
+        ## The names of the traced tasks, in order of their numbers
+        self.names = []
+
+        gc.collect ()
+
+
+    def add_task (self, name):
+        """ Give a task a number by which its runs will be recorded.
+        @param name The name of the task
+        @return The number of the task """
+
+        self.names.append (name)
+        return len (self.names) - 1
+
+
+    @micropython.native
+    def record (self, task_num, start, end, state):
+        """ Record one run of a task, overwriting the oldest run if the 
+        buffer is full. 
+        @param task_num The task's number from @c add_task()
+        @param start The time at which the run began, from @c ticks_us()
+        @param end The time at which the run finished
+        @param state The state the task yielded """
+
+        idx = self._wr_idx
+        self._task[idx] = task_num
+        self._start[idx] = start & 0x3FFFFFFF
+        self._end[idx] = end & 0x3FFFFFFF
+        self._state[idx] = state
+        idx += 1
+        if idx >= self._size:
+            idx = 0
+        self._wr_idx = idx
+        if self._num_items < self._size:
+            self._num_items += 1
+
+
+    def clear (self):
+        """ Discard all recorded runs. """
+
+        self._wr_idx = 0
+        self._num_items = 0
+
+
+    def entries (self):
+        """ Generate the recorded runs, oldest first, each as a tuple of
+        task number, start time, end time and state. """
+
+        idx = self._wr_idx - self._num_items
+        if idx < 0:
+            idx += self._size
+        for count in range (self._num_items):
+            yield (self._task[idx], self._start[idx], self._end[idx],
+                   self._state[idx])
+            idx += 1
+            if idx >= self._size:
+                idx = 0
+
+
+    def dump (self):
+        """ Print the task names and recorded runs in the format read by
+        @c tracexport.py. One line is printed at a time so that no large
+        string need be built. """
+
+        for num, name in enumerate (self.names):
+            print ('task', num, name)
+        for item in self.entries ():
+            print (item[0], item[1], item[2], item[3])
+
+
+    def __repr__ (self):
+        """ Show how full the trace buffer is. """
+
+        return 'TraceBuffer {:d}/{:d} runs, {:d} tasks'.format (
+            self._num_items, self._size, len (self.names))
+
+
 class Task:
     """ This class implements behavior common to tasks in a cooperative 
     multitasking system which runs in MicroPython. The ability to be scheduled
@@ -62,8 +180,10 @@ class Task:
             The time can be given in a @c float or @c int; it will be 
             converted to microseconds for internal use by the scheduler
         @param profile Set to @c True to enable run-time profiling 
-        @param trace Set to @c True to generate a list of transitions between
-            states. @b Note: This slows things down and allocates memory. """
+        @param trace Set to @c True to record each run of the task, with the 
+            state it yields, in the shared trace buffer @c trace_buffer. 
+            @b Note: This slows things down a little; the states must be 
+            small integers. """
 
         # The function which is run to implement this task's code. Since it 
         # is a generator, we "run" it here, which doesn't actually run it but
@@ -94,15 +214,16 @@ class Task:
         self._prof = profile
         self.reset_profile ()
 
-        # The previous state in which the task last ran. It is used to watch
-        # for and track state transitions.
-        self._prev_state = 0
-
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
+        # If tracing has been enabled, get a number with which this task's
+        # runs are recorded in the shared trace buffer, creating the buffer
+        # if this is the first task to be traced
+        global trace_buffer
         self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us ()
+        if trace:
+            if trace_buffer == None:
+                trace_buffer = TraceBuffer ()
+            self._trace_buf = trace_buffer
+            self._trace_num = trace_buffer.add_task (name)
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
@@ -121,47 +242,55 @@ class Task:
 
             # Reset the go flag for the next run
             self.go_flag = False
+            self._run ()
+            return True
 
-            # If profiling, save the start time
-            if self._prof:
-                stime = utime.ticks_us ()
+        else:
+            return False
 
-            # Run the method belonging to the state which should be run next
-            curr_state = next (self._run_gen)
 
-            # If profiling or tracing, save timing data
-            if self._prof or self._trace:
-                etime = utime.ticks_us ()
+    def _run (self):
+        """ This method runs the task's generator up to its next @c yield(),
+        keeping profiling and trace data if they're enabled. It's called by
+        @c schedule() once the task is ready, or by the @c TaskGroup to 
+        which the task belongs. """
 
-            # If profiling, save timing data
+        # If profiling or tracing, save the start time; if profiling,
+        # also save how much heap is in use
+        if self._prof or self._trace:
+            stime = utime.ticks_us ()
             if self._prof:
-                self._runs += 1
-                runt = utime.ticks_diff (etime, stime)
-                if self._runs > 2:
-                    self._run_sum += runt
-                    if runt > self._slowest:
-                        self._slowest = runt
-
-            # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
-            if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append (
-                            (utime.ticks_diff (etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect ()
-
-                self._prev_state = curr_state
-                self._prev_time = etime
-
-            return True
-
-        else:
-            return False
+                salloc = _mem_alloc ()
+
+        # Run the method belonging to the state which should be run next
+        curr_state = next (self._run_gen)
+
+        # If profiling or tracing, save timing data
+        if self._prof or self._trace:
+            etime = utime.ticks_us ()
+
+        # If profiling, save timing and allocation data. If the heap
+        # shrank, a garbage collection ran during the task and the amount
+        # it allocated is unknown, so that run isn't counted in the 
+        # allocation averages
+        if self._prof:
+            alloc = _mem_alloc () - salloc
+            self._runs += 1
+            runt = utime.ticks_diff (etime, stime)
+            if self._runs > 2:
+                self._run_sum += runt
+                if runt > self._slowest:
+                    self._slowest = runt
+            if alloc >= 0:
+                self._alloc_runs += 1
+                self._alloc_sum += alloc
+                if alloc > self._most_alloc:
+                    self._most_alloc = alloc
+
+        # If tracing is on, record the run in the preallocated buffer
+        if self._trace:
+            self._trace_buf.record (self._trace_num, stime, etime,
+                                    curr_state)
 
 
     @micropython.native
@@ -201,24 +330,32 @@ class Task:
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        self._alloc_runs = 0
+        self._alloc_sum = 0
+        self._most_alloc = 0
 
 
     def get_trace (self):
         """ This method returns a string containing the task's transition 
-        trace. The trace is a set of tuples, each of which contains a time 
-        and the states from and to which the system transitioned. 
+        trace. Each line holds the time in seconds since the oldest run in 
+        the trace buffer and the states from and to which the task 
+        transitioned. Only runs still in the trace buffer are included; 
+        @c TraceBuffer.dump() shows every run of every traced task. 
         @return A possibly quite large string showing state transitions """
 
         tr_str = 'Task ' + self.name + ':'
         if self._trace:
             tr_str += '\n'
             last_state = 0
-            total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
-                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
+            first = None
+            for item in self._trace_buf.entries ():
+                if first == None:
+                    first = item[1]
+                if item[0] == self._trace_num and item[3] != last_state:
+                    tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (
+                        utime.ticks_diff (item[2], first) / 1000000.0,
+                        last_state, item[3])
+                    last_state = item[3]
         else:
             tr_str += ' not traced'
         return (tr_str)
@@ -233,12 +370,55 @@ class Task:
         self.go_flag = True
 
 
+    def set_period (self, period):
+        """ This method changes how often the task runs. The next run is 
+        moved so that it comes one new period after the last run was due, 
+        so the task neither runs at once nor waits a whole new period. For
+        a member of a @c TaskGroup, the period should be a whole multiple 
+        of the group's; the member then runs on that fraction of the 
+        group's runs.
+        @param period The new time in milliseconds between runs, or @c None
+            if the task is from now on to be run only by @c go() """
+
+        if period == None:
+            self.period = None
+            self._next_run = None
+            return
+
+        new = int (period * 1000)
+        if self._next_run != None:
+            self._next_run = utime.ticks_diff (new - self.period, 
+                                               -self._next_run)
+        elif self.period == None:
+            self._next_run = utime.ticks_diff (new, -utime.ticks_us ())
+        self.period = new
+
+
+    def reset_phase (self, now = None):
+        """ This method restarts a timed task's period, so that it's due to
+        run right away and then once every period from then on. Any call to
+        @c go() which hasn't been acted on yet is cancelled.
+        @param now The time from @c utime.ticks_us() at which the task is to
+            be due, by default the time now """
+
+        self.go_flag = False
+        if self.period != None:
+            self._next_run = utime.ticks_us () if now == None else now
+
+
     def __repr__ (self):
         """ This method converts the task to a string for diagnostic use.
         It shows information about the task, including execution time
         profiling results if profiling has been done. """
 
-        rst = '{:<16s}{: 4d}'.format (self.name, self.priority)
+        return self._row (self.name)
+
+
+    def _row (self, label):
+        """ This method makes the line shown by @c __repr__(), with the 
+        given text in place of the task's name. """
+
+        rst = '{:<16s}{: 4d}'.format (label, self.priority)
         try:
             rst += '{: 10.1f}'.format (self.period / 1000.0)
         except TypeError:
@@ -253,17 +433,119 @@ class Task:
             if self.period != None:
                 rst += '{: 10.3f}{: 10.3f}'.format (avg_late, 
                                             self._latest / 1000.0)
+            else:
+                rst += '         -         -'
+            if self._alloc_runs > 0:
+                avg_alloc = self._alloc_sum / self._alloc_runs
+            else:
+                avg_alloc = 0.0
+            rst += '{: 10.1f}{: 10d}'.format (avg_alloc, self._most_alloc)
         return rst
 
 
 # =============================================================================
 
+class TaskGroup (Task):
+    """ This class runs several tasks which have the same period as one 
+    scheduled unit. Each time the group runs, the generator of each of its
+    member tasks is run once, in the order given. The scheduler checks 
+    whether the group is ready and dispatches it just once for all of the
+    members, so its overhead grows with the number of different rates at 
+    which tasks run rather than with the number of tasks. Each member keeps
+    its own profile and trace, but lateness is only kept for the group, as
+    the members aren't scheduled on their own. 
+    The members must not also be appended to a task list.
+
+    Example:
+    \code
+    task2 = cotask.Task (task2_fun, name = 'Task 2', profile = True)
+    task3 = cotask.Task (task3_fun, name = 'Task 3', profile = True)
+    group = cotask.TaskGroup ([task2, task3], name = 'Group 1', 
+                              priority = 2, period = 50, profile = True)
+    cotask.task_list.append (group)
+    \endcode """
+
+    def __init__ (self, tasks, name = 'Group', priority = None, 
+                  period = None, profile = False, trace = False):
+        """ Initializes a task group. 
+        @param tasks A list of the member tasks, in the order in which they
+            are to be run
+        @param name The name of the group
+        @param priority The priority of the group, by default the highest 
+            priority of any member
+        @param period The time in milliseconds between runs of the group, or
+            @c None if it's to be run by calling its @c go() method. The 
+            members' own periods are replaced by this one
+        @param profile Set to @c True to profile the group as a whole 
+        @param trace Set to @c True to trace the group as a whole """
+
+        ## The member tasks, in the order in which they are run
+        self.tasks = list (tasks)
+
+        if priority == None:
+            priority = max (task.priority for task in self.tasks)
+        Task.__init__ (self, self._run_members, name, priority, period, 
+                       profile, trace)
+
+        # The members are shown with the group's period but never check
+        # their own timers
+        for task in self.tasks:
+            task.period = self.period
+            task._next_run = None
+
+
+    def _run_members (self):
+        """ This generator is the group's task function; it runs each 
+        member once for each run of the group. """
+
+        tasks = self.tasks
+        counts = array.array ('H', [0] * len (tasks))
+        while True:
+            # A member whose period is a multiple of the group's runs on 
+            # only that fraction of the group's runs
+            k = 0
+            while k < len (tasks):
+                task = tasks[k]
+                counts[k] += 1
+                if self.period == None or task.period == None \
+                        or counts[k] * self.period >= task.period:
+                    counts[k] = 0
+                    task._run ()
+                k += 1
+            yield 0
+
+
+    def set_period (self, period):
+        """ This method changes how often the group runs, as 
+        @c Task.set_period() does, keeping each member's period the same 
+        multiple of the group's. 
+        @param period The new time in milliseconds between runs """
+
+        old = self.period
+        Task.set_period (self, period)
+        for task in self.tasks:
+            if old == None or self.period == None or task.period == None:
+                task.period = self.period
+            else:
+                task.period = task.period // old * self.period
+
+
+    def __repr__ (self):
+        """ This method shows the group's line, followed by an indented 
+        line for each member. """
+
+        rst = self._row (self.name)
+        for task in self.tasks:
+            rst += '\n' + task._row ('  ' + task.name)
+        return rst
+
+
 class TaskList:
     """ This class holds the list of tasks which will be run by the task 
     scheduler. The task list is sorted by priority so that the scheduler can 
     efficiently look through the list to find the highest priority task which
     is ready to run at any given time. Tasks can also be scheduled in a 
-    simpler "round-robin" fashion. 
+    simpler "round-robin" fashion, or by earliest deadline first. 
 
     An example showing the use of the task list is given in the documentation
     for class @c Task. """
@@ -278,6 +560,51 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        ## Every task in the list, in the order appended, whether it's being
+        #  run in the current mode or not
+        self.tasks = []
+
+        ## The run modes, each a list of the tasks which run in that mode, by
+        #  name. See @c add_mode().
+        self.modes = {}
+
+        ## The name of the run mode in effect, or @c None if all tasks run
+        self.mode = None
+
+        ## The number of bytes of heap which may be allocated before the 
+        #  scheduler collects garbage while idle, or @c None if the 
+        #  scheduler leaves garbage collection alone. See @c set_gc().
+        self.gc_threshold = None
+
+        ## The number of garbage collections run by the scheduler
+        self.gc_runs = 0
+
+        # Extra microseconds of slack required before a collection, the
+        # slowest collection seen so far and the heap in use after the last
+        self._gc_guard = 0
+        self._gc_slowest = 0
+        self._gc_base = 0
+
+        ## The percentage of time spent running tasks in the last load
+        #  window, or @c None if the load isn't measured. See 
+        #  @c set_overload().
+        self.load = None
+
+        ## The factor by which the periods of the tasks which give way under
+        #  overload are stretched, 1 when they run at their own rates
+        self.stretch = 1
+
+        # The overload policy: the window in microseconds, the bounds in 
+        # percent, the largest stretch and each task with its own period;
+        # then the busy time and start of the current window
+        self._load_window = None
+        self._load_high = 0
+        self._load_low = 0
+        self._load_max = 1
+        self._shed = []
+        self._busy = 0
+        self._load_start = 0
+
 
     def append (self, task):
         """ Append a task to the task list. The list will be sorted by task 
@@ -285,6 +612,15 @@ class TaskList:
         task which is ready to run at any given time. 
         @param task The task to be appended to the list """
 
+        self.tasks.append (task)
+        self._insert (task)
+
+
+    def _insert (self, task):
+        """ Put a task into the priority list for its priority, making that
+        list if there isn't one yet.
+        @param task The task to be put into the list """
+
         # See if there's a tasklist with the given priority in the main list
         new_pri = task.priority
         for pri in self.pri_list:
@@ -305,6 +641,39 @@ class TaskList:
         self.pri_list.sort (key=lambda pri: pri[0], reverse=True)
 
 
+    def add_mode (self, name, tasks):
+        """ Define a run mode, in which only some of the tasks are run. The
+        others are suspended: they're taken out of the priority lists, so 
+        the schedulers spend no time on them at all, until a mode in which
+        they run is put into effect by @c set_mode(). 
+        @param name The name of the mode
+        @param tasks A list of the tasks which run in the mode; they must 
+            also be appended to the task list """
+
+        self.modes[name] = list (tasks)
+
+
+    def set_mode (self, name):
+        """ Put a run mode into effect. Tasks which were suspended and run in
+        the new mode have their phase reset, so that each runs as soon as 
+        possible and then once every period from then on, as if it had just 
+        been created, rather than catching up on the runs it missed.
+        @param name The name of a mode defined by @c add_mode(), or @c None
+            to run all the tasks """
+
+        running = [task for pri in self.pri_list for task in pri[2:]]
+        active = self.tasks if name == None else self.modes[name]
+        now = utime.ticks_us ()
+
+        self.pri_list = []
+        for task in self.tasks:
+            if task in active:
+                if task not in running:
+                    task.reset_phase (now)
+                self._insert (task)
+        self.mode = name
+
+
     @micropython.native
     def rr_sched (self):
         """ This scheduling method runs tasks in a round-robin fashion. Each
@@ -325,7 +694,12 @@ class TaskList:
     def pri_sched (self):
         """ This scheduler runs tasks in a priority based fashion. Each time 
         it is called, it finds the next task which is ready to run and calls 
-        that task's @c run() method. """
+        that task's @c run() method. 
+        @return @c True if a task ran, or @c False if none was ready, so the
+            caller may sleep until the next interrupt """
+
+        if self._load_window != None:
+            stime = utime.ticks_us ()
 
         # Go down the list of priorities, beginning with the highest
         for pri in self.pri_list:
@@ -341,20 +715,212 @@ class TaskList:
                 if pri[1] >= length:
                     pri[1] = 2
                 if ran:
-                    return
+                    if self._load_window != None:
+                        self._measure_load (stime)
+                    return True
 
+        # Nothing was ready, so there may be time to collect garbage
+        if self._load_window != None:
+            self._measure_load (None)
+        if self.gc_threshold != None:
+            self.idle_gc ()
+        return False
 
-    def __repr__ (self):
-        """ Create some diagnostic text showing the tasks in the task list.
-        """
 
-        ret_str = 'TASK             PRI    PERIOD    RUNS   AVG DUR   MAX ' \
-            'DUR  AVG LATE  MAX LATE\n'
+    @micropython.native
+    def edf_sched (self):
+        """ This scheduler runs tasks in earliest-deadline-first order. Each
+        time it is called, it looks through all the tasks for those which are
+        ready to run and calls the @c run() method of the one whose deadline,
+        the end of the period in which it became ready, comes soonest. A task
+        which has been made ready by @c go() is taken to be due right away.
+        Priorities only break ties between equal deadlines. Lateness is 
+        recorded when each task starts, so profiling results can be compared
+        directly with those from @c pri_sched(). 
+        @return @c True if a task ran, or @c False if none was ready, as from
+            @c pri_sched() """
+
+        now = utime.ticks_us ()
+        best = None
+        best_due = 0
+
+        # Find the deadline of each ready task without disturbing its timer;
+        # the chosen task's schedule() method does the bookkeeping 
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task.go_flag:
+                    due = now
+                elif task.period != None \
+                        and utime.ticks_diff (now, task._next_run) > 0:
+                    due = utime.ticks_diff (task.period, -task._next_run)
+                else:
+                    continue
+
+                if best == None or utime.ticks_diff (due, best_due) < 0:
+                    best = task
+                    best_due = due
+
+        if best != None:
+            best.schedule ()
+            if self._load_window != None:
+                self._measure_load (now)
+            return True
+
+        if self._load_window != None:
+            self._measure_load (None)
+        if self.gc_threshold != None:
+            self.idle_gc ()
+        return False
+
+
+    def set_gc (self, threshold, guard = 500, auto = None):
+        """ Makes @c pri_sched() and @c edf_sched() collect garbage when no 
+        task is ready, once at least @c threshold bytes have been allocated
+        since the last collection and only if the next timed task isn't due 
+        before a collection can finish. This keeps collections out of the
+        tasks, where they would make a task run late or take much longer 
+        than usual. The time a collection takes is learned from the slowest
+        one so far. 
+        @param threshold The number of bytes which may be allocated between
+            collections, or @c None to stop collecting in the scheduler
+        @param guard Microseconds of slack required beyond the time of the 
+            slowest collection so far
+        @param auto If given, the number of bytes allocated after which 
+            MicroPython collects on its own, via @c gc.threshold(). This 
+            should be larger than @c threshold so that automatic collections
+            only happen if the tasks never leave time for one. """
+
+        self.gc_threshold = threshold
+        self._gc_guard = guard
+        self._gc_base = _mem_alloc ()
+        if auto != None and hasattr (gc, 'threshold'):
+            gc.threshold (auto)
+
+
+    def idle_gc (self):
+        """ Collects garbage if enough has been allocated since the last 
+        collection and there is time before the next task is due. This is
+        called by the schedulers when no task is ready to run; see 
+        @c set_gc(). 
+        @return @c True if garbage was collected or @c False if not """
+
+        if _mem_alloc () - self._gc_base < self.gc_threshold:
+            return False
+
+        # Find the slack until the next timed task is due. A task waiting on
+        # its go flag will run as soon as the scheduler is called again
+        now = utime.ticks_us ()
+        need = self._gc_slowest + self._gc_guard
         for pri in self.pri_list:
             for task in pri[2:]:
-                ret_str += str (task) + '\n'
+                if task.go_flag:
+                    return False
+                if task.period != None \
+                        and utime.ticks_diff (task._next_run, now) < need:
+                    return False
+
+        gc.collect ()
+        runt = utime.ticks_diff (utime.ticks_us (), now)
+        if runt > self._gc_slowest:
+            self._gc_slowest = runt
+        self._gc_base = _mem_alloc ()
+        self.gc_runs += 1
+        return True
+
+
+    def set_overload (self, tasks, high = 85, low = 60, window = 500, 
+                      most = 4):
+        """ Makes @c pri_sched() and @c edf_sched() measure the load, the 
+        share of each window of time spent running tasks, and shed load when
+        it's too high by stretching the periods of the given tasks, which 
+        should be those that matter least. At the end of each window in 
+        which the load was above @c high percent, their periods are made one
+        more multiple of their own, up to @c most times; at the end of each 
+        in which it was below @c low percent, one less, until they are back
+        to their own. The gap between the bounds keeps the periods from 
+        swinging back and forth. The tasks' periods when this is called are
+        taken to be their own. 
+        @param tasks A list of the tasks which give way under overload, or 
+            @c None to stop measuring the load and restore their periods
+        @param high The load in percent above which periods are stretched
+        @param low The load in percent below which they are restored
+        @param window The time in milliseconds over which the load is found
+        @param most The largest multiple of its own period a task may get """
+
+        for task, period in self._shed:
+            task.set_period (period // 1000)
+        self.stretch = 1
+        if tasks == None:
+            self._load_window = None
+            self._shed = []
+            self.load = None
+            return
+
+        self._shed = [(task, task.period) for task in tasks]
+        self._load_high = high
+        self._load_low = low
+        self._load_max = most
+        self._busy = 0
+        self._load_start = utime.ticks_us ()
+        self._load_window = int (window * 1000)
+
+
+    def _measure_load (self, stime):
+        """ Adds the time since a task was started to the busy time and, at
+        the end of each window, finds the load and stretches or restores the
+        periods of the tasks which give way under overload. See 
+        @c set_overload(). 
+        @param stime The time at which the scheduler started the task that 
+            just ran, or @c None if none ran """
+
+        now = utime.ticks_us ()
+        if stime != None:
+            self._busy += utime.ticks_diff (now, stime)
+        elapsed = utime.ticks_diff (now, self._load_start)
+        if elapsed < self._load_window:
+            return
+
+        self.load = self._busy * 100 // elapsed
+        self._busy = 0
+        self._load_start = now
+        if self.load > self._load_high and self.stretch < self._load_max:
+            self.stretch += 1
+        elif self.load < self._load_low and self.stretch > 1:
+            self.stretch -= 1
+        else:
+            return
+        # Integer division keeps the periods in whole milliseconds, without
+        # making a float
+        for task, period in self._shed:
+            task.set_period (period * self.stretch // 1000)
+
+
+    def rows (self):
+        """ Make the diagnostic text showing the tasks in the task list one 
+        row at a time, so that it can be printed bit by bit while the tasks
+        keep running, as by a serial console task. 
+        @return A generator of the rows, each ending in a newline """
+
+        yield 'TASK             PRI    PERIOD    RUNS   AVG DUR   MAX ' \
+            'DUR  AVG LATE  MAX LATE AVG ALLOC MAX ALLOC\n'
+        for task in sorted (self.tasks, key=lambda task: task.priority, 
+                            reverse=True):
+            yield str (task) + '\n'
+        if self.mode != None:
+            yield 'Mode: {:s}\n'.format (self.mode)
+        if self.gc_threshold != None:
+            yield 'GC: {:d} idle collections, slowest {:.3f} ms\n' \
+                .format (self.gc_runs, self._gc_slowest / 1000.0)
+        if self.load != None:
+            yield 'Load: {:d}%, shed tasks at {:d}x their periods\n' \
+                .format (self.load, self.stretch)
+
+
+    def __repr__ (self):
+        """ Create some diagnostic text showing the tasks in the task list.
+        """
 
-        return ret_str
+        return ''.join (self.rows ())
 
 
 ## This is @b the main task list which is created for scheduling when 
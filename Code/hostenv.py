@@ -0,0 +1,382 @@
+''' @file hostenv.py
+This file contains stand-ins for the MicroPython modules used by the robot
+code (@c pyb, @c utime, @c machine and @c micropython) so that the tasks can
+be imported and run on a desktop computer. It is a host-side tool only and
+is not copied to the board.
+
+Example:
+@code
+import hostenv
+clock = hostenv.install (hostenv.VirtualClock ())
+import main                         # now imports without a board attached
+clock.advance (100000)              # 100 ms pass instantly
+@endcode '''
+
+import sys
+import time
+import types
+
+
+class VirtualClock:
+    ''' This class implements a microsecond clock which only moves when it
+    is told to, so that tasks can be run faster than real time. '''
+
+    def __init__(self, start_us=0):
+        ''' Creates a clock which starts at the given time.
+        @param start_us The starting time in microseconds '''
+        self.now_us = int(start_us)
+
+    def ticks_us(self):
+        ''' Returns the current virtual time in microseconds. '''
+        return self.now_us
+
+    def advance(self, delta_us):
+        ''' Moves the clock forward.
+        @param delta_us The number of microseconds to move forward '''
+        self.now_us += int(delta_us)
+
+    def set(self, time_us):
+        ''' Moves the clock to the given time; it never moves backwards.
+        @param time_us The new time in microseconds '''
+        if time_us > self.now_us:
+            self.now_us = int(time_us)
+
+
+class RealClock:
+    ''' This class implements a microsecond clock which follows the host's
+    performance counter, for timing code on the host. '''
+
+    def __init__(self):
+        ''' Creates a clock whose zero is the time of creation. '''
+        self._start = time.perf_counter_ns()
+
+    def ticks_us(self):
+        ''' Returns the time since creation in microseconds. '''
+        return (time.perf_counter_ns() - self._start) // 1000
+
+    def advance(self, delta_us):
+        ''' Waits for the given number of microseconds.
+        @param delta_us The number of microseconds to wait '''
+        if delta_us > 0:
+            time.sleep(delta_us / 1000000.0)
+
+    def set(self, time_us):
+        ''' Waits until the given time is reached.
+        @param time_us The time in microseconds to wait for '''
+        self.advance(time_us - self.ticks_us())
+
+
+## The clock used by the stand-in @c utime module
+clock = RealClock()
+
+
+# ------------------------------------------------------------------ utime
+
+def _make_utime():
+    ''' Creates the stand-in @c utime module. '''
+    mod = types.ModuleType('utime')
+    mod.ticks_us = lambda: clock.ticks_us()
+    mod.ticks_ms = lambda: clock.ticks_us() // 1000
+    mod.ticks_cpu = lambda: clock.ticks_us()
+    mod.ticks_diff = lambda new, old: new - old
+    mod.ticks_add = lambda ticks, delta: ticks + delta
+    mod.sleep_us = lambda us: clock.advance(us)
+    mod.sleep_ms = lambda ms: clock.advance(ms * 1000)
+    mod.sleep = lambda s: clock.advance(s * 1000000)
+    mod.time = lambda: clock.ticks_us() // 1000000
+    return mod
+
+
+# ------------------------------------------------------------------ pyb
+
+class _Board:
+    ''' Gives the name of any board pin, such as @c pyb.Pin.board.PA8. '''
+
+    def __getattr__(self, name):
+        return name
+
+
+class Pin:
+    ''' A GPIO pin which remembers its level. The simulated echo pulse
+    length read by @c machine.time_pulse_us() is kept in @c pulse_us. '''
+
+    board = _Board()
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 2
+    AF_PP = 3
+    ANALOG = 4
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, pin_id, mode=IN, pull=PULL_NONE, af=-1):
+        self.id = pin_id.id if isinstance(pin_id, Pin) else pin_id
+        self.mode = mode
+        self.level = 0
+        self.pulse_us = -2
+
+    def high(self):
+        self.level = 1
+
+    def low(self):
+        self.level = 0
+
+    def value(self, level=None):
+        if level is None:
+            return self.level
+        self.level = 1 if level else 0
+
+    def irq(self, handler=None, trigger=IRQ_RISING, hard=False):
+        self.handler = handler
+
+
+class TimerChannel:
+    ''' A timer channel which keeps the last PWM setting it was given. '''
+
+    def __init__(self, timer, number, mode=None, pin=None, **kwargs):
+        self.timer = timer
+        self.number = number
+        self.mode = mode
+        self.pin = pin
+        self.percent = 0
+        self.width = 0
+        self.handler = None
+
+    def pulse_width_percent(self, percent=None):
+        if percent is None:
+            return self.percent
+        self.percent = percent
+
+    def pulse_width(self, width=None):
+        if width is None:
+            return self.width
+        self.width = width
+
+    def capture(self, value=None):
+        return self.timer.count
+
+    def callback(self, fun):
+        self.handler = fun
+
+
+class Timer:
+    ''' A hardware timer stand-in. The counter only changes when it is set,
+    which lets simulations feed encoder counts through @c counter(). '''
+
+    PWM = 0
+    PWM_INVERTED = 1
+    OC_TIMING = 2
+    IC = 3
+    ENC_A = 4
+    ENC_B = 5
+    ENC_AB = 6
+    RISING = 0
+    FALLING = 1
+    BOTH = 2
+    UP = 0
+
+    def __init__(self, number, **kwargs):
+        self.number = number
+        self.count = 0
+        self.channels = {}
+        self.handler = None
+        self.init(**kwargs)
+
+    def init(self, freq=None, prescaler=0, period=0xFFFF, **kwargs):
+        self.freq_hz = freq
+        self.prescaler_val = prescaler
+        self.period_val = period
+
+    def deinit(self):
+        self.handler = None
+
+    def counter(self, value=None):
+        if value is None:
+            return self.count
+        self.count = value
+
+    def channel(self, number, mode=None, pin=None, **kwargs):
+        chan = self.channels.get(number)
+        if chan is None or mode is not None:
+            chan = TimerChannel(self, number, mode, pin, **kwargs)
+            self.channels[number] = chan
+        return chan
+
+    def callback(self, fun):
+        self.handler = fun
+
+    def freq(self, value=None):
+        if value is None:
+            return self.freq_hz
+        self.freq_hz = value
+
+    def period(self, value=None):
+        if value is None:
+            return self.period_val
+        self.period_val = value
+
+    def prescaler(self, value=None):
+        if value is None:
+            return self.prescaler_val
+        self.prescaler_val = value
+
+
+class ADC:
+    ''' An A/D converter which returns whatever was last put in @c value;
+    it starts at full scale, which the line sensor reads as a dark floor. '''
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = 4095
+
+    def read(self):
+        return self.value
+
+
+class I2C:
+    ''' An I2C bus whose devices are dictionaries of register contents. An
+    MMA8452 is present at address 29 unless told otherwise. '''
+
+    MASTER = 0
+    SLAVE = 1
+
+    def __init__(self, bus, mode=MASTER, baudrate=400000, **kwargs):
+        self.bus = bus
+        self.devices = {29: {0x0D: 0x2A}}
+
+    def mem_read(self, data, addr, memaddr, **kwargs):
+        regs = self.devices.setdefault(addr, {})
+        if isinstance(data, int):
+            return bytes(regs.get(memaddr + k, 0) & 0xFF
+                         for k in range(data))
+        for k in range(len(data)):
+            data[k] = regs.get(memaddr + k, 0) & 0xFF
+        return data
+
+    def mem_write(self, data, addr, memaddr, **kwargs):
+        regs = self.devices.setdefault(addr, {})
+        if isinstance(data, int):
+            data = bytes((data & 0xFF,))
+        elif isinstance(data, str):
+            data = data.encode('latin-1')
+        for k, byte in enumerate(data):
+            regs[memaddr + k] = byte
+
+    def scan(self):
+        return sorted(self.devices)
+
+
+class USB_VCP:
+    ''' A serial port which never receives anything unless fed through
+    @c feed(). '''
+
+    def __init__(self, *args):
+        self._rx = bytearray()
+
+    def feed(self, text):
+        self._rx += text.encode() if isinstance(text, str) else text
+
+    def any(self):
+        return len(self._rx) > 0
+
+    def read(self, nbytes=None):
+        if not self._rx:
+            return None
+        nbytes = len(self._rx) if nbytes is None else nbytes
+        out = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return out
+
+    def readinto(self, buf, nbytes=None):
+        data = self.read(len(buf) if nbytes is None else nbytes)
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode()
+        sys.stdout.write(data)
+        return len(data)
+
+
+def _make_pyb():
+    ''' Creates the stand-in @c pyb module. '''
+    mod = types.ModuleType('pyb')
+    mod.Pin = Pin
+    mod.Timer = Timer
+    mod.ADC = ADC
+    mod.I2C = I2C
+    mod.USB_VCP = USB_VCP
+    mod.disable_irq = lambda: True
+    mod.enable_irq = lambda state=True: None
+    mod.micros = lambda: clock.ticks_us()
+    mod.millis = lambda: clock.ticks_us() // 1000
+    mod.elapsed_micros = lambda start: clock.ticks_us() - start
+    mod.elapsed_millis = lambda start: clock.ticks_us() // 1000 - start
+    mod.delay = lambda ms: clock.advance(ms * 1000)
+    mod.udelay = lambda us: clock.advance(us)
+    mod.freq = lambda: (80000000, 80000000, 80000000, 80000000)
+    mod.wfi = lambda: None
+    return mod
+
+
+# ------------------------------------------------------------------ machine
+
+def _time_pulse_us(pin, pulse_level, timeout_us=1000000):
+    ''' Returns the simulated pulse length kept in the pin, taking up that
+    much virtual time as the real function would. '''
+    width = getattr(pin, 'pulse_us', -2)
+    clock.advance(width if width > 0 else timeout_us)
+    return width
+
+
+def _make_machine():
+    ''' Creates the stand-in @c machine module. '''
+    mod = types.ModuleType('machine')
+    mod.Pin = Pin
+    mod.time_pulse_us = _time_pulse_us
+    mod.freq = lambda: 80000000
+    mod.idle = lambda: None
+    mod.disable_irq = lambda: True
+    mod.enable_irq = lambda state=True: None
+    return mod
+
+
+# ------------------------------------------------------------------ micropython
+
+def _make_micropython():
+    ''' Creates the stand-in @c micropython module. '''
+    mod = types.ModuleType('micropython')
+    mod.const = lambda value: value
+    mod.native = lambda fun: fun
+    mod.viper = lambda fun: fun
+    mod.alloc_emergency_exception_buf = lambda size: None
+    mod.schedule = lambda fun, arg: fun(arg)
+    mod.mem_info = lambda *args: None
+    mod.opt_level = lambda *args: 0
+    return mod
+
+
+def install(new_clock=None):
+    ''' Installs the stand-in modules so that robot code can be imported.
+    Modules which are already importable are left alone.
+    @param new_clock The clock to drive @c utime with, such as a
+        @c VirtualClock; by default a @c RealClock is used
+    @return The clock in use '''
+    global clock
+    if new_clock is not None:
+        clock = new_clock
+    makers = (('utime', _make_utime), ('pyb', _make_pyb),
+              ('machine', _make_machine), ('micropython', _make_micropython))
+    for name, maker in makers:
+        if name not in sys.modules:
+            try:
+                __import__(name)
+            except ImportError:
+                sys.modules[name] = maker()
+    return clock
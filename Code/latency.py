@@ -0,0 +1,79 @@
+''' @file latency.py
+This file keeps statistics of the time from a sensor event to the motors
+acting on it, for each of several chains such as an edge being seen and
+the robot reversing. The Brain task stamps each new drive command with the
+time of the sensor reading which caused it (see @c Share.put_at()) and puts
+the number of the chain in a share; the motor code records the chain's
+latency when it applies the command. Recording allocates no memory, so it
+may be done in an interrupt callback. '''
+
+import array
+import utime
+
+
+# Sums of latencies stop growing at this size, which keeps them within the
+# small integers MicroPython can handle without allocating memory
+_SUM_LIMIT = 0x3FFFFFFF - 0x1000000
+
+
+class ChainStats:
+    ''' This class holds the count, average, shortest and longest latency of
+    each chain. '''
+
+    def __init__(self, names):
+        ''' Creates empty statistics.
+        @param names The names of the chains, indexed by chain number '''
+        self.names = names
+        size = len(names)
+        self.count = array.array('I', [0] * size)
+        self.summed = array.array('I', [0] * size)
+        self.total = array.array('I', [0] * size)
+        self.shortest = array.array('I', [0] * size)
+        self.longest = array.array('I', [0] * size)
+        self.last = array.array('I', [0] * size)
+
+    def reset(self):
+        ''' Clears the statistics. '''
+        for k in range(len(self.names)):
+            self.count[k] = 0
+            self.summed[k] = 0
+            self.total[k] = 0
+            self.shortest[k] = 0
+            self.longest[k] = 0
+            self.last[k] = 0
+
+    def record(self, chain, stamp):
+        ''' Records one trip along a chain, ending now. A trip already
+        recorded, with the same chain and stamp, isn't counted again, so a
+        command may be recorded both where the motors are stopped and where
+        they're driven.
+        @param chain The number of the chain
+        @param stamp The time of the sensor event which started it, from
+            @c utime.ticks_us() '''
+        if stamp is None or chain >= len(self.names):
+            return
+        if self.count[chain] and stamp == self.last[chain]:
+            return
+        self.last[chain] = stamp
+        usec = utime.ticks_diff(utime.ticks_us(), stamp)
+        if usec < 0:
+            return
+        if self.count[chain] == 0 or usec < self.shortest[chain]:
+            self.shortest[chain] = usec
+        if usec > self.longest[chain]:
+            self.longest[chain] = usec
+        self.count[chain] += 1
+        if self.total[chain] < _SUM_LIMIT:
+            self.total[chain] += usec
+            self.summed[chain] += 1
+
+    def __repr__(self):
+        ''' Makes a table of the statistics in milliseconds. '''
+        out = 'CHAIN            COUNT   AVG ms   MIN ms   MAX ms\n'
+        for k in range(len(self.names)):
+            if self.count[k]:
+                out += '{:<14s}{: 8d}{: 9.1f}{: 9.1f}{: 9.1f}\n'.format(
+                    self.names[k], self.count[k],
+                    self.total[k] / self.summed[k] / 1000,
+                    self.shortest[k] / 1000, self.longest[k] / 1000)
+        return out
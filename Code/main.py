@@ -7,16 +7,203 @@
 
 import pyb
 import utime
-import machine
 import task_share
 import cotask
 import motor
 import controller
 import mma845x
+import motorloop
+import latency
+import ranging
+import console
 
 from micropython import alloc_emergency_exception_buf
 alloc_emergency_exception_buf (200)
 
+## Distance in mm below which an ultrasonic reading is taken to be the
+#  opponent. Read by the Brain task on every run, so it can be tuned.
+DIST_LIMIT = 200
+
+## Size of the x acceleration in milli-g above which the robot is taken to
+#  have been hit by the opponent.
+ACCEL_LIMIT = 70
+
+## Distance in mm put in the dist share before the first reading, farther
+#  than anything in the ring.
+DIST_NONE = 1500
+
+## How old, in microseconds, distance and acceleration readings may be for
+#  the Brain task to act on them. Older readings are ignored, as if nothing
+#  had been seen.
+DIST_MAX_AGE = 250000
+ACCEL_MAX_AGE = 150000
+
+## Set to True for the Brain task to act on the range predicted by the
+#  opponent tracker rather than on the last ultrasonic reading.
+TRACK = True
+
+## Gains of the alpha-beta opponent tracker, in 256ths: how far the range
+#  and the closing speed are moved toward each new reading.
+TRACK_ALPHA = 128
+TRACK_BETA = 48
+
+## Fastest closing speed in mm/s the tracker will believe; the two robots
+#  can't close faster than this.
+TRACK_MAX_RATE = 1000
+
+## Time in microseconds for which the tracker keeps predicting the range
+#  from the closing speed while no echo comes back, before it takes the
+#  opponent to be lost.
+TRACK_COAST = 250000
+
+## Time in microseconds from a Brain decision to the robot acting on it,
+#  for which the range is predicted ahead so a charge starts in time.
+DIST_LEAD = 100000
+
+## Numbers of the chains from a sensor event to the motors acting on it,
+#  which the Brain task puts in the cause share with each new drive command,
+#  and their names. The latency of each chain is kept in chain_stats.
+EDGE_REVERSE = 0
+ECHO_CHARGE = 1
+IR_STOP = 2
+ECHO_SEARCH = 3
+HIT_TURN = 4
+ECHO_TURN = 5
+STALL_BOOST = 6
+STALL_RETREAT = 7
+SLIP_EASE = 8
+CHAINS = ('edge->reverse', 'echo->charge', 'IR->stop', 'echo->search',
+          'hit->turn', 'echo->turn', 'stall->boost', 'stall->retreat',
+          'slip->ease')
+
+## Bearings in degrees to the left of straight ahead of the ultrasonic
+#  sensors, in the order of their pins in SONAR_PINS. The first must face
+#  straight ahead; its readings are the ones put in dist and tracked.
+SONAR_BEARINGS = (0,)
+
+## Time in ms between readings of each ultrasonic sensor. The sensors are
+#  triggered one at a time, spread evenly over this time.
+SONAR_PERIOD = 70
+
+## Bearing in degrees off to either side at which an opponent seen by the
+#  ultrasonic sensors, but not in range straight ahead, is turned toward in
+#  place at LOCATE_TURN percent.
+SONAR_SIDE = 20
+LOCATE_TURN = 65
+
+## Set to True for the Brain task to search first around the heading at
+#  which the opponent was last seen. It turns toward that heading and then
+#  swings back and forth about it at SWEEP_TURN percent, SWEEP_STEP degrees
+#  wider each time, for up to SWEEP_RUNS runs before searching on the arc.
+#  Meanwhile it drives forward at SWEEP_PUSH percent if the opponent was
+#  last seen within SWEEP_NEAR mm, to keep pushing, or at SWEEP_SPEED
+#  percent if it was farther, to close in.
+SWEEP = True
+SWEEP_STEP = 30
+SWEEP_TURN = 45
+SWEEP_RUNS = 30
+SWEEP_NEAR = 300
+SWEEP_PUSH = 40
+SWEEP_SPEED = 55
+
+## Difference in encoder ticks between the right and left wheels when the
+#  robot spins once in place, for finding its heading. Calibrate it by
+#  spinning the robot through a few turns and dividing.
+TICKS_PER_TURN = 4000
+
+## Effort in percent used to charge, back away from the edge and turn away
+#  from a hit.
+DRIVE_SPEED = 65
+
+## Forward speed and turn rate to the right, in percent, of the arc driven
+#  while searching. With no forward speed the robot spins in place.
+SEARCH_SPEED = 40
+SEARCH_TURN = 45
+
+## Turn rate to the left, in percent, of the arc driven at full charging
+#  speed for LOST_RUNS runs of the Brain task after losing sight of the
+#  opponent, before searching again.
+LOST_TURN = 45
+LOST_RUNS = 3
+
+## Set to True for the Brain task to act when the Traction task finds a
+#  wheel stalled or slipping while charging. A stall is met by pushing at
+#  STALL_SPEED percent; if the wheels are still stalled after STALL_RUNS
+#  runs, the robot backs off turning at RETREAT_TURN percent for
+#  RETREAT_RUNS runs, to come at the opponent from another angle. A slip is
+#  met by driving at SLIP_SPEED percent and turning SLIP_TURN percent
+#  toward the slipping wheel's side, which takes effort off that wheel.
+#  In the arena, backing off and easing off both lost more pushes than they
+#  won, so they're off (no runs, full speed, no turn) until tuned on a real
+#  ring, which may be done through the console.
+TRACTION = True
+STALL_SPEED = 100
+STALL_RUNS = 5
+RETREAT_TURN = 40
+RETREAT_RUNS = 0
+SLIP_SPEED = 65
+SLIP_TURN = 0
+
+## Encoder ticks per second at which a wheel turns unloaded at full effort,
+#  as found by motorid.py. The robot is taken to be pushing the opponent
+#  once its range has been within PUSH_RANGE mm for PUSH_RUNS runs of the
+#  Traction task in a row, which runs every TRACTION_PERIOD ms. An HC-SR04
+#  reports nothing nearer than 20 to 30 mm, so one up against the opponent
+#  reads about that; PUSH_RANGE has to be well beyond it.
+WHEEL_FREE_SPEED = 1600
+PUSH_RANGE = 60
+PUSH_RUNS = 5
+TRACTION_PERIOD = 20
+
+## Set to True to run the motors from a timer interrupt at MOTOR_FREQ times
+#  per second, on timer MOTOR_TIMER, instead of from the Motor_R and Motor_L
+#  tasks.
+MOTOR_ISR = False
+MOTOR_TIMER = 6
+MOTOR_FREQ = 1000
+
+## Set to True to run only the Read_IR and Console tasks until the start
+#  command comes, sleeping between interrupts, with the motors off. The
+#  other tasks start afresh when the start command comes, and stop again on any other command.
+IDLE_MODE = True
+
+## Set to True to measure the share of each LOAD_WINDOW ms spent running
+#  tasks and, while it's over LOAD_HIGH percent, slow the Ultrasonic and
+#  Accel tasks, up to LOAD_MOST times their own periods, until it's under
+#  LOAD_LOW percent again. This keeps the motors and edge detection on time
+#  when the tasks take longer than they have. The readings of those tasks are
+#  let grow older by the same factor before they're thought stale.
+LOAD_SHED = True
+LOAD_HIGH = 85
+LOAD_LOW = 60
+LOAD_WINDOW = 500
+LOAD_MOST = 4
+
+## Milliseconds between runs of the Console task, which reads commands from
+#  the USB serial port a few characters at a time; see console.py. The
+#  scheduler stops on the command quit.
+CONSOLE_PERIOD = 20
+
+## The constants which the tasks read each time they're used, and so which
+#  the console's param command may change while the robot runs, and those
+#  of them which are divided by and so may not be made zero. The others are
+#  copied into tasks and objects as the program starts.
+LIVE_PARAMS = ('DIST_LIMIT', 'ACCEL_LIMIT', 'DIST_MAX_AGE', 'ACCEL_MAX_AGE',
+               'TRACK', 'TRACK_ALPHA', 'TRACK_BETA', 'TRACK_MAX_RATE',
+               'TRACK_COAST', 'DIST_LEAD', 'SONAR_SIDE', 'LOCATE_TURN',
+               'SWEEP', 'SWEEP_STEP', 'SWEEP_TURN', 'SWEEP_RUNS',
+               'SWEEP_NEAR', 'SWEEP_PUSH', 'SWEEP_SPEED', 'TICKS_PER_TURN',
+               'DRIVE_SPEED', 'SEARCH_SPEED', 'SEARCH_TURN', 'LOST_TURN',
+               'LOST_RUNS', 'TRACTION', 'STALL_SPEED', 'STALL_RUNS',
+               'RETREAT_TURN', 'RETREAT_RUNS', 'SLIP_SPEED', 'SLIP_TURN',
+               'PUSH_RANGE', 'PUSH_RUNS')
+NONZERO_PARAMS = ('TICKS_PER_TURN', )
+
+## Set to True to measure how long each share and queue disables interrupts
+#  and how late the IR interrupt starts; the results are printed with the
+#  shares when the scheduler stops.
+IRQ_STATS = False
+
 
 def readIR():
     ''' This function parses data from an IR signal to detect a start 
@@ -46,47 +233,135 @@ def readIR():
                     if diff2 > 4000 and diff2 < 5000:
                         # A leading pulse is detected
                         sig_start = True
-                        times = []
+                        times = []  # alloc: ok
                     elif diff2 < 4000 and diff2 > 2000:
                         # A repeat signal is detected
                         pass
                 elif sig_start:
                     # Decoding the signal pulses into bits
                     if (2*diff1) > diff2:
-                        times.append(0)
+                        times.append(0)  # alloc: ok
                     else:
-                        times.append(1)
+                        times.append(1)  # alloc: ok
 
+        # Bits are only gathered and decoded while the remote sends a frame,
+        # not on every run, so the allocation marked here is allowed
         if len(times) >= 32 and sig_start:
             times.reverse()
-            com = times[8:16]
+            com = times[8:16]  # alloc: ok
             word = ''
             for j in com:
-                word += str(j)
+                word += str(j)  # alloc: ok
             #print(word)
 
+            # The command is stamped with the time of the frame's last edge
             if 12 == int(word, 2):
-                command.put(1)
+                command.put_at(1, nextT2)
                 #print("START COMMAND")
             else :
-                command.put(0)
+                command.put_at(0, nextT2)
                 #print("STOP COMMAND")
 
-            times = []
+            times = []  # alloc: ok
 
         yield(0)
 
 
 def getDistance():
-    ''' This function reads data from the ultrasonic sensor and saves it in the dist share. '''
+    ''' This function runs the ultrasonic sensors. Each run it reads the
+    sensor triggered on the run before and triggers the next one, so only
+    one is listening at a time and it never waits for an echo. '''
+    sonars = [ranging.Sonar(trig, echo) for trig, echo in SONAR_PINS]
+    k = 0
+    sonars[k].trigger()
     while True:
-        pinTrig.high()
-        pinTrig.low()
-        pulseTime = machine.time_pulse_us(pinEcho, 1)
-        dist_cm = (pulseTime / 2) / 29  # microseconds to cm
-        dist.put(dist_cm)
-        #print("Distance: " + str(dist_cm))
         yield(0)
+        sonarReading(k, sonars[k].read(), sonars[k].time())
+        k += 1
+        if k >= len(sonars):
+            k = 0
+        sonars[k].trigger()
+
+
+def maxAge(usec):
+    ''' Gives how old a reading may be before it's stale, allowing for the
+    sensor tasks being slowed while the scheduler is overloaded, so that their
+    readings don't go stale just because they're being taken less often.
+    @param usec The age limit in microseconds when the tasks run on time
+    @return The age limit in microseconds now '''
+    return usec * cotask.task_list.stretch
+
+
+def sonarReading(k, dist_mm, stamp=None):
+    ''' Saves a reading of ultrasonic sensor k in its share, stamped with
+    the time of the echo rather than when the task got to it; readings of the
+    front sensor, whose share is dist, also go to the opponent tracker. The
+    bearing of whatever the sensors see is then put in the bearing share.
+    @param k The number of the sensor
+    @param dist_mm The reading in mm, negative if there was no echo
+    @param stamp The time of the echo from utime.ticks_us(), or None if the
+        reading was taken just now '''
+    ranges[k].put_at(dist_mm, utime.ticks_us() if stamp is None else stamp)
+    if k == 0:
+        trackDistance(dist_mm, dist.stamp())
+    angle = ranging.locate(ranges, SONAR_BEARINGS, DIST_NONE,
+                           maxAge(SONAR_PERIOD * 1500))
+    if angle is not None:
+        bearing.put_at(angle, ranges[k].stamp())
+
+
+def trackDistance(dist_mm, stamp):
+    ''' Updates the opponent track with an ultrasonic reading. The track is
+    an alpha-beta filter whose state is kept in the track share (the range in
+    mm at the time of the last echo) and the closing share (how fast the
+    range shrinks, in mm/s). Once no echo has come back for longer than
+    TRACK_COAST, the track is lost and DIST_NONE is put in the track share;
+    the next echo starts a new track. Only integers are used, so nothing is
+    allocated.
+    @param dist_mm The reading in mm
+    @param stamp The time of the reading from utime.ticks_us() '''
+    if dist_mm < 0 or dist_mm >= DIST_NONE: # timed out or nothing there
+        if track.stamp() is not None and track.get() < DIST_NONE \
+                and utime.ticks_diff(stamp, track.stamp()) \
+                >= maxAge(TRACK_COAST):
+            track.put_at(DIST_NONE, stamp)
+        return
+    if not track.fresh(maxAge(DIST_MAX_AGE)) or track.get() >= DIST_NONE:
+        closing.put_at(0, stamp)
+        track.put_at(dist_mm, stamp)
+        return
+    dt_ms = utime.ticks_diff(stamp, track.stamp()) // 1000
+    if dt_ms <= 0:
+        return
+
+    # Move the prediction for now toward the reading, and correct the
+    # closing speed by the part of the miss it should have explained
+    rate = closing.get()
+    guess = track.get() - rate * dt_ms // 1000
+    miss = dist_mm - guess
+    rate -= TRACK_BETA * miss * 1000 // (256 * dt_ms)
+    if rate > TRACK_MAX_RATE:
+        rate = TRACK_MAX_RATE
+    elif rate < -TRACK_MAX_RATE:
+        rate = -TRACK_MAX_RATE
+    closing.put_at(rate, stamp)
+    track.put_at(guess + TRACK_ALPHA * miss // 256, stamp)
+
+
+def predictRange():
+    ''' Predicts the opponent's range in mm DIST_LEAD from now, when a
+    command sent now will have taken effect, and puts it in the predicted
+    share. When nothing has been seen recently DIST_NONE is given. With TRACK
+    off the last fresh reading is used as it is. '''
+    if not TRACK:
+        ahead = dist.get() if dist.fresh(maxAge(DIST_MAX_AGE)) else DIST_NONE
+    elif track.fresh(maxAge(DIST_MAX_AGE)) and track.get() < DIST_NONE:
+        ahead = track.get() - closing.get() * (track.age() + DIST_LEAD) \
+            // 1000000
+    else:
+        ahead = DIST_NONE
+    predicted.put(ahead)
+    return ahead
 
 
 def getOptical():
@@ -96,8 +371,8 @@ def getOptical():
     while True:
         val_f = sensor.read()
         #print("ADC: " + str(val_f))
-        if val_f < 3000: # white line in front
-            edge.put(1)
+        if val_f < 3000 and edge.get() != 1: # white line in front
+            edge.put(1) # only when first seen, so it's stamped then
         yield(0)
 
 
@@ -107,85 +382,282 @@ def getAccelX():
     mma = mma845x.MMA845x(i2c, 29) # i2c address 29
     mma.active() # activate sensor
     while True:
-        x = mma.get_ax() # get acceleration in x direction
+        x = mma.get_ax_mg() # get acceleration in x direction in milli-g
         accel.put(x) # put value in share
         yield(0)
 
 
+def drive(vel, trn, chain, stamp):
+    ''' Sends a new drive command to the motor tasks, stamped with the time
+    of the sensor event which led to it, along with the number of the chain
+    it ends. Nothing is sent if the command hasn't changed, so the stamp stays
+    that of the event which first called for it. '''
+    if vel != velocity.get() or trn != turn.get():
+        cause.put(chain)
+        turn.put_at(trn, stamp)
+        velocity.put_at(vel, stamp)
+
+
+def heading():
+    ''' Finds the robot's heading from the wheel positions in the wheel_R
+    and wheel_L shares.
+    @return The heading in degrees to the left of where the robot started,
+        not wrapped, so it keeps growing as the robot spins '''
+    return (wheel_R.get() - wheel_L.get()) * 360 // TICKS_PER_TURN
+
+
+def wrapDegrees(angle):
+    ''' Wraps an angle in degrees into the range -180 to 179. '''
+    return (angle + 180) % 360 - 180
+
+
 def Brain():
     ''' This function processes the data from the sensors and tells the motors what to do. '''
 
-    command.put(0)
     ir_count = 40
-    dist.put(150)
+    lost = LOST_RUNS
+    dist.put(DIST_NONE)
+
+    # Where the opponent was last seen: the time of the sighting, the
+    # heading toward it and its range, and how many runs ago; and the
+    # sweep about that heading, in degrees from it, and which way it's
+    # turning
+    seen_stamp = None
+    seen_at = 0
+    seen_range = DIST_NONE
+    since_seen = SWEEP_RUNS
+    sweep = 0
+    sweep_turn = 0
+
+    # Whether a stall has been met by pushing harder, for how many runs in
+    # a row the wheels have been stalled and how many runs of backing off
+    # are left
+    boost = False
+    stalled = 0
+    retreat = 0
     while True:
         if command.get() == 1: # start button pushed on IR remote
 
+            # Remember each new sighting by any ultrasonic sensor
+            if bearing.stamp() != seen_stamp \
+                    and bearing.fresh(maxAge(DIST_MAX_AGE)):
+                seen_stamp = bearing.stamp()
+                seen_at = heading() + bearing.get()
+                seen_range = dist.get() if 0 <= dist.get() < DIST_NONE \
+                    else DIST_NONE
+                since_seen = 0
+                sweep = 0
+                sweep_turn = 0
+
             # edge detection logic
             if edge.get() == 1: # near an edge
                 if ir_count != 1: # back up
-                    direction_R.put(2)
-                    direction_L.put(2)
+                    drive(-DRIVE_SPEED, 0, EDGE_REVERSE, edge.stamp())
                     ir_count -= 1
                 else: # done backing up
                     ir_count = 40
                     edge.put(0)
 
+            elif retreat > 0:
+                # Stalled against the opponent; back off at an angle
+                drive(-DRIVE_SPEED, RETREAT_TURN, STALL_RETREAT,
+                      traction.stamp())
+                retreat -= 1
+
             # no opponent found logic
-            elif dist.get() > 20:
-                # Turn right
-                direction_R.put(2)
-                direction_L.put(1)
+            elif predictRange() > DIST_LIMIT:
+                boost = False
+                stalled = 0
+                side = bearing.get()
+                if bearing.fresh(maxAge(DIST_MAX_AGE)) \
+                        and abs(side) >= SONAR_SIDE:
+                    # Seen off to one side; turn in place toward it
+                    drive(0, LOCATE_TURN if side > 0 else -LOCATE_TURN,
+                          ECHO_TURN, bearing.stamp())
+                elif SWEEP and since_seen < SWEEP_RUNS:
+                    # Swing back and forth about the heading at which the
+                    # opponent was last seen, wider each time its end is
+                    # passed
+                    off = wrapDegrees(seen_at + sweep - heading())
+                    if sweep_turn != 0 and off * sweep_turn <= 0:
+                        if sweep <= 0:
+                            sweep = SWEEP_STEP - sweep
+                        else:
+                            sweep = -SWEEP_STEP - sweep
+                        off = wrapDegrees(seen_at + sweep - heading())
+                    sweep_turn = SWEEP_TURN if off > 0 else -SWEEP_TURN
+                    drive(SWEEP_SPEED if seen_range > SWEEP_NEAR
+                          else SWEEP_PUSH, sweep_turn, ECHO_SEARCH,
+                          seen_stamp)
+                    since_seen += 1
+                elif lost < LOST_RUNS:
+                    # Just lost the opponent; keep charging on an arc
+                    drive(DRIVE_SPEED, LOST_TURN, ECHO_SEARCH, dist.stamp())
+                    lost += 1
+                else:
+                    # Arc to the right, sweeping the sensor around the ring
+                    # while closing in
+                    drive(SEARCH_SPEED, -SEARCH_TURN, ECHO_SEARCH,
+                          dist.stamp())
 
             # collision logic
-            elif abs(accel.get()) > 0.07:
-                # Turn left
-                direction_R.put(1)
-                direction_L.put(2)
+            elif accel.fresh(maxAge(ACCEL_MAX_AGE)) \
+                    and abs(accel.get()) > ACCEL_LIMIT:
+                # Turn left in place
+                drive(0, DRIVE_SPEED, HIT_TURN, accel.stamp())
 
             # opponent found logic
             else:
-                # move forward
-                direction_R.put(1)
-                direction_L.put(1)
+                wheels = traction.get() if TRACTION else 0
+                if wheels & controller.STALLED:
+                    boost = True
+                    stalled += 1
+                else:
+                    stalled = 0
+                if RETREAT_RUNS and stalled > STALL_RUNS:
+                    # Still stalled at full effort; back off and come again
+                    boost = False
+                    stalled = 0
+                    retreat = RETREAT_RUNS - 1
+                    drive(-DRIVE_SPEED, RETREAT_TURN, STALL_RETREAT,
+                          traction.stamp())
+                elif wheels & controller.SLIPPING:
+                    # Ease off the slipping wheel until it grips again
+                    drive(SLIP_SPEED, -SLIP_TURN if wheels & controller.SLIP_R
+                          else SLIP_TURN, SLIP_EASE, traction.stamp())
+                elif boost:
+                    # Push harder against whatever stalled the wheels
+                    drive(STALL_SPEED, 0, STALL_BOOST, traction.stamp())
+                else:
+                    # move forward
+                    drive(DRIVE_SPEED, 0, ECHO_CHARGE,
+                          track.stamp() if TRACK else dist.stamp())
+                lost = 0
 
         else: # other button pushed on IR remote
             # need to stop motors and halt motion
-            direction_R.put(0)
-            direction_L.put(0)
+            drive(0, 0, IR_STOP, command.stamp())
 
         yield(0)
 
 
-def motor_R():
-    ''' This function controls the right motor. '''
-
-    # Create the objects to control it
+def rightWheel():
+    ''' Creates the driver and controller of the right motor. '''
     Mo_R = motor.MotorDriver(pyb.Pin.board.PB4, pyb.Pin.board.PB5, pyb.Pin.board.PA10, 3)
     Con_R = controller.Controller(.1, 10000, pyb.Pin.board.PC6, pyb.Pin.board.PC7, 8)
+    return Mo_R, Con_R
+
+
+def leftWheel():
+    ''' Creates the driver and controller of the left motor. '''
+    Mo_L = motor.MotorDriver(pyb.Pin.board.PA0, pyb.Pin.board.PA1, pyb.Pin.board.PC1, 5)
+    Con_L = controller.Controller(.1, 10000, pyb.Pin.board.PB6, pyb.Pin.board.PB7, 4)
+    return Mo_L, Con_L
+
+
+def motor_R():
+    ''' This function controls the right motor with Mo_R and Con_R. '''
+
+    applied = None
     while True:
-        effort = -Con_R.run(direction_R.get())
+        motor_jitter.record(utime.ticks_us())
+        effort = -Con_R.drive(velocity.get(), turn.get(), 1)
         Mo_R.set_duty_cycle(effort)
+        wheel_R.put(-Con_R.position)
+
+        # When a new command has been applied, its chain has ended
+        if velocity.stamp() != applied:
+            applied = velocity.stamp()
+            chain_stats.record(cause.get(), applied)
         yield(0)
 
 
 def motor_L():
-    ''' This function controls the left motor. '''
+    ''' This function controls the left motor with Mo_L and Con_L. '''
 
-    # Create the objects to control it
-    Mo_L = motor.MotorDriver(pyb.Pin.board.PA0, pyb.Pin.board.PA1, pyb.Pin.board.PC1, 5)
-    Con_L = controller.Controller(.1, 10000, pyb.Pin.board.PB6, pyb.Pin.board.PB7, 4)
     while True:
-        effort = Con_L.run(direction_L.get())
+        effort = Con_L.drive(velocity.get(), turn.get(), -1)
         Mo_L.set_duty_cycle(effort)
+        wheel_L.put(Con_L.position)
         yield(0)
 
 
+def getTraction():
+    ''' This function watches the wheels for stalling and slipping. It
+    finds each wheel's speed from the encoder positions in the wheel_R and
+    wheel_L shares and the effort commanded of it from the velocity and turn
+    shares, and puts the state found by a controller.Traction in the
+    traction share, stamped when it changes. '''
+
+    watch = controller.Traction(WHEEL_FREE_SPEED)
+    pushing = 0
+    last = utime.ticks_us()
+    last_R = wheel_R.get()
+    last_L = wheel_L.get()
+    while True:
+        yield(0)
+        now = utime.ticks_us()
+        span = utime.ticks_diff(now, last)
+        pos_R = wheel_R.get()
+        pos_L = wheel_L.get()
+        if 0 <= dist.get() < PUSH_RANGE \
+                and dist.fresh(maxAge(DIST_MAX_AGE)):
+            pushing += 1 if pushing < PUSH_RUNS else 0
+        else:
+            pushing = 0
+        if span > 0:
+            vel = velocity.get()
+            trn = turn.get()
+            state = watch.update(controller.mix(vel, trn, 1),
+                                 (pos_R - last_R) * 1000000 // span,
+                                 controller.mix(vel, trn, -1),
+                                 (pos_L - last_L) * 1000000 // span,
+                                 pushing >= PUSH_RUNS)
+            if state != traction.get():
+                traction.put(state)
+        last = now
+        last_R = pos_R
+        last_L = pos_L
+
+
+def setMode(match):
+    ''' Switches the tasks between the idle mode, in which only Read_IR runs
+    and the motors are off, and the match mode, in which every task runs.
+    Tasks resumed for a match start their periods afresh rather than
+    catching up on the runs they missed.
+    @param match True for the match mode, False for the idle mode '''
+    if match:
+        cotask.task_list.set_mode(None)
+        if MOTOR_ISR:
+            motors.start()
+        else:
+            motor_jitter.reset()
+    else:
+        # The stop is stamped with the command's time, as Brain would stamp
+        # it, and the motors are stopped here, so the IR->stop chain ends here
+        cotask.task_list.set_mode('idle')
+        stamp = command.stamp()
+        cause.put(IR_STOP)
+        turn.put_at(0, stamp)
+        velocity.put_at(0, stamp)
+        if MOTOR_ISR:
+            motors.stop()
+        else:
+            Mo_R.set_duty_cycle(0)
+            Mo_L.set_duty_cycle(0)
+        chain_stats.record(IR_STOP, stamp)
+
+
 def interrupt1(t):
     ''' The interrupt function: when a signal edge is detected this
     will save the timestamp associated with that edge. '''
-    if not data.full():
-        data.put(utime.ticks_us(), in_ISR=True)
+    if task_share.irq_stats:
+        # How long after the edge this ISR started, from the edge time the
+        # timer captured; the timer counts microseconds
+        data.isr_latency((tim1.counter() - ch1.capture()) & 0xFFFF)
+    # When the queue is full the oldest edge is overwritten and counted as
+    # dropped, so show_all() tells whether the queue is big enough
+    data.put(utime.ticks_us(), in_ISR=True)
 
 
 if __name__ == "__main__":
@@ -193,9 +665,12 @@ if __name__ == "__main__":
 
     # Pin Definitions
 
-    # Ultrasonic sensor pins
+    # Ultrasonic sensor pins, a (trigger, echo) pair for each sensor in
+    # SONAR_BEARINGS. Each echo pin needs its own interrupt line, so no two
+    # may have the same pin number
     pinTrig = pyb.Pin(pyb.Pin.board.PC7, pyb.Pin.OUT_PP)
     pinEcho = pyb.Pin(pyb.Pin.board.PA9, pyb.Pin.IN)
+    SONAR_PINS = [(pinTrig, pinEcho)]
 
     # Edge detection sensor pin
     pinOptical = pyb.Pin(pyb.Pin.board.PC0, pyb.Pin.IN)
@@ -210,67 +685,164 @@ if __name__ == "__main__":
     ch1.callback(interrupt1)
 
     # Creating shares and queues to allow data to pass between tasks
+    task_share.track_irq(IRQ_STATS)
 
     # The Shares
 
     # The share named dist will be used to tell the brain task how far the
-    # opponent is from the bot, will be larger than the size of the ring or
-    # zero when there is no opponent in front of the bot.
-    dist = task_share.Share('f', thread_protect=False, name='dist')
-
-    # This share will be set by the brain task and will tell the right motor
-    # which direction to move in. It will be set to 0 to stop, 1 for forward,
-    # and 2 for backwards.
-    direction_R = task_share.Share('I', thread_protect=False, name='dir_r')
-
-    # This share will be set by the brain task and will tell the left motor
-    # which direction to move in. It will be set to 0 to stop, 1 for forward,
-    # and 2 for backwards.
-    direction_L = task_share.Share('I', thread_protect=False, name='dir_l')
+    # opponent is from the bot in mm, will be larger than the size of the
+    # ring or zero when there is no opponent in front of the bot.
+    dist = task_share.Share('i', thread_protect=False, name='dist',
+                            timestamp=True)
+
+    # The opponent track made from the dist readings by the Ultrasonic task:
+    # track holds the filtered range in mm at the time of the last reading
+    # and closing how fast that range is shrinking in mm/s. The Brain task
+    # puts the range it predicts for when its command takes effect in
+    # predicted.
+    track = task_share.Share('i', thread_protect=False, name='track',
+                             timestamp=True)
+    closing = task_share.Share('i', thread_protect=False, name='closing',
+                               timestamp=True)
+    predicted = task_share.Share('i', thread_protect=False, name='predicted')
+
+    # The latest reading of each ultrasonic sensor in mm, the front one's
+    # being dist, and the bearing in degrees to the left of ahead of what
+    # they see, stamped when it was last seen.
+    ranges = [dist] + [task_share.Share('i', thread_protect=False,
+                                        name='range' + str(k), timestamp=True)
+                       for k in range(1, len(SONAR_BEARINGS))]
+    bearing = task_share.Share('i', thread_protect=False, name='bearing',
+                               timestamp=True)
+
+    # These shares will be set by the brain task and tell the motor tasks
+    # how to drive: velocity is the forward speed and turn the turn rate to
+    # the left, both signed and in percent of full effort. Each motor task
+    # mixes them into the effort for its own wheel.
+    # They are stamped with the time of the sensor event which led to the
+    # command, and cause holds the number of the chain from that event.
+    velocity = task_share.Share('i', thread_protect=False, name='velocity',
+                                timestamp=True)
+    turn = task_share.Share('i', thread_protect=False, name='turn',
+                            timestamp=True)
+    cause = task_share.Share('B', thread_protect=False, name='cause')
+
+    # The distance each wheel has turned forward in encoder ticks, put in by
+    # the motor tasks, from which the Brain task finds the heading.
+    wheel_R = task_share.Share('i', thread_protect=False, name='wheel_R')
+    wheel_L = task_share.Share('i', thread_protect=False, name='wheel_L')
+
+    # Whether each wheel is stalled or slipping, as bits defined in
+    # controller.py, stamped when it changes.
+    traction = task_share.Share('B', thread_protect=False, name='traction',
+                                timestamp=True)
 
     # The accel share communicates to the brain what kind of acceleration the
-    # bot is experiencing and will be used to determine if there has been a
-    # collision with another bot.
-    accel = task_share.Share('f', thread_protect=False, name='accel')
+    # bot is experiencing, in milli-g, and will be used to determine if there
+    # has been a collision with another bot.
+    accel = task_share.Share('i', thread_protect=False, name='accel',
+                             timestamp=True)
 
     # This share will be used to indicate when the robot should start operating
     # when a button on the IR remote is pressed. It will be set to 1 when the
     # start button is pressed and set to 0 when any other button is pressed.
-    command = task_share.Share('I', thread_protect=False, name='command')
+    command = task_share.Share('I', thread_protect=False, name='command',
+                               timestamp=True)
+    # No command has come yet, so there's no time to give it
+    command.put_at(0, None)
 
     # This share will be used by both the edge detection task and the brain
     # task. The value 0 corresponds to no edge and 1 for when an edge is
     # detected by sensor.
-    edge = task_share.Share('I', thread_protect=False, name='edges')
+    edge = task_share.Share('I', thread_protect=False, name='edges',
+                            timestamp=True)
 
     # The Queues
 
     # This queue is used to save the IR signal timestamps while in the ISR.
-    data = task_share.Queue('I', 136, thread_protect=False, overwrite=True, name="Data")
+    # Overwriting moves the read index from the ISR, so reads are protected
+    data = task_share.Queue('I', 136, thread_protect=True, overwrite=True, name="Data")
 
     # Creating the tasks for the sumo bot
     Read_IR = cotask.Task(readIR, name='Read_IR', priority=5, period=30)
     Brain_task = cotask.Task(Brain, name='Brain_task', priority=4, period=100)
-    Motor_R = cotask.Task(motor_R, name="Motor_R", priority=4, period=3)
-    Motor_L = cotask.Task(motor_L, name="Motor_L", priority=4, period=3)
-    Ultrasonic = cotask.Task(getDistance, name="Ultrasonic", priority=2, period=70)
-    Edge_det = cotask.Task(getOptical, name="Edge_det", priority=4, period=50)
-    Accel = cotask.Task(getAccelX, name="Accel", priority=2, period=50)
+    Ultrasonic = cotask.Task(getDistance, name="Ultrasonic", priority=2,
+                             period=SONAR_PERIOD // len(SONAR_BEARINGS))
+    # Edge_det and Accel run at the same rate, so they're run as one group
+    # which the scheduler dispatches once for both
+    Edge_det = cotask.Task(getOptical, name="Edge_det", priority=4)
+    Accel = cotask.Task(getAccelX, name="Accel", priority=2)
+    Sensors = cotask.TaskGroup([Edge_det, Accel], name="Sensors", priority=4,
+                               period=50)
 
     # Appending the tasks to the task list run by the scheduler
     cotask.task_list.append(Read_IR)
     cotask.task_list.append(Brain_task)
     cotask.task_list.append(Ultrasonic)
-    cotask.task_list.append(Edge_det)
-    cotask.task_list.append(Accel)
-    cotask.task_list.append(Motor_R)
-    cotask.task_list.append(Motor_L)
-
-    # Run the scheduler with the chosen scheduling algorithm. Quit if any
-    # character is sent through the serial port
+    cotask.task_list.append(Sensors)
+    Traction = cotask.Task(getTraction, name="Traction", priority=3,
+                           period=TRACTION_PERIOD)
+    cotask.task_list.append(Traction)
+
+    # The latency of each chain from a sensor to the motors
+    chain_stats = latency.ChainStats(CHAINS)
+
+    # The motors are run either by tasks or by a timer interrupt. Either way
+    # the time between runs of the right motor's loop is measured
+    Mo_R, Con_R = rightWheel()
+    Mo_L, Con_L = leftWheel()
+    if MOTOR_ISR:
+        motors = motorloop.MotorLoop(MOTOR_TIMER, MOTOR_FREQ, velocity, turn,
+                                     (Mo_R, Con_R, -1), (Mo_L, Con_L, 1),
+                                     cause, chain_stats, (wheel_R, wheel_L))
+        motor_jitter = motors.jitter
+        if not IDLE_MODE:
+            motors.start()
+    else:
+        Motor_R = cotask.Task(motor_R, name="Motor_R", priority=4, period=3)
+        Motor_L = cotask.Task(motor_L, name="Motor_L", priority=4, period=3)
+        cotask.task_list.append(Motor_R)
+        cotask.task_list.append(Motor_L)
+        motor_jitter = motorloop.Jitter(3000)
+
+    # The serial console, at the lowest priority so it only takes time the
+    # other tasks leave
     vcp = pyb.USB_VCP ()
-    while not vcp.any ():
-        cotask.task_list.pri_sched ()
-
-    # Empty the comm port buffer of the character(s) just pressed
-    vcp.read ()
+    cons = console.Console(vcp, cotask.task_list, globals(),
+                           {'R': Con_R, 'L': Con_L}, live=LIVE_PARAMS,
+                           nonzero=NONZERO_PARAMS)
+    Console = cotask.Task(cons.run, name="Console", priority=1,
+                          period=CONSOLE_PERIOD)
+    cotask.task_list.append(Console)
+
+    # Collect garbage between task runs once 4 KB has been allocated, leaving
+    # MicroPython's own collection as a backstop at 16 KB
+    cotask.task_list.set_gc(4096, auto=16384)
+
+    # The sensors which matter least give way if the tasks overrun
+    if LOAD_SHED:
+        cotask.task_list.set_overload([Ultrasonic, Accel], LOAD_HIGH,
+                                      LOAD_LOW, LOAD_WINDOW, LOAD_MOST)
+
+    # Until the start command comes only the IR remote and console are run
+    cotask.task_list.add_mode('idle', [Read_IR, Console])
+    match = not IDLE_MODE
+    if IDLE_MODE:
+        setMode(False)
+
+    # Run the scheduler with the chosen scheduling algorithm until the quit
+    # command comes through the console. While idle, sleep until the next
+    # interrupt whenever no task is ready
+    while not cons.done:
+        if IDLE_MODE and (command.get() == 1) != match:
+            match = not match
+            setMode(match)
+        if not cotask.task_list.pri_sched () and not match:
+            pyb.wfi ()
+
+    # Stop the motors and show how steadily their loop ran
+    if MOTOR_ISR:
+        motors.stop()
+    print(motor_jitter)
+    print(chain_stats)
+    print(task_share.show_all())
@@ -18,6 +18,29 @@
 # optical sensor to detect the edge of the arena. This data is analyzed to
 # direct the motors in the appropriate way.
 #
+# @section host Host Tools
+# Some modules run on a desktop computer rather than on the board and need
+# not be copied to it. They use hostenv.py to stand in for the MicroPython
+# modules. replay.py replays recorded sensor traces through the Brain task
+# faster than real time and checks its decisions against golden files.
+# arena.py simulates thousands of matches at once with NumPy, driving the
+# real Brain task, and sweeps its thresholds over a process pool.
+# motorid.py records a step and chirp response of a motor on the board,
+# then on the host fits a first order model and computes Controller gains.
+# schedcheck.py reads the task profiling printout and reports utilization
+# and response time bounds, showing which tasks may miss deadlines.
+# tracexport.py turns a dump of cotask's trace buffer into Chrome trace
+# event JSON for viewing task timelines in Perfetto.
+# bench_share.py, which also runs on the board, times queue and share
+# operations for the Viper and plain transfer code. bench.py times the hot
+# paths of the robot code on the host and fails when one slows down or
+# allocates more than its saved baseline. aiotask.py, for the board or the
+# host, runs the same tasks under asyncio and compares it with pri_sched().
+# alloccheck.py reads the tasks registered in main.py and lists operations
+# in their loops, and in the code those loops call, which allocate memory.
+# bench_units.py compares the integer sensor units (mm and milli-g) with the
+# float ones they replaced, in run time and heap use per tick.
+#
 # @section testing Testing
 # The sensors were individually tested and then integrated into the overall
 # source code.
@@ -255,6 +255,30 @@ class MMA845x:
         return (self.get_ax (), self.get_ay (), self.get_az ())
 
 
+    def get_ax_mg (self):
+        """ Get the X acceleration from the accelerometer in thousandths of
+        a g. Only integers are used, so no memory is allocated.
+        @return The measured X acceleration in milli-g's """
+
+        return self.bits_to_mg (self._get_accel (OUT_X_MSB))
+
+
+    def get_ay_mg (self):
+        """ Get the Y acceleration from the accelerometer in thousandths of
+        a g. Only integers are used, so no memory is allocated.
+        @return The measured Y acceleration in milli-g's """
+
+        return self.bits_to_mg (self._get_accel (OUT_Y_MSB))
+
+
+    def get_az_mg (self):
+        """ Get the Z acceleration from the accelerometer in thousandths of
+        a g. Only integers are used, so no memory is allocated.
+        @return The measured Z acceleration in milli-g's """
+
+        return self.bits_to_mg (self._get_accel (OUT_Z_MSB))
+
+
     def bits_to_g (self, bits):
         ''' Scale a raw A/D reading to give g's of acceleration. This method
         might need to be called separately from taking data, for example if the
@@ -266,6 +290,17 @@ class MMA845x:
         return bits * 2 ** (self._range + 1) / 32767.0
 
 
+    def bits_to_mg (self, bits):
+        ''' Scale a raw A/D reading to give thousandths of a g of 
+        acceleration using integer math only, which is safe in an interrupt
+        service routine and doesn't create a float on the heap. The largest 
+        product, 32767 * 8000, fits in a MicroPython small integer.
+        @param bits The integer from the accelerometer's A/D converter
+        @return A factory calibrated acceleration in milli-g's '''
+
+        return bits * (2000 << self._range) // 32767
+
+
     def __repr__ (self):
         """ 'Convert' The MMA845x accelerometer to a string. The string 
         contains information about the configuration and status of the
@@ -23,6 +23,13 @@ class MotorDriver:
         self.pin1 = pyb.Pin(Pin1, pyb.Pin.OUT_PP) # set as output
         self.timer = pyb.Timer(TimerNum, freq=30000) # initialize timer for PWM
 
+        # Both PWM channels are set up once, so that setting the duty cycle
+        # allocates no memory and can be done in an interrupt callback
+        self.ch1 = self.timer.channel(1, pyb.Timer.PWM, pin=self.pin1) # ch1 for pin1
+        self.ch2 = self.timer.channel(2, pyb.Timer.PWM, pin=self.pin2) # ch2 for pin2
+        self.ch1.pulse_width_percent(0)
+        self.ch2.pulse_width_percent(0)
+
     def set_duty_cycle (self, level):
         ''' This method sets the duty cycle to be sent
         to the motor to the given level. Positive values
@@ -34,11 +41,9 @@ class MotorDriver:
         #print ('Setting duty cycle to ' + str (level))
         
         if level >= 0:
-            self.pin2.low()
-            ch1 = self.timer.channel(1, pyb.Timer.PWM, pin=self.pin1) # ch1 for pin1
-            ch1.pulse_width_percent(level) # pin1 PWM
+            self.ch2.pulse_width_percent(0) # pin2 held low
+            self.ch1.pulse_width_percent(level) # pin1 PWM
         else:
-            self.pin1.low()
-            ch2 = self.timer.channel(2, pyb.Timer.PWM, pin=self.pin2) # ch2 for pin2
-            ch2.pulse_width_percent(level * -1) # pin2 PWM
+            self.ch1.pulse_width_percent(0) # pin1 held low
+            self.ch2.pulse_width_percent(level * -1) # pin2 PWM
 
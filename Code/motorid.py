@@ -0,0 +1,222 @@
+''' @file motorid.py
+This file identifies a model of a drive motor from its encoder and computes
+gains for the Controller class. On the board, record() drives one motor
+with steps and a chirp through MotorDriver while reading the encoder through
+Controller, and dump() prints the log. On a desktop computer the log is
+fitted to a first order model and gains are worked out for the fastest
+settling the motor can manage without saturating.
+
+On the board, with the wheels off the ground:
+@code
+import motorid
+motorid.dump (*motorid.record ('R'))
+@endcode
+Then on the host, with the printed lines saved to a file:
+@code
+python motorid.py right.log --control 3
+@endcode '''
+
+import array
+import math
+
+
+## The pins and timers of each motor and its encoder as wired in main.py,
+#  and the sign by which motor_R and motor_L multiply the controller's effort
+MOTORS = {'R': (('PB4', 'PB5', 'PA10', 3), ('PC6', 'PC7', 8), -1),
+          'L': (('PA0', 'PA1', 'PC1', 5), ('PB6', 'PB7', 4), 1)}
+
+
+def excitation(effort=65, step_len=100, chirp_len=600, f_lo=0.2, f_hi=10.0,
+               period=10):
+    ''' Makes the excitation: a rest, a step forward, a rest, a step
+    backward, a rest and a chirp whose frequency sweeps from f_lo to f_hi.
+    @param effort The step and chirp amplitude in percent
+    @param step_len The length of each step and rest in samples
+    @param chirp_len The length of the chirp in samples
+    @param f_lo The starting frequency of the chirp in Hz
+    @param f_hi The ending frequency of the chirp in Hz
+    @param period The sample period in milliseconds
+    @return An array of efforts, one per sample '''
+    out = array.array('b', [0] * (step_len // 4))
+    for level in (effort, 0, -effort, 0):
+        out.extend(array.array('b', [level] * step_len))
+    phase = 0.0
+    for k in range(chirp_len):
+        freq = f_lo + (f_hi - f_lo) * k / chirp_len
+        phase += 2 * math.pi * freq * period / 1000.0
+        out.append(int(effort * math.sin(phase)))
+    out.extend(array.array('b', [0] * (step_len // 2)))
+    return out
+
+
+def record(side='R', period=10, **kwargs):
+    ''' Runs the excitation through one motor and records how far the
+    encoder moves in each sample period. Run this on the board only.
+    @param side @c 'R' or @c 'L' for the right or left motor
+    @param period The sample period in milliseconds
+    @param kwargs Settings passed on to excitation()
+    @return A tuple (efforts, ticks, period) of the controller efforts
+        applied and the encoder ticks moved in each sample '''
+    import pyb
+    import utime
+    import motor
+    import controller
+
+    mot_pins, enc_pins, sign = MOTORS[side]
+    board = pyb.Pin.board
+    mot = motor.MotorDriver(getattr(board, mot_pins[0]),
+                            getattr(board, mot_pins[1]),
+                            getattr(board, mot_pins[2]), mot_pins[3])
+    con = controller.Controller(0, 0, getattr(board, enc_pins[0]),
+                                getattr(board, enc_pins[1]), enc_pins[2])
+
+    efforts = excitation(period=period, **kwargs)
+    ticks = array.array('h', [0] * len(efforts))
+    step = period * 1000
+    con.update()
+    next_time = utime.ticks_add(utime.ticks_us(), step)
+    for k in range(len(efforts)):
+        mot.set_duty_cycle(sign * efforts[k])
+        while utime.ticks_diff(next_time, utime.ticks_us()) > 0:
+            pass
+        next_time = utime.ticks_add(next_time, step)
+        ticks[k] = con.update()
+    mot.set_duty_cycle(0)
+    return efforts, ticks, period
+
+
+def dump(efforts, ticks, period):
+    ''' Prints a log made by record() in the format read by load_log(). '''
+    print('# period_ms', period)
+    for k in range(len(efforts)):
+        print(efforts[k], ticks[k])
+
+
+def load_log(path):
+    ''' Reads a log printed by dump().
+    @param path The name of the log file
+    @return A tuple (efforts, ticks, period) as returned by record() '''
+    efforts = []
+    ticks = []
+    period = 10
+    with open(path) as log:
+        for line in log:
+            words = line.split()
+            if len(words) == 3 and words[:2] == ['#', 'period_ms']:
+                period = float(words[2])
+            elif len(words) == 2 and not words[0].startswith('#'):
+                efforts.append(int(words[0]))
+                ticks.append(int(words[1]))
+    return efforts, ticks, period
+
+
+def _solve(mat, vec):
+    ''' Solves a small linear system by Gaussian elimination. '''
+    size = len(vec)
+    rows = [list(mat[i]) + [vec[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if rows[col][col] == 0:
+            raise ValueError('The log does not excite the motor')
+        for r in range(size):
+            if r != col:
+                scale = rows[r][col] / rows[col][col]
+                for c in range(col, size + 1):
+                    rows[r][c] -= scale * rows[col][c]
+    return [rows[i][size] / rows[i][i] for i in range(size)]
+
+
+def fit(efforts, ticks):
+    ''' Fits the first order model w[k] = a w[k-1] + b u[k] - d sign(u[k])
+    by least squares, where w is ticks per sample, u is effort and d is the
+    friction the motor has to overcome.
+    @param efforts The effort applied in each sample
+    @param ticks The encoder ticks moved in each sample
+    @return A tuple (a, b, d, rms) where rms is the RMS error of the fit in
+        ticks per sample '''
+    mat = [[0.0] * 3 for _ in range(3)]
+    vec = [0.0] * 3
+    for k in range(1, len(ticks)):
+        u = efforts[k]
+        row = (ticks[k - 1], u, -(u > 0) + (u < 0))
+        for i in range(3):
+            vec[i] += row[i] * ticks[k]
+            for j in range(3):
+                mat[i][j] += row[i] * row[j]
+    a, b, d = _solve(mat, vec)
+
+    err = 0.0
+    for k in range(1, len(ticks)):
+        u = efforts[k]
+        pred = a * ticks[k - 1] + b * u - d * ((u > 0) - (u < 0))
+        err += (ticks[k] - pred) ** 2
+    return a, b, d, math.sqrt(err / max(1, len(ticks) - 1))
+
+
+def tune(model, period, control_period=3, effort=65):
+    ''' Works out Controller gains for the motor. The feed forward gain
+    holds a speed on its own; the proportional gain puts the closed loop
+    pole as near zero (deadbeat) as the motor allows without a step to the
+    nominal speed saturating the effort at 100 %.
+    @param model The (a, b, d, rms) tuple from fit()
+    @param period The sample period of the log in milliseconds
+    @param control_period The period in milliseconds at which the motor
+        task calls Controller.control()
+    @param effort The open loop effort whose steady speed becomes the
+        nominal speed, 65 as used by Controller.run()
+    @return A dictionary with the gain, setPoint (the nominal speed in ticks
+        per control period) and feedForward for Controller, the motor time
+        constant in ms, the closed loop pole and the predicted 2 % settling
+        time in ms '''
+    a, b, d, _ = model
+    if not 0 < a < 1:
+        raise ValueError('Fitted pole {:g} is not a stable motor'.format(a))
+
+    # Convert the model to the control period
+    tau = -period / math.log(a)
+    gain_ms = b / (1 - a) / period
+    a_c = math.exp(-control_period / tau)
+    b_c = gain_ms * control_period * (1 - a_c)
+
+    feed_forward = 1 / (gain_ms * control_period)
+    set_point = (effort * b - d) / (1 - a) * control_period / period
+    k_max = 100.0 / abs(set_point) - abs(feed_forward)
+    k_p = max(0.0, min(a_c / abs(b_c), k_max))
+    pole = a_c - abs(b_c) * k_p
+    if pole > 0:
+        settle = control_period * math.log(0.02) / math.log(pole)
+    else:
+        settle = control_period
+    sign = 1 if b > 0 else -1
+
+    return {'gain': sign * k_p, 'setPoint': set_point,
+            'feedForward': feed_forward, 'tau': tau, 'pole': pole,
+            'settle': settle, 'deadband': d / b}
+
+
+def main(argv):
+    ''' Fits each log named on the command line and prints the gains. '''
+    control_period = 3
+    if '--control' in argv:
+        at = argv.index('--control')
+        control_period = float(argv[at + 1])
+        del argv[at:at + 2]
+
+    for path in argv:
+        efforts, ticks, period = load_log(path)
+        model = fit(efforts, ticks)
+        gains = tune(model, period, control_period)
+        print('{:s}: a={:.4f} b={:.4f} d={:.3f} rms={:.2f} ticks'.format(
+            path, *model))
+        print('  tau {:.1f} ms, deadband {:.1f} %, pole {:.3f}, settles in '
+              '{:.1f} ms'.format(gains['tau'], gains['deadband'],
+                                 gains['pole'], gains['settle']))
+        print('  controller.Controller({:.4g}, {:.0f}, pin1, pin2, timNum, '
+              'feedForward={:.4g})'.format(gains['gain'], gains['setPoint'],
+                                           gains['feedForward']))
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv[1:])
@@ -0,0 +1,147 @@
+''' @file motorloop.py
+This file runs the drive motors from a hardware timer interrupt instead of
+from the Motor_R and Motor_L tasks. The timer callback reads the velocity
+and turn shares, reads both encoders, mixes the command into each wheel's
+effort and sets the PWM duty cycles, at a fixed rate no matter how long the
+other tasks take. Everything done in the callback uses integers and objects
+made beforehand, so no memory is allocated in the interrupt.
+
+The Jitter class measures how far the time between runs of a loop strays
+from its period. main.py keeps one for whichever motor loop is in use and
+prints it when the scheduler stops, so the two can be compared:
+@code
+MOTOR_ISR = True    # in main.py, then run and stop with a key press
+@endcode '''
+
+import array
+import utime
+
+
+class Jitter:
+    ''' This class keeps a histogram of how much the intervals between runs
+    of a periodic loop differ from the loop's period, and the earliest and
+    latest runs. Recording a run allocates no memory, so it may be done in
+    an interrupt callback. '''
+
+    def __init__(self, period, width=50, bins=21):
+        ''' Creates an empty histogram.
+        @param period The nominal period of the loop in microseconds
+        @param width The width of each histogram bin in microseconds
+        @param bins The number of bins, centered on no deviation; runs
+            outside the range are counted in the end bins '''
+        self.period = period
+        self.width = width
+        self.hist = array.array('I', [0] * bins)
+        self.reset()
+
+    def reset(self):
+        ''' Clears the histogram and the extremes. '''
+        for k in range(len(self.hist)):
+            self.hist[k] = 0
+        self.runs = 0
+        self.early = 0
+        self.late = 0
+        self.last = 0
+        self.started = False
+
+    def record(self, now):
+        ''' Records a run of the loop.
+        @param now The time of the run from @c utime.ticks_us() '''
+        if self.started:
+            dev = utime.ticks_diff(now, self.last) - self.period
+            if dev < self.early:
+                self.early = dev
+            if dev > self.late:
+                self.late = dev
+            bins = len(self.hist)
+            k = (dev + self.width // 2) // self.width + bins // 2
+            if k < 0:
+                k = 0
+            elif k >= bins:
+                k = bins - 1
+            self.hist[k] += 1
+            self.runs += 1
+        self.last = now
+        self.started = True
+
+    def __repr__(self):
+        ''' Shows the extremes and the histogram. '''
+        out = 'Jitter of {:d} runs at {:d} us: earliest {:d} us, latest ' \
+              '{:d} us\n'.format(self.runs, self.period, self.early,
+                                self.late)
+        half = len(self.hist) // 2
+        for k in range(len(self.hist)):
+            if self.hist[k]:
+                out += '{: 7d} us {: 9d}\n'.format((k - half) * self.width,
+                                                   self.hist[k])
+        return out
+
+
+class MotorLoop:
+    ''' This class drives both motors from a timer callback, following the
+    drive command in the velocity and turn shares. '''
+
+    def __init__(self, timNum, freq, velocity, turn, right, left, cause=None,
+                 chains=None, wheels=None):
+        ''' Sets up the loop; it doesn't run until start() is called.
+        @param timNum The number of a timer not used for anything else
+        @param freq How many times per second the loop runs
+        @param velocity The share holding the forward speed in percent
+        @param turn The share holding the turn rate to the left in percent
+        @param right A tuple (MotorDriver, Controller, sign) for the right
+            wheel, the sign being that by which its effort is multiplied
+        @param left The same for the left wheel
+        @param cause The share holding the number of the latency chain which
+            the drive command ends, if latency is measured
+        @param chains The latency.ChainStats in which each new command's
+            latency is recorded, or @c None
+        @param wheels A tuple of the shares (right, left) into which each
+            wheel's encoder position in ticks forward is put, or @c None '''
+        self.timNum = timNum
+        self.freq = freq
+        self.velocity = velocity
+        self.turn = turn
+        self.motR, self.conR, self.signR = right
+        self.motL, self.conL, self.signL = left
+        self.jitter = Jitter(1000000 // freq)
+        self.timer = None
+        self.cause = cause
+        self.chains = chains
+        self.applied = None
+        self.wheelR, self.wheelL = wheels if wheels else (None, None)
+
+        # Make the bound method once, since doing so allocates memory
+        self._cb = self.run
+
+    def run(self, tim):
+        ''' Runs one step of the loop. This is the timer callback.
+        @param tim The timer which called back '''
+        self.jitter.record(utime.ticks_us())
+        vel = self.velocity.get(True)
+        trn = self.turn.get(True)
+        self.motR.set_duty_cycle(self.signR * self.conR.drive(vel, trn, 1))
+        self.motL.set_duty_cycle(self.signL * self.conL.drive(vel, trn, -1))
+        if self.wheelR is not None:
+            self.wheelR.put(self.signR * self.conR.position, True)
+            self.wheelL.put(self.signL * self.conL.position, True)
+
+        # When a new command has been applied, its chain has ended
+        if self.chains is not None and self.velocity.stamp() != self.applied:
+            self.applied = self.velocity.stamp()
+            self.chains.record(self.cause.get(True), self.applied)
+
+    def start(self):
+        ''' Starts the timer so the callback runs at the loop's rate. '''
+        import pyb
+        self.jitter.reset()
+        self.timer = pyb.Timer(self.timNum, freq=self.freq)
+        self.timer.callback(self._cb)
+
+    def stop(self):
+        ''' Stops the timer and the motors. '''
+        if self.timer is not None:
+            self.timer.callback(None)
+            self.timer.deinit()
+            self.timer = None
+        self.motR.set_duty_cycle(0)
+        self.motL.set_duty_cycle(0)
@@ -0,0 +1,65 @@
+''' @file mpycheck.py
+This file cross-compiles the code which runs on the board with @c mpy-cross,
+for the board's Cortex-M4 with its floating point unit, the way the board
+compiles it when it imports each file. Native and Viper code is only
+type-checked then: a Viper function which the desktop runs as plain Python
+may not compile for the board at all, and the desktop stand-ins in
+hostenv.py can't show it. Run this after changing anything on the board.
+It needs @c mpy-cross, which can be installed with @c pip.
+@code
+python mpycheck.py                 # check every file which runs on the board
+python mpycheck.py task_share.py
+@endcode '''
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+## The files which run on the board
+BOARD_FILES = ('main.py', 'cotask.py', 'task_share.py', 'motor.py',
+               'controller.py', 'mma845x.py', 'motorloop.py', 'latency.py',
+               'ranging.py', 'console.py', 'bench_share.py')
+
+## The architecture for which the files are compiled
+MARCH = 'armv7emsp'
+
+
+def compile_file(path, out_dir):
+    ''' Cross-compiles one file.
+    @param path The path of the file
+    @param out_dir The directory in which to put the compiled file
+    @return The compiler's error message, or @c None if it compiled '''
+    out = os.path.join(out_dir, os.path.basename(path)[:-3] + '.mpy')
+    proc = subprocess.run(['mpy-cross', '-march=' + MARCH, '-o', out, path],
+                          capture_output=True, text=True)
+    if proc.returncode:
+        return (proc.stderr or proc.stdout).strip()
+    return None
+
+
+def main(argv):
+    ''' Checks the files named on the command line, or all the board files,
+    and prints the errors.
+    @return The number of files which didn't compile '''
+    if shutil.which('mpy-cross') is None:
+        print('mpy-cross not found; install it with "pip install mpy-cross"')
+        return 1
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = argv or [os.path.join(here, name) for name in BOARD_FILES]
+    failed = 0
+    with tempfile.TemporaryDirectory() as out_dir:
+        for path in paths:
+            error = compile_file(path, out_dir)
+            if error:
+                failed += 1
+                print('{:s}:\n{:s}'.format(os.path.relpath(path), error))
+    print('{:d} of {:d} files compiled for {:s}'.format(
+        len(paths) - failed, len(paths), MARCH))
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main(sys.argv[1:]) else 0)
@@ -0,0 +1,103 @@
+''' @file ranging.py
+This file reads an array of ultrasonic rangefinders without blocking. Each
+sensor's echo pulse is timed by an interrupt on its echo pin, so a task can
+trigger a sensor, yield, and read the range on its next run rather than
+waiting in @c machine.time_pulse_us(). main.py triggers the sensors one at a
+time, one per run of the Ultrasonic task, so only one is ever listening and
+none can hear another's echo.
+
+locate() estimates the bearing of the opponent from the latest range of
+every sensor, each sensor facing its own way:
+@code
+SONAR_BEARINGS = (0, 40, -40)   # in main.py, with a pin pair for each
+@endcode '''
+
+import pyb
+import utime
+
+
+class Sonar:
+    ''' This class triggers one ultrasonic rangefinder and times its echo
+    pulse with an interrupt on the echo pin. '''
+
+    def __init__(self, trig, echo):
+        ''' Sets up the sensor's pins.
+        @param trig The pin, set up as an output, which triggers the sensor
+        @param echo The pin, set up as an input, on which the echo pulse
+            comes back '''
+        self.trig = trig
+        self.echo = echo
+        self.rise = 0
+        self.fall = 0
+        self.width = -1
+        self.waiting = False
+
+        # Make the bound method once, since doing so allocates memory. The
+        # interrupt is a hard one, run at the edge as motorloop's timer
+        # callback is, so a busy scheduler can't hold up the timing; the
+        # callback only does integer arithmetic, so it allocates nothing
+        self._cb = self._edge
+        echo.irq(self._cb, trigger=pyb.Pin.IRQ_RISING | pyb.Pin.IRQ_FALLING,
+                 hard=True)
+
+    def _edge(self, pin):
+        ''' Times the echo pulse. This is the echo pin's hard interrupt
+        callback, so it must not allocate memory.
+        @param pin The echo pin '''
+        now = utime.ticks_us()
+        if pin.value():
+            self.rise = now
+        elif self.waiting:
+            self.fall = now
+            self.width = utime.ticks_diff(now, self.rise)
+            self.waiting = False
+
+    def trigger(self):
+        ''' Sends a ping; the echo is timed as it comes back. '''
+        self.width = -1
+        self.waiting = True
+        self.trig.high()
+        pyb.udelay(10)
+        self.trig.low()
+
+    def read(self):
+        ''' Gets the range measured since the last trigger().
+        @return The range in mm, or -1 if no echo has come back '''
+        if self.width < 0:
+            return -1
+        return self.width * 5 // 29  # microseconds to mm, there and back
+
+    def time(self):
+        ''' Gets when the range measured since the last trigger() was found.
+        @return The time from utime.ticks_us() at which the echo ended, or
+            the time now if no echo has come back '''
+        if self.width < 0:
+            return utime.ticks_us()
+        return self.fall
+
+
+def locate(ranges, bearings, far, max_age):
+    ''' Estimates the bearing of the nearest object the sensors can see. It
+    is the average of the bearings of the sensors whose latest readings are
+    fresh and nearer than @c far, each weighted by how much nearer, so it
+    lies between two sensors which both see the object, nearer the one to
+    which it is closer. Only integers are used, so nothing is allocated.
+    @param ranges The shares holding each sensor's latest range in mm
+    @param bearings Each sensor's bearing in degrees to the left of ahead
+    @param far The range in mm beyond which nothing is taken to be seen
+    @param max_age The age in microseconds of the oldest reading to use
+    @return The bearing in degrees to the left of ahead, or @c None if no
+        sensor sees anything '''
+    total = 0
+    weight = 0
+    k = 0
+    while k < len(bearings):
+        share = ranges[k]
+        mm = share.get()
+        if 0 <= mm < far and share.fresh(max_age):
+            total += bearings[k] * (far - mm)
+            weight += far - mm
+        k += 1
+    if weight == 0:
+        return None
+    return total // weight
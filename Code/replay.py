@@ -0,0 +1,222 @@
+''' @file replay.py
+This file replays recorded sensor traces through the @c Brain task on a
+desktop computer. The unmodified task generator from @c main.py is run by a
+@c cotask.Task under a virtual clock, the recorded values are written into
+its shares at their recorded times, and every change in the @c velocity and
+@c turn commands is logged. Since nothing waits for real time, a three minute
+match replays in well under a second, so a strategy change can be checked
+against a whole library of traces.
+
+A trace is a text file with one recorded share write per line,
+@code
+# time_us  share    value
+  1000000  command  1
+  1070000  dist     436
+  1100000  accel    -12
+@endcode
+where the share is one of @c dist (in mm), @c accel (in milli-g), @c edge,
+@c command, @c bearing (in degrees), @c wheel_R and @c wheel_L (in
+encoder ticks) or @c traction (the stall and slip bits defined in
+@c controller.py). Each @c dist reading is handled by @c sonarReading() as a
+reading of the front ultrasonic sensor, which also updates the opponent
+tracker and the bearing. A trace which records no @c traction is replayed
+with the @c getTraction task running as well, judging the wheels from their
+recorded positions and the commands given, as it does on the robot. Blank
+lines and lines starting with @c # are ignored. Each decision logged is the
+time, the @c velocity and @c turn commands and the @c traction share, so
+that a replay shows when a stall or slip was found as well as what was done
+about it.
+
+Usage from a shell, checking each trace against the @c .golden decision file
+next to it (or writing those files with @c --update):
+@code
+python replay.py traces/*.trace
+python replay.py --update traces/*.trace
+@endcode '''
+
+import sys
+import time
+
+import hostenv
+
+
+## The shares used by the @c Brain task and their array type codes, matching
+#  the ones created in @c main.py
+SHARES = (('dist', 'i'), ('accel', 'i'), ('edge', 'I'), ('command', 'I'),
+          ('velocity', 'i'), ('turn', 'i'), ('cause', 'B'), ('track', 'i'),
+          ('closing', 'i'), ('predicted', 'i'), ('bearing', 'i'),
+          ('wheel_R', 'i'), ('wheel_L', 'i'), ('traction', 'B'))
+
+## The shares which may be written by a trace
+INPUTS = ('dist', 'accel', 'edge', 'command', 'bearing', 'wheel_R',
+          'wheel_L', 'traction')
+
+## The period of the @c Brain task in milliseconds, as set in @c main.py
+BRAIN_PERIOD = 100
+
+## The period of the @c getTraction task in milliseconds, as set in
+#  @c main.py
+TRACTION_PERIOD = 20
+
+
+def load_trace(path):
+    ''' Reads a trace file.
+    @param path The name of the trace file
+    @return A list of (time_us, share name, value) tuples sorted by time '''
+    events = []
+    with open(path) as trace_file:
+        for line_num, line in enumerate(trace_file, 1):
+            line = line.split('#', 1)[0].split()
+            if not line:
+                continue
+            if len(line) != 3 or line[1] not in INPUTS:
+                raise ValueError('{:s}:{:d}: bad trace line'.format(
+                    path, line_num))
+            value = float(line[2])
+            if dict(SHARES)[line[1]] not in 'fd':
+                value = int(value)
+            events.append((int(line[0]), line[1], value))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def replay(events, period=BRAIN_PERIOD, tail=0):
+    ''' Runs the @c Brain task, and the @c getTraction task if the events
+    include no traction, against a list of recorded share writes.
+    @param events A list of (time_us, share name, value) tuples sorted by
+        time, as returned by @c load_trace()
+    @param period The period of the @c Brain task in milliseconds
+    @param tail How long in milliseconds to keep running after the last
+        recorded event
+    @return A list of (time_us, velocity, turn, traction) tuples, one
+        for each run of the @c Brain task after which its output or the
+        traction state had changed '''
+    clock = hostenv.install(hostenv.VirtualClock())
+    import cotask
+    import task_share
+    import main
+
+    start = events[0][0] if events else 0
+    end = (events[-1][0] if events else 0) + tail * 1000
+    # Start early enough that the task initializes before the first event,
+    # as it does when the robot boots before the start button is pressed
+    clock.now_us = start - 2 * period * 1000
+
+    # Give the task fresh shares, kept out of the system-wide list
+    shares = {}
+    for name, type_code in SHARES:
+        shares[name] = task_share.Share(type_code, thread_protect=False,
+                                        name=name, timestamp=True)
+        task_share.share_list.remove(shares[name])
+        setattr(main, name, shares[name])
+    velocity = shares['velocity']
+    turn = shares['turn']
+    traction = shares['traction']
+    main.ranges = [shares['dist']]
+
+    brain = cotask.Task(main.Brain, name='Brain_task', priority=4,
+                        period=period)
+    tasks = [brain]
+    if not any(event[1] == 'traction' for event in events):
+        tasks.append(cotask.Task(main.getTraction, name='Traction',
+                                 priority=3, period=TRACTION_PERIOD))
+
+    decisions = []
+    last = None
+    index = 0
+    num_events = len(events)
+    while clock.now_us <= end:
+        due = min(task._next_run for task in tasks) + 1
+
+        # Everything recorded up to now is written as the sensor tasks wrote
+        # it, at the time at which it was recorded
+        while index < num_events and events[index][0] <= due:
+            stamp, name, value = events[index]
+            clock.set(stamp)
+            if name == 'dist':
+                main.sonarReading(0, value)
+            else:
+                shares[name].put(value)
+            index += 1
+        clock.set(due)
+
+        ran = brain.schedule()
+        for task in tasks[1:]:
+            task.schedule()
+        if ran:
+            now = (velocity.get(), turn.get(), traction.get())
+            if now != last:
+                decisions.append((clock.now_us, ) + now)
+                last = now
+
+    return decisions
+
+
+def format_decisions(decisions):
+    ''' Converts a decision list to text, one decision per line.
+    @param decisions A list as returned by @c replay()
+    @return A string in the format of a golden file '''
+    return ''.join('{:d} {:d} {:d} {:d}\n'.format(*item)
+                   for item in decisions)
+
+
+def load_decisions(path):
+    ''' Reads a golden decision file written by @c format_decisions().
+    @param path The name of the file
+    @return A list of (time_us, velocity, turn, traction) tuples '''
+    with open(path) as golden:
+        return [tuple(int(word) for word in line.split())
+                for line in golden if line.strip()]
+
+
+def first_difference(expected, actual):
+    ''' Finds where two decision lists part ways.
+    @param expected The reference decision list
+    @param actual The decision list to check
+    @return The index of the first differing decision, or @c None if the
+        lists are the same '''
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return index
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual))
+    return None
+
+
+def check_traces(argv):
+    ''' Replays each trace named on the command line, comparing the result
+    to (or with @c --update, writing) the golden file beside it.
+    @return The number of traces whose decisions changed '''
+    update = '--update' in argv
+    paths = [arg for arg in argv if not arg.startswith('--')]
+    failures = 0
+    for path in paths:
+        events = load_trace(path)
+        wall = time.perf_counter()
+        decisions = replay(events)
+        wall = time.perf_counter() - wall
+        span = (events[-1][0] - events[0][0]) / 1e6 if events else 0.0
+        golden = path + '.golden'
+
+        if update:
+            with open(golden, 'w') as out:
+                out.write(format_decisions(decisions))
+            status = 'written'
+        else:
+            try:
+                diff = first_difference(load_decisions(golden), decisions)
+            except OSError:
+                diff = None
+                status = 'no golden'
+            else:
+                status = 'ok' if diff is None else \
+                    'CHANGED at decision {:d}'.format(diff)
+                failures += diff is not None
+
+        print('{:<32s} {:6d} decisions {:8.1f}x real time  {:s}'.format(
+            path, len(decisions), span / wall if wall > 0 else 0.0, status))
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_traces(sys.argv[1:]) else 0)
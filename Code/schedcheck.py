@@ -0,0 +1,193 @@
+''' @file schedcheck.py
+This file checks whether a set of cotask tasks can meet their deadlines.
+Each task's worst case run time, as measured by Task profiling, is combined
+with its period and priority to find the processor utilization and a bound
+on each task's response time. Since the tasks are scheduled cooperatively,
+a task which has started always runs to its next @c yield, so the analysis
+is for non-preemptive fixed priority scheduling: a task can be blocked by
+one run of any lower priority task, then delayed by every run of a task of
+higher or equal priority which becomes ready before it starts. A task whose
+response time can exceed its period may miss a deadline.
+
+The tasks can come from a TaskList, from the profiling table printed by
+@c print(cotask.task_list) on the board, or from a plain table with one
+task per line giving name, priority, period in ms and run time in ms:
+@code
+python schedcheck.py profile.txt
+python schedcheck.py --overhead 0.05 table.txt
+@endcode '''
+
+
+## Deadline check results
+OK = 'ok'
+MISS = 'MAY MISS'
+
+
+class TaskSpec:
+    ''' This class holds what the analysis needs to know about a task. '''
+
+    def __init__(self, name, priority, period, wcet):
+        ''' Saves the task's parameters.
+        @param name The name of the task
+        @param priority The priority, higher numbers running first
+        @param period The period in microseconds
+        @param wcet The worst case run time in microseconds '''
+        self.name = name
+        self.priority = priority
+        self.period = period
+        self.wcet = wcet
+
+    def __repr__(self):
+        return 'TaskSpec({!r}, {:d}, {:d}, {:d})'.format(
+            self.name, self.priority, self.period, self.wcet)
+
+
+def from_task_list(task_list, wcet=None):
+    ''' Collects the timed tasks in a cotask TaskList. Run times come from
+    each task's profile (the slowest run) unless given.
+    @param task_list The TaskList, such as @c cotask.task_list
+    @param wcet A dictionary of run times in microseconds by task name
+        which override the profiled ones
+    @return A list of TaskSpec objects '''
+    specs = []
+    for pri in task_list.pri_list:
+        for task in pri[2:]:
+            if task.period is None:
+                continue
+            run = (wcet or {}).get(task.name, task._slowest)
+            specs.append(TaskSpec(task.name, task.priority, task.period,
+                                  int(run)))
+    return specs
+
+
+def parse_report(text):
+    ''' Reads tasks from a TaskList profiling printout or a plain table of
+    name, priority, period (ms) and run time (ms). Untimed or unprofiled
+    tasks, members of task groups and lines which are not tasks are skipped.
+    @param text The printout or table
+    @return A list of TaskSpec objects '''
+    printout = 'RUNS' in text
+    specs = []
+    for line in text.splitlines():
+        # Members of a TaskGroup are indented and run within the group's time
+        if printout and line[:1] == ' ':
+            continue
+        words = line.split('#', 1)[0].split()
+        try:
+            if printout and len(words) >= 6:
+                # TASK PRI PERIOD RUNS AVG_DUR MAX_DUR [AVG_LATE MAX_LATE]
+                run = float(words[5])
+            elif not printout and len(words) == 4:
+                run = float(words[3])
+            else:
+                continue
+            specs.append(TaskSpec(words[0], int(words[1]),
+                                  int(round(float(words[2]) * 1000)),
+                                  int(round(run * 1000))))
+        except ValueError:
+            continue
+    return specs
+
+
+def rm_bound(num_tasks):
+    ''' Returns the Liu and Layland utilization bound for rate monotonic
+    scheduling of the given number of tasks. '''
+    if num_tasks < 1:
+        return 1.0
+    return num_tasks * (2 ** (1.0 / num_tasks) - 1)
+
+
+def analyze(specs, overhead=0):
+    ''' Computes utilization and a response time bound for each task.
+    @param specs A list of TaskSpec objects
+    @param overhead Scheduler time in microseconds added to every run
+    @return A tuple (utilization, results) where results holds one
+        dictionary per task, highest priority first, with the task's
+        @c spec, @c util, @c blocking, @c response (in microseconds, or
+        @c None if the response time grows without bound) and @c status '''
+    specs = sorted(specs, key=lambda spec: (-spec.priority, spec.period))
+    cost = dict((id(spec), spec.wcet + overhead) for spec in specs)
+    total = sum(cost[id(spec)] / spec.period for spec in specs)
+
+    results = []
+    for spec in specs:
+        run = cost[id(spec)]
+        others = [o for o in specs if o is not spec]
+        higher = [o for o in others if o.priority >= spec.priority]
+        lower = [cost[id(o)] for o in others if o.priority < spec.priority]
+
+        # Blocking by a lower priority task, or by the task's own previous
+        # run pushing this one back (Davis et al. 2007, sufficient test)
+        blocking = max(lower + [run])
+        load = sum(cost[id(o)] / o.period for o in higher)
+
+        response = None
+        if load < 1:
+            start = blocking
+            while start <= 1000 * spec.period:
+                nxt = blocking + sum((start // o.period + 1) * cost[id(o)]
+                                     for o in higher)
+                if nxt == start:
+                    response = start + run
+                    break
+                start = nxt
+
+        results.append({'spec': spec, 'util': run / spec.period,
+                        'blocking': blocking, 'response': response,
+                        'status': OK if response is not None
+                        and response <= spec.period else MISS})
+    return total, results
+
+
+def report(specs, overhead=0):
+    ''' Makes a printable table of the analysis.
+    @param specs A list of TaskSpec objects
+    @param overhead Scheduler time in microseconds added to every run
+    @return A string showing each task's timing and whether it can miss
+        its deadline, with the total utilization '''
+    total, results = analyze(specs, overhead)
+    lines = ['TASK             PRI    PERIOD      WCET   UTIL%     BLOCK'
+             '  RESPONSE  STATUS']
+    for res in results:
+        spec = res['spec']
+        resp = res['response']
+        lines.append('{:<16s}{: 4d}{: 10.1f}{: 10.3f}{: 8.2f}{: 10.3f}'
+                     '{:>10s}  {:s}'.format(
+                         spec.name, spec.priority, spec.period / 1000.0,
+                         spec.wcet / 1000.0, 100 * res['util'],
+                         res['blocking'] / 1000.0,
+                         '-' if resp is None else '{:.3f}'.format(
+                             resp / 1000.0), res['status']))
+    ordered = sorted(specs, key=lambda spec: spec.period)
+    rate_mono = all(a.priority >= b.priority
+                    for a, b in zip(ordered, ordered[1:]))
+    lines.append('Utilization {:.1f}% (rate monotonic bound {:.1f}% for {:d} '
+                 'tasks; priorities are {:s}rate monotonic)'.format(
+                     100 * total, 100 * rm_bound(len(specs)), len(specs),
+                     '' if rate_mono else 'not '))
+    return '\n'.join(lines)
+
+
+def main(argv):
+    ''' Analyzes each task table named on the command line.
+    @return The number of tasks which may miss their deadlines '''
+    overhead = 0
+    if '--overhead' in argv:
+        at = argv.index('--overhead')
+        overhead = int(float(argv[at + 1]) * 1000)
+        del argv[at:at + 2]
+
+    misses = 0
+    for path in argv:
+        with open(path) as table:
+            specs = parse_report(table.read())
+        print(path)
+        print(report(specs, overhead))
+        misses += sum(res['status'] == MISS
+                      for res in analyze(specs, overhead)[1])
+    return misses
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(1 if main(sys.argv[1:]) else 0)
@@ -9,14 +9,310 @@
 
 import array
 import gc
+import sys
 import pyb
+import utime
 import micropython
+from micropython import const
 
 
 ## This is a system-wide list of all the queues and shared variables. It is
 #  used to create diagnostic printouts. 
 share_list = []
 
+## If @c True, each queue and share created measures how long it keeps 
+#  interrupts disabled and how late the interrupt service routines which 
+#  report to it start. See @c track_irq(). 
+irq_stats = False
+
+# Positions in a queue's control array of its read index, write index, 
+# number of items and size, the number of old items overwritten, the number
+# of items an ISR couldn't put into the full queue, and the most items the 
+# queue has held. These must be made with a bare const() so the compiler
+# folds them into integers, which Viper code needs to index arrays
+_RD = const (0)
+_WR = const (1)
+_NUM = const (2)
+_SIZE = const (3)
+_DROP = const (4)
+_REJECT = const (5)
+_HIGH = const (6)
+
+
+# The data transfer code which works for any type of data in any Python. The
+# queue functions take the data buffer and the queue's control array
+
+def _qput_any (buf, ctl, item):
+    wr = ctl[_WR]
+    buf[wr] = item
+    wr += 1
+    if wr >= ctl[_SIZE]:
+        wr = 0
+    ctl[_WR] = wr
+    if ctl[_NUM] < ctl[_SIZE]:
+        ctl[_NUM] += 1
+        if ctl[_NUM] > ctl[_HIGH]:
+            ctl[_HIGH] = ctl[_NUM]
+    else:
+        # The queue was full, so the oldest item was overwritten and the
+        # next one to be read is the oldest left
+        ctl[_RD] = wr
+        ctl[_DROP] += 1
+
+
+def _qget_any (buf, ctl):
+    rd = ctl[_RD]
+    item = buf[rd]
+    rd += 1
+    if rd >= ctl[_SIZE]:
+        rd = 0
+    ctl[_RD] = rd
+    if ctl[_NUM] > 0:
+        ctl[_NUM] -= 1
+    return item
+
+
+def _sput_any (buf, item):
+    buf[0] = item
+
+
+def _sget_any (buf):
+    return buf[0]
+
+
+## @c True if the Viper code emitter is being used for transfers of integer
+#  data. This is decided when this module is imported: in MicroPython, which
+#  must support Viper as it does @c micropython.native, queues and shares of
+#  types @c b, @c B, @c h, @c H, @c i, @c I, @c l and @c L use functions 
+#  specialised for their item size which work on raw memory; other types, 
+#  and every type in other Pythons such as CPython on a desktop computer, 
+#  use the plain code above. 
+VIPER = False
+
+if sys.implementation.name == 'micropython':
+    @micropython.viper
+    def _qput8 (buf, ctl, item: int):
+        c = ptr32 (ctl)
+        p = ptr8 (buf)
+        wr = c[_WR]
+        p[wr] = item
+        wr += 1
+        if wr >= c[_SIZE]:
+            wr = 0
+        c[_WR] = wr
+        if c[_NUM] < c[_SIZE]:
+            c[_NUM] = c[_NUM] + 1
+            if c[_NUM] > c[_HIGH]:
+                c[_HIGH] = c[_NUM]
+        else:
+            c[_RD] = wr
+            c[_DROP] = c[_DROP] + 1
+
+    @micropython.viper
+    def _qput16 (buf, ctl, item: int):
+        c = ptr32 (ctl)
+        p = ptr16 (buf)
+        wr = c[_WR]
+        p[wr] = item
+        wr += 1
+        if wr >= c[_SIZE]:
+            wr = 0
+        c[_WR] = wr
+        if c[_NUM] < c[_SIZE]:
+            c[_NUM] = c[_NUM] + 1
+            if c[_NUM] > c[_HIGH]:
+                c[_HIGH] = c[_NUM]
+        else:
+            c[_RD] = wr
+            c[_DROP] = c[_DROP] + 1
+
+    @micropython.viper
+    def _qput32 (buf, ctl, item: uint):
+        c = ptr32 (ctl)
+        p = ptr32 (buf)
+        wr = c[_WR]
+        p[wr] = item
+        wr += 1
+        if wr >= c[_SIZE]:
+            wr = 0
+        c[_WR] = wr
+        if c[_NUM] < c[_SIZE]:
+            c[_NUM] = c[_NUM] + 1
+            if c[_NUM] > c[_HIGH]:
+                c[_HIGH] = c[_NUM]
+        else:
+            c[_RD] = wr
+            c[_DROP] = c[_DROP] + 1
+
+    @micropython.viper
+    def _qget8 (buf, ctl) -> int:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr8 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        return val
+
+    @micropython.viper
+    def _qget8s (buf, ctl) -> int:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr8 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        if val > 127:
+            val -= 256
+        return val
+
+    @micropython.viper
+    def _qget16 (buf, ctl) -> int:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr16 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        return val
+
+    @micropython.viper
+    def _qget16s (buf, ctl) -> int:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr16 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        if val > 32767:
+            val -= 65536
+        return val
+
+    @micropython.viper
+    def _qget32 (buf, ctl) -> int:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr32 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        return val
+
+    @micropython.viper
+    def _qget32u (buf, ctl) -> uint:
+        c = ptr32 (ctl)
+        rd = c[_RD]
+        val = ptr32 (buf)[rd]
+        nxt = rd + 1
+        if nxt >= c[_SIZE]:
+            nxt = 0
+        c[_RD] = nxt
+        if c[_NUM] > 0:
+            c[_NUM] = c[_NUM] - 1
+        return uint (val)
+
+    @micropython.viper
+    def _sput8 (buf, item: int):
+        p = ptr8 (buf)
+        p[0] = item
+
+    @micropython.viper
+    def _sput16 (buf, item: int):
+        p = ptr16 (buf)
+        p[0] = item
+
+    @micropython.viper
+    def _sput32 (buf, item: uint):
+        p = ptr32 (buf)
+        p[0] = item
+
+    @micropython.viper
+    def _sget8 (buf) -> int:
+        return ptr8 (buf)[0]
+
+    @micropython.viper
+    def _sget8s (buf) -> int:
+        val = ptr8 (buf)[0]
+        if val > 127:
+            val -= 256
+        return val
+
+    @micropython.viper
+    def _sget16 (buf) -> int:
+        return ptr16 (buf)[0]
+
+    @micropython.viper
+    def _sget16s (buf) -> int:
+        val = ptr16 (buf)[0]
+        if val > 32767:
+            val -= 65536
+        return val
+
+    @micropython.viper
+    def _sget32 (buf) -> int:
+        return ptr32 (buf)[0]
+
+    @micropython.viper
+    def _sget32u (buf) -> uint:
+        return uint (ptr32 (buf)[0])
+
+    # The transfer functions for each item size in bytes, unsigned and
+    # then signed, as (queue put, queue get, share put, share get)
+    _VIPER_FUNS = {
+        (1, False): (_qput8, _qget8, _sput8, _sget8),
+        (1, True): (_qput8, _qget8s, _sput8, _sget8s),
+        (2, False): (_qput16, _qget16, _sput16, _sget16),
+        (2, True): (_qput16, _qget16s, _sput16, _sget16s),
+        (4, False): (_qput32, _qget32u, _sput32, _sget32u),
+        (4, True): (_qput32, _qget32, _sput32, _sget32)}
+    VIPER = True
+
+
+def transfer_funs (type_code, fast = True):
+    """ Choose the functions which move data of a given type into and out
+    of queue and share buffers. 
+    @param type_code The array type code of the data
+    @param fast If @c True, the Viper functions are chosen when they can
+        handle the type; if @c False, the plain ones always are
+    @return A tuple of functions (queue put, queue get, share put, share 
+        get) """
+
+    if fast and VIPER and type_code in 'bBhHiIlL':
+        size = len (bytes (array.array (type_code, [0])))
+        funs = _VIPER_FUNS.get ((size, type_code.islower ()))
+        if funs != None:
+            return funs
+    return (_qput_any, _qget_any, _sput_any, _sget_any)
+
+
+def track_irq (on = True):
+    """ Turn the measurement of interrupt-disabled sections on or off for
+    every queue and share, including those created later. While it is on,
+    each protected @c put() and @c get() which isn't called from an ISR 
+    times the section in which interrupts are disabled, and @c show_all()
+    shows the results by queue or share name. 
+    @param on @c True to measure, @c False to stop measuring """
+
+    global irq_stats
+    irq_stats = on
+    for item in share_list:
+        item._irq = IrqStats () if on else None
+
 
 def show_all ():
     """ Create a string holding a diagnostic printout showing the status of
@@ -27,6 +323,77 @@ def show_all ():
     return '\n'.join (gen)
 
 
+def find (name):
+    """ Find a queue or share by its name, as when it is to be read or 
+    written by a person through a serial console.
+    @param name The name given to the queue or share when it was created
+    @return The queue or share, or @c None if none has that name """
+
+    for item in share_list:
+        if item._name == name:
+            return item
+    return None
+
+
+class IrqStats:
+    """ This class holds measurements of the sections of code in which a 
+    queue or share disables interrupts, and of how late the interrupt 
+    service routines which use it start running. Recording a measurement
+    allocates no memory, so it can be done in an ISR. """
+
+    def __init__ (self):
+        """ Create a set of measurements with nothing recorded. """
+
+        self.reset ()
+
+
+    def reset (self):
+        """ Clear the measurements. """
+
+        self.windows = 0
+        self.window_sum = 0
+        self.longest = 0
+        self.isrs = 0
+        self.latency_sum = 0
+        self.latest = 0
+
+
+    @micropython.native
+    def window (self, usec):
+        """ Record a section of code in which interrupts were disabled. 
+        @param usec How long interrupts were disabled, in microseconds """
+
+        self.windows += 1
+        self.window_sum += usec
+        if usec > self.longest:
+            self.longest = usec
+
+
+    @micropython.native
+    def latency (self, usec):
+        """ Record how late an interrupt service routine started. 
+        @param usec The time from the interrupting event to the start of 
+            the ISR, in microseconds """
+
+        self.isrs += 1
+        self.latency_sum += usec
+        if usec > self.latest:
+            self.latest = usec
+
+
+    def __repr__ (self):
+        """ Show the measurements briefly. """
+
+        rst = ' IRQ off {:d}x'.format (self.windows)
+        if self.windows:
+            rst += ' avg {:.1f} max {:d} us'.format (
+                self.window_sum / self.windows, self.longest)
+        if self.isrs:
+            rst += ', ISR latency avg {:.1f} max {:d} us'.format (
+                self.latency_sum / self.isrs, self.latest)
+        return rst
+
+
 class Queue:
     """ This class implements a queue which is used to transfer data from one
     task to another. If parameter 'thread_protect' is @c True, the transfer 
@@ -52,7 +419,9 @@ class Queue:
         @param size The maximum number of items which the queue can hold
         @param thread_protect @c True if mutual exclusion protection is used
         @param overwrite If @c True, oldest data will be overwritten with new
-            data if the queue becomes full 
+            data if the queue becomes full, and the overwritten items are
+            counted as dropped; if @c False, items which an ISR can't put 
+            into the full queue are counted as rejected 
         @param name A short name for the queue, default @c QueueN where @c N
             is a serial number for the queue """
 
@@ -81,10 +450,16 @@ class Queue:
         # collector to neaten up what memory is left for future use
         gc.collect ()
 
-        # Initialize pointers to be used for reading and writing data
-        self._rd_idx = 0
-        self._wr_idx = 0
-        self._num_items = 0
+        # Initialize pointers to be used for reading and writing data and
+        # the statistics of use. They are kept in an array so the Viper 
+        # transfer functions can use them
+        self._ctl = array.array ('i', [0, 0, 0, size, 0, 0, 0])
+
+        # Choose the fastest functions which can move this type of data
+        self._put, self._get = transfer_funs (type_code)[:2]
+
+        # Interrupt timing measurements, if they're being made
+        self._irq = IrqStats () if irq_stats else None
 
 
     @micropython.native
@@ -92,39 +467,42 @@ class Queue:
         """ Put an item into the queue. If there isn't room for the item, wait 
         (blocking the calling process) until room becomes available,
         unless the @c overwrite constructor parameter was set to @c True to 
-        allow old data to be clobbered. If non-blocking behavior without
-        overwriting is needed, one should call @c full() to ensure that the 
-        queue is not full before putting data into it.
+        allow old data to be clobbered, in which case the oldest item is 
+        discarded. An ISR can't wait, so an item it puts into a full queue 
+        which may not be overwritten is discarded instead. If non-blocking 
+        behavior without overwriting is needed, one should call @c full() to
+        ensure that the queue is not full before putting data into it.
         @param item The item to be placed into the queue
         @param in_ISR Set this to @c True if calling from within an ISR """
 
-        # If we're in an ISR and the queue is full and we're not allowed to
-        # overwrite data, we have to give up and exit
-        if self.full ():
+        # If the queue is full and we're not allowed to overwrite data, an
+        # ISR has to give up and exit, counting the lost item; anything else
+        # waits until there's room in the buffer for the data
+        ctl = self._ctl
+        if ctl[_NUM] >= self._size and not self._overwrite:
             if in_ISR:
+                ctl[_REJECT] += 1
                 return
-
-            # Wait (if needed) until there's room in the buffer for the data
-            if not self._overwrite:
-                while self.full ():
-                    pass
+            while ctl[_NUM] >= self._size:
+                pass
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
             irq_state = pyb.disable_irq ()
+            if self._irq != None:
+                t_off = utime.ticks_us ()
 
         # Write the data and advance the counts and pointers
-        self._buffer[self._wr_idx] = item
-        self._wr_idx += 1
-        if self._wr_idx >= self._size:
-            self._wr_idx = 0
-        self._num_items += 1
-        if self._num_items >= self._size:
-            self._num_items = self._size
+        self._put (self._buffer, ctl, item)
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
-            pyb.enable_irq (irq_state)
+            if self._irq != None:
+                t_on = utime.ticks_us ()
+                pyb.enable_irq (irq_state)
+                self._irq.window (utime.ticks_diff (t_on, t_off))
+            else:
+                pyb.enable_irq (irq_state)
 
 
     @micropython.native
@@ -136,27 +514,28 @@ class Queue:
         @param in_ISR Set this to @c True if calling from within an ISR """
 
         # Wait until there's something in the queue to be returned
-        while self.empty ():
+        ctl = self._ctl
+        while ctl[_NUM] <= 0:
             pass
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
             irq_state = pyb.disable_irq ()
+            if self._irq != None:
+                t_off = utime.ticks_us ()
 
-        # Get the item to be returned from the queue
-        to_return = self._buffer[self._rd_idx]
-
-        # Move the read pointer and adjust the number of items in the queue
-        self._rd_idx += 1
-        if self._rd_idx >= self._size:
-            self._rd_idx = 0
-        self._num_items -= 1
-        if self._num_items < 0:
-            self._num_items = 0
+        # Get the item to be returned from the queue, moving the read pointer
+        # and adjusting the number of items in the queue
+        to_return = self._get (self._buffer, ctl)
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
-            pyb.enable_irq (irq_state)
+            if self._irq != None:
+                t_on = utime.ticks_us ()
+                pyb.enable_irq (irq_state)
+                self._irq.window (utime.ticks_diff (t_on, t_off))
+            else:
+                pyb.enable_irq (irq_state)
 
         return (to_return)
 
@@ -167,7 +546,7 @@ class Queue:
         if the queue is empty.
         @return @c True if items are in the queue, @c False if not """
 
-        return (self._num_items > 0)
+        return (self._ctl[_NUM] > 0)
 
 
     @micropython.native
@@ -176,7 +555,7 @@ class Queue:
         there are any items therein.
         @return @c True if queue is empty, @c False if it's not empty """
 
-        return (self._num_items <= 0)
+        return (self._ctl[_NUM] <= 0)
 
 
     @micropython.native
@@ -185,7 +564,7 @@ class Queue:
         is no room for more data without overwriting existing data. 
         @return @c True if the queue is full """
 
-        return (self._num_items >= self._size)
+        return (self._ctl[_NUM] >= self._size)
 
 
     @micropython.native
@@ -194,15 +573,71 @@ class Queue:
         queue.
         @return The number of items in the queue """
 
-        return (self._num_items)
+        return (self._ctl[_NUM])
+
+
+    def dropped (self):
+        """ This method returns the number of old items which have been 
+        overwritten, and so never read, because new ones were put into the
+        queue while it was full. This only happens if the @c overwrite 
+        constructor parameter was set to @c True. 
+        @return The number of items lost by being overwritten """
+
+        return (self._ctl[_DROP])
+
+
+    def rejected (self):
+        """ This method returns the number of items which an ISR couldn't put
+        into the queue because it was full and overwriting wasn't allowed.
+        @return The number of items lost by being rejected """
+
+        return (self._ctl[_REJECT])
+
+
+    def high_water (self):
+        """ This method returns the largest number of items which have been
+        in the queue at once. If this is well below the queue's size, the 
+        queue could be made smaller; if it's the size and items have been 
+        dropped or rejected, the queue may need to be larger.
+        @return The most items which the queue has held """
+
+        return (self._ctl[_HIGH])
+
+
+    def reset_stats (self):
+        """ This method clears the counts of dropped and rejected items and
+        sets the high water mark to the number of items now in the queue. 
+        """
+
+        ctl = self._ctl
+        ctl[_DROP] = 0
+        ctl[_REJECT] = 0
+        ctl[_HIGH] = ctl[_NUM]
+
+
+    def isr_latency (self, usec):
+        """ Record how late an interrupt service routine which uses this 
+        queue started, if interrupt timing is being measured. This may be
+        called from within the ISR. 
+        @param usec The time from the interrupting event to the start of 
+            the ISR, in microseconds """
+
+        if self._irq != None:
+            self._irq.latency (usec)
 
 
     def __repr__ (self):
         """ This method puts diagnostic information about the queue into a 
         string. """
 
-        return ('{:<12s} Queue {: 8d} R:{:d} W:{:d}'.format (self._name, 
-                len (self._buffer), self._rd_idx, self._wr_idx))
+        ctl = self._ctl
+        rst = '{:<12s} Queue {: 8d} R:{:d} W:{:d} max:{:d} drop:{:d} ' \
+              'rej:{:d}'.format (self._name, len (self._buffer), ctl[_RD],
+                                 ctl[_WR], ctl[_HIGH], ctl[_DROP], 
+                                 ctl[_REJECT])
+        if self._irq != None:
+            rst += str (self._irq)
+        return rst
 
 
 # ============================================================================
@@ -216,7 +651,8 @@ class Share:
     ## A counter used to give serial numbers to shares for diagnostic use.
     ser_num = 0
 
-    def __init__ (self, type_code, thread_protect = True, name = None):
+    def __init__ (self, type_code, thread_protect = True, name = None,
+                  timestamp = False):
         """ Allocate memory in which the shared data will be buffered. The 
         data type code is given as for the Python 'array' type, which 
         can be any of
@@ -229,11 +665,24 @@ class Share:
         @param type_code The type of data items which the share can hold
         @param thread_protect True if mutual exclusion protection is used
         @param name A short name for the share, default @c ShareN where @c N
-            is a serial number for the share """
+            is a serial number for the share 
+        @param timestamp If @c True, the time of each write is kept so that
+            readers can tell how old the data is """
 
         self._buffer = array.array (type_code, [0])
         self._thread_protect = thread_protect
 
+        # The time from utime.ticks_us() of the last write, if it's kept;
+        # None until the first write
+        self._stamped = timestamp
+        self._stamp = None
+
+        # Choose the fastest functions which can move this type of data
+        self._put, self._get = transfer_funs (type_code)[2:]
+
+        # Interrupt timing measurements, if they're being made
+        self._irq = IrqStats () if irq_stats else None
+
         self._name = str (name) if name != None \
             else 'Share' + str (Share.ser_num)
 
@@ -253,12 +702,21 @@ class Share:
         # Disable interrupts before writing the data
         if self._thread_protect and not in_ISR:
             irq_state = pyb.disable_irq ()
+            if self._irq != None:
+                t_off = utime.ticks_us ()
 
-        self._buffer[0] = data
+        self._put (self._buffer, data)
+        if self._stamped:
+            self._stamp = utime.ticks_us ()
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
-            pyb.enable_irq (irq_state)
+            if self._irq != None:
+                t_on = utime.ticks_us ()
+                pyb.enable_irq (irq_state)
+                self._irq.window (utime.ticks_diff (t_on, t_off))
+            else:
+                pyb.enable_irq (irq_state)
 
 
     @micropython.native
@@ -271,19 +729,101 @@ class Share:
         # Disable interrupts before reading the data
         if self._thread_protect and not in_ISR:
             irq_state = pyb.disable_irq ()
+            if self._irq != None:
+                t_off = utime.ticks_us ()
 
-        to_return = self._buffer[0]
+        to_return = self._get (self._buffer)
 
         # Re-enable interrupts
         if self._thread_protect and not in_ISR:
-            pyb.enable_irq (irq_state)
+            if self._irq != None:
+                t_on = utime.ticks_us ()
+                pyb.enable_irq (irq_state)
+                self._irq.window (utime.ticks_diff (t_on, t_off))
+            else:
+                pyb.enable_irq (irq_state)
 
         return (to_return)
 
 
+    def put_at (self, data, stamp, in_ISR = False):
+        """ Write an item of data into the share, giving it the timestamp of
+        an earlier event rather than the time now. This lets a task which
+        acts on sensor data pass on the time at which the data was taken, 
+        so the delay from a sensor reading to the reaction to it can be 
+        measured further down the line. 
+        @param data The data to be put into this share
+        @param stamp The time of the event, from @c utime.ticks_us()
+        @param in_ISR Set this to True if calling from within an ISR """
+
+        # The data and its stamp are written with interrupts off throughout,
+        # so an ISR never sees the new data with the time of the writing
+        if self._thread_protect and not in_ISR:
+            irq_state = pyb.disable_irq ()
+            if self._irq != None:
+                t_off = utime.ticks_us ()
+
+        self._put (self._buffer, data)
+        self._stamp = stamp
+
+        if self._thread_protect and not in_ISR:
+            if self._irq != None:
+                t_on = utime.ticks_us ()
+                pyb.enable_irq (irq_state)
+                self._irq.window (utime.ticks_diff (t_on, t_off))
+            else:
+                pyb.enable_irq (irq_state)
+
+
+    def stamp (self):
+        """ Get the time at which the data was written, or the time of the
+        event given to @c put_at(). 
+        @return The time from @c utime.ticks_us(), or @c None if the share
+            hasn't been written or doesn't keep timestamps """
+
+        return self._stamp
+
+
+    def age (self):
+        """ Find how long ago the data was written or the event given to
+        @c put_at() happened. 
+        @return The age in microseconds, or @c None if unknown """
+
+        if self._stamp == None:
+            return None
+        return utime.ticks_diff (utime.ticks_us (), self._stamp)
+
+
+    def fresh (self, max_age):
+        """ Check whether the data is recent enough to act upon. Shares
+        which don't keep timestamps are always taken to be fresh.
+        @param max_age The oldest acceptable age in microseconds
+        @return @c True if the data is no older than @c max_age """
+
+        if not self._stamped:
+            return True
+        if self._stamp == None:
+            return False
+        return utime.ticks_diff (utime.ticks_us (), self._stamp) <= max_age
+
+
+    def isr_latency (self, usec):
+        """ Record how late an interrupt service routine which uses this 
+        share started, if interrupt timing is being measured. This may be
+        called from within the ISR. 
+        @param usec The time from the interrupting event to the start of 
+            the ISR, in microseconds """
+
+        if self._irq != None:
+            self._irq.latency (usec)
+
+
     def __repr__ (self):
         """ This method puts diagnostic information about the share into a 
         string. """
 
-        return ('{:<12s} Share'.format (self._name))
+        rst = '{:<12s} Share'.format (self._name)
+        if self._irq != None:
+            rst += str (self._irq)
+        return rst
 
@@ -0,0 +1,104 @@
+''' @file tracexport.py
+This file converts a cotask trace into Chrome trace-event JSON, which can be
+opened in the Perfetto UI (ui.perfetto.dev) or in @c chrome://tracing to see
+a timeline of every task run: which task held the processor, for how long,
+and what was waiting behind it. It runs on a desktop computer.
+
+On the board, with tracing enabled for the tasks of interest, print the
+buffer once the scheduler has stopped and save the output to a file:
+@code
+cotask.trace_buffer.dump ()
+@endcode
+Then on the host:
+@code
+python tracexport.py trace.txt trace.json
+@endcode '''
+
+import json
+import sys
+
+
+## The number of distinct values of @c utime.ticks_us() on the board
+TICKS_PERIOD = 1 << 30
+
+
+def load_dump(text):
+    ''' Reads the output of @c TraceBuffer.dump().
+    @param text The printed trace
+    @return A tuple (names, entries) of the task names by number and a list
+        of (task number, start, end, state) tuples '''
+    names = {}
+    entries = []
+    for line in text.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == 'task':
+            names[int(words[1])] = line.split(None, 2)[2]
+        elif len(words) == 4:
+            entries.append(tuple(int(word) for word in words))
+    return names, entries
+
+
+def from_buffer(buffer):
+    ''' Takes the contents of a @c cotask.TraceBuffer directly, for traces
+    made on the host.
+    @param buffer The trace buffer
+    @return A tuple (names, entries) as returned by load_dump() '''
+    return dict(enumerate(buffer.names)), list(buffer.entries())
+
+
+def _diff(new, old):
+    ''' Finds the difference of two tick counts which may have wrapped. '''
+    delta = (new - old) % TICKS_PERIOD
+    return delta - TICKS_PERIOD if delta >= TICKS_PERIOD // 2 else delta
+
+
+def to_chrome(names, entries):
+    ''' Makes Chrome trace events from recorded task runs. Each task is
+    shown as its own thread, each run as a slice named after the task with
+    the yielded state as an argument, and state changes as instant events.
+    @param names A dictionary of task names by number
+    @param entries A list of (task number, start, end, state) tuples,
+        oldest first
+    @return A dictionary which @c json.dump() writes as a trace file '''
+    events = []
+    for num in sorted(names):
+        events.append({'ph': 'M', 'name': 'thread_name', 'pid': 1,
+                       'tid': num, 'args': {'name': names[num]}})
+        events.append({'ph': 'M', 'name': 'thread_sort_index', 'pid': 1,
+                       'tid': num, 'args': {'sort_index': num}})
+
+    time = 0
+    prev = None
+    last_state = {}
+    for num, start, end, state in entries:
+        if prev is not None:
+            time += _diff(start, prev)
+        prev = start
+        name = names.get(num, 'Task {:d}'.format(num))
+        events.append({'ph': 'X', 'name': name, 'pid': 1, 'tid': num,
+                       'ts': time, 'dur': max(_diff(end, start), 0),
+                       'args': {'state': state}})
+        if last_state.get(num, state) != state:
+            events.append({'ph': 'i', 's': 't', 'pid': 1, 'tid': num,
+                           'ts': time, 'name': '{:d} -> {:d}'.format(
+                               last_state[num], state)})
+        last_state[num] = state
+
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def main(argv):
+    ''' Converts the dump file given first into the JSON file given second.
+    '''
+    with open(argv[0]) as dump_file:
+        names, entries = load_dump(dump_file.read())
+    with open(argv[1], 'w') as out:
+        json.dump(to_chrome(names, entries), out)
+    print('{:d} runs of {:d} tasks written to {:s}'.format(
+        len(entries), len(names), argv[1]))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])